@@ -0,0 +1,203 @@
+# app/services/airnow_ingest.py
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app import crud
+from app.core.config import settings
+from app.services import airnow_service, spatial_index
+from app.services.http_client import run_sync
+
+# AirNow parametre adı → airqualitydata kolonu (AQI ayrıca: istasyonun en yüksek alt-indeksi)
+PARAMETER_FIELDS = {"PM2.5": "pm25", "PM10": "pm10", "OZONE": "o3", "CO": "co", "SO2": "so2"}
+STATION_FIELDS = ("aqi",) + tuple(PARAMETER_FIELDS.values())
+MISSING = -999
+MIN_DISTANCE_KM = 0.1  # istasyon hücrenin tam üstündeyse IDW ağırlığı sonsuz olmasın
+
+
+# --------------------------
+# Bölgeyi bbox karolarına böl (tek istek çok büyük cevap döndürmesin)
+# --------------------------
+def tiles(min_lat, min_lon, max_lat, max_lon, size):
+    lat = min_lat
+    while lat < max_lat:
+        lon = min_lon
+        while lon < max_lon:
+            yield lat, lon, min(lat + size, max_lat), min(lon + size, max_lon)
+            lon += size
+        lat += size
+
+
+def station_key(record):
+    return record.get("FullAQSCode") or record.get("IntlAQSCode") or f"{record['Latitude']},{record['Longitude']}"
+
+
+def parse_observations(records, hour):
+    """
+    (istasyon, parametre) kayıtlarını istasyon başına tek satıra çevirir:
+    {key: {"latitude", "longitude", "aqi", "pm25", ...}}. Karo kenarındaki tekrarlar birleşir.
+    """
+    stamp = hour.strftime("%Y-%m-%dT%H:00")
+    stations = {}
+    for r in records:
+        if r.get("UTC") != stamp:
+            continue
+        station = stations.setdefault(station_key(r), {
+            "latitude": float(r["Latitude"]), "longitude": float(r["Longitude"]),
+            **{f: None for f in STATION_FIELDS},
+        })
+        field = PARAMETER_FIELDS.get(r.get("Parameter"))
+        value, aqi = r.get("Value"), r.get("AQI")
+        if field is not None and value is not None and value != MISSING:
+            station[field] = float(value)
+        if aqi is not None and aqi != MISSING:
+            station["aqi"] = aqi if station["aqi"] is None else max(station["aqi"], aqi)
+    return stations
+
+
+# --------------------------
+# İstasyon → grid hücresi eşlemesi (CSR benzeri düz diziler, vektörel uygulanır)
+# --------------------------
+class StationMapping:
+    """
+    Her (hücre, istasyon) çifti için ağırlık. radius_km içindeki istasyonlardan hücre başına en yakın
+    max_stations tanesi tutulur; method="nearest" ise her alan için en yakın geçerli istasyon kullanılır.
+    """
+    def __init__(self, index, keys, lats, lons, radius_km, method, power, max_stations):
+        self.keys = list(keys)
+        self.method = method
+        cells, stations, distances = [], [], []
+        for s, (lat, lon) in enumerate(zip(lats, lons)):
+            for hit in index.within_radius(lat, lon, radius_km):
+                cells.append(hit["location_id"])
+                stations.append(s)
+                distances.append(hit["distance_km"])
+        cells = np.asarray(cells, dtype=np.int64)
+        stations = np.asarray(stations, dtype=np.int64)
+        distances = np.maximum(np.asarray(distances, dtype=float), MIN_DISTANCE_KM)
+        # Hücre içinde mesafeye göre sırala, ilk max_stations'ı tut
+        order = np.lexsort((distances, cells))
+        cells, stations, distances = cells[order], stations[order], distances[order]
+        self.location_ids, starts = np.unique(cells, return_index=True)
+        rank = np.arange(len(cells)) - np.repeat(starts, np.diff(np.append(starts, len(cells))))
+        keep = rank < max_stations
+        self.cell_pos = np.searchsorted(self.location_ids, cells[keep])
+        self.station_idx = stations[keep]
+        self.distances = distances[keep]
+        self.weights = 1.0 / self.distances ** power
+
+    def __len__(self):
+        return len(self.location_ids)
+
+    def apply(self, values):
+        """values: istasyon sırasıyla float dizisi (eksik = NaN) → hücre başına değer (kapsanmayan = NaN)."""
+        v = values[self.station_idx]
+        valid = ~np.isnan(v)
+        result = np.full(len(self.location_ids), np.nan)
+        if not valid.any():
+            return result
+        pos = self.cell_pos[valid]
+        if self.method == "nearest":
+            # Sıralama (hücre, mesafe) olduğu için her hücrenin ilk geçerli çifti en yakın istasyondur
+            cells, first = np.unique(pos, return_index=True)
+            result[cells] = v[valid][first]
+            return result
+        w = self.weights[valid]
+        numerator = np.bincount(pos, weights=w * v[valid], minlength=len(result))
+        denominator = np.bincount(pos, weights=w, minlength=len(result))
+        covered = denominator > 0
+        result[covered] = numerator[covered] / denominator[covered]
+        return result
+
+
+_mapping = None
+_mapping_signature = None
+_mapping_lock = threading.Lock()
+
+
+def _signature(index, keys, lats, lons):
+    """
+    İmza istasyon kodları + koordinatlarından hesaplanır: saatlik veride istasyon listesi genelde aynıdır,
+    yeni istasyon açılıp kapandığında (veya location indeksi yeniden kurulduğunda) eşleme tazelenir.
+    """
+    digest = hashlib.sha1()
+    for key, lat, lon in sorted(zip(keys, lats, lons)):
+        digest.update(f"{key}:{lat:.4f},{lon:.4f};".encode("utf-8"))
+    digest.update(f"{id(index)}|{settings.AIRNOW_STATION_RADIUS_KM}|{settings.AIRNOW_FANOUT_METHOD}|"
+                  f"{settings.AIRNOW_IDW_POWER}|{settings.AIRNOW_IDW_MAX_STATIONS}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_mapping(index, keys, lats, lons):
+    """Eşleme istasyon kümesi (veya location indeksi) değişmedikçe yeniden kurulmaz."""
+    global _mapping, _mapping_signature
+    signature = _signature(index, keys, lats, lons)
+    with _mapping_lock:
+        if _mapping is None or signature != _mapping_signature:
+            started = time.monotonic()
+            _mapping = StationMapping(
+                index, keys, lats, lons, settings.AIRNOW_STATION_RADIUS_KM, settings.AIRNOW_FANOUT_METHOD,
+                settings.AIRNOW_IDW_POWER, settings.AIRNOW_IDW_MAX_STATIONS,
+            )
+            _mapping_signature = signature
+            print(f"✅ AirNow istasyon eşlemesi kuruldu ({len(keys)} istasyon → {len(_mapping)} hücre, {time.monotonic() - started:.2f}s)")
+        return _mapping
+
+
+# --------------------------
+# İstasyon bazlı ingestion: karolar → istasyonlar → hücreler → bulk upsert
+# --------------------------
+async def fetch_stations(region, hour):
+    calls = [airnow_service.fetch_airnow_bbox_async(*tile, hour) for tile in tiles(*region, settings.AIRNOW_TILE_DEG)]
+    records = []
+    for result in await airnow_service.client.gather(calls):
+        if isinstance(result, Exception):
+            print(f"⚠ AirNow bbox hatası: {result}")
+        else:
+            records.extend(result)
+    return parse_observations(records, hour)
+
+
+def ingest_airnow_stations(db, hour=None):
+    """
+    Bölgedeki her istasyonu bir kez çeker, eşleme ile kapsama alanındaki tüm locations satırlarına dağıtır.
+    API çağrısı sayısı karo sayısı kadardır (grid hücresi sayısından bağımsız).
+    """
+    hour = hour or (datetime.utcnow() - timedelta(hours=settings.AIRNOW_LAG_HOURS)).replace(minute=0, second=0, microsecond=0)
+    index = spatial_index.get_location_index(db)
+    if index is None or not len(index):
+        return {"stations": 0, "locations": 0}
+    margin = settings.AIRNOW_STATION_RADIUS_KM / spatial_index.KM_PER_DEGREE
+    region = (index.lats.min() - margin, index.lons.min() - margin, index.lats.max() + margin, index.lons.max() + margin)
+
+    started = time.monotonic()
+    stations = run_sync(fetch_stations(region, hour), airnow_service.client)
+    fetched = time.monotonic()
+    if not stations:
+        print(f"ℹ AirNow: {hour:%Y-%m-%d %H}:00 için gözlem yok")
+        return {"stations": 0, "locations": 0}
+
+    keys = sorted(stations)
+    lats = [stations[k]["latitude"] for k in keys]
+    lons = [stations[k]["longitude"] for k in keys]
+    mapping = get_mapping(index, keys, lats, lons)
+    columns = {}
+    for f in STATION_FIELDS:
+        values = np.array([np.nan if stations[k][f] is None else stations[k][f] for k in keys], dtype=float)
+        columns[f] = mapping.apply(values)
+
+    rows = []
+    for i, location_id in enumerate(mapping.location_ids.tolist()):
+        row = {"location_id": location_id, "timestamp": hour}
+        for f in STATION_FIELDS:
+            value = columns[f][i]
+            row[f] = None if np.isnan(value) else (int(round(value)) if f == "aqi" else float(value))
+        if any(row[f] is not None for f in STATION_FIELDS):
+            rows.append(row)
+    result = crud.bulk_upsert_air_quality(db, rows)
+    print(f"✅ AirNow istasyon ingestion: {len(stations)} istasyon → {len(rows)} lokasyon "
+          f"(çekme {fetched - started:.1f}s, toplam {time.monotonic() - started:.1f}s)")
+    return {"stations": len(stations), "locations": len(rows), "timestamp": hour, **result}
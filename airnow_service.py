@@ -1,9 +1,13 @@
 # app/services/airnow_service.py
-import requests
+from datetime import datetime, timedelta
+
+from app.services.http_client import AsyncAPIClient, run_sync
+from app.services.rate_limiter import RateLimiter
+from app.services.response_cache import ResponseCache
 '''
-requests → HTTP istekleri yapmak için kullanılan popüler Python kütüphanesi.
+AsyncAPIClient → httpx tabanlı async istemci: paylaşılan bağlantı havuzu (keep-alive), eşzamanlılık sınırı, timeout ve jitter'lı retry.
 
-Burada AirNow API’sine GET isteği göndermek için kullanılıyor.
+Eskiden her çağrı requests.get ile yeni bir bağlantı açıyordu; binlerce koordinatı tararken bu dakikalar sürüyordu.
 '''
 from app.core.config import settings
 '''
@@ -14,14 +18,30 @@ Bunun sayesinde .env dosyasındaki AIRNOW_API_KEY (AirNow API anahtarı) kullan
 Yani API’ye erişim için gerekli kimlik doğrulama burada ayarlanıyor.
 '''
 
-BASE = "https://www.airnowapi.org/aq/observation/latLong/current/"
+LATLON_PATH = "/aq/observation/latLong/current/"
 '''
-AirNow API’sinin temel URL adresi.
+AirNow API’sinin gözlem endpoint'i; kök adres settings.AIRNOW_BASE_URL (testlerde yerel stub sunucuya yönlendirilebilir).
 
 Bu endpoint, verilen enlem/boylama göre anlık hava kalitesi gözlemlerini (current observations) döndürüyor.
 '''
 
-def fetch_airnow_by_latlon(lat: float, lon: float, distance_miles: int = 25):
+limiter = RateLimiter(
+    "AirNow", settings.AIRNOW_RATE_PER_MINUTE, settings.AIRNOW_BURST,
+    settings.AIRNOW_DAILY_QUOTA, settings.QUOTA_INTERACTIVE_RESERVE,
+)
+client = AsyncAPIClient("AirNow", settings.AIRNOW_BASE_URL, settings.AIRNOW_MAX_CONCURRENCY, limiter=limiter)
+cache = ResponseCache("AirNow", settings.AIRNOW_CACHE_RESOLUTION_DEG, settings.AIRNOW_CACHE_TTL_SECONDS)
+'''
+Process genelinde tek istemci ve tek limiter: tüm AirNow çağrıları aynı bağlantı havuzunu, eşzamanlılık sınırını ve
+
+token bucket'ı paylaşır. AirNow anahtar başına saatte ~500 isteğe izin verir; aşılırsa anahtar/IP engellenebilir.
+
+AirNow gözlemleri saatlik güncellenir ve 25 millik yarıçaptaki tüm istasyonları döndürür: komşu ızgara hücreleri
+
+aynı cevabı alır. Önbellek koordinatı AIRNOW_CACHE_RESOLUTION_DEG ızgarasına oturtur, cevabı TTL boyunca saklar.
+'''
+
+async def fetch_airnow_by_latlon_async(lat: float, lon: float, distance_miles: int = 25):
     """
     AirNow'dan o anki gözlemleri çek.
     Dönüş: parsed JSON listesi (her öğe farklı bir ParameterName: PM2.5, O3, vb.)
@@ -37,6 +57,7 @@ distance_miles: int = 25 → Varsayılan arama yarıçapı, 25 mil.
 
 Yani verilen koordinata 25 mil mesafedeki hava kalitesi istasyonlarını kapsar.
     """
+    lat, lon = cache.snap(lat, lon)
     params = {
         "format": "application/json",
         "latitude": lat,
@@ -57,26 +78,18 @@ Yani verilen koordinata 25 mil mesafedeki hava kalitesi istasyonlarını kapsar.
 
 "API_KEY": settings.AIRNOW_API_KEY → AirNow API anahtarı (.env dosyasından geliyor).
     '''
-    # HTTP GET isteği yapıyoruz; requests basit ve yeterli
-    resp = requests.get(BASE, params=params, timeout=15)
+    return await cache.get_or_fetch(f"{lat},{lon},{distance_miles}", lambda: client.get_json(LATLON_PATH, params))
     '''
-    requests.get(...) ile AirNow API’sine HTTP GET isteği gönderiliyor.
+    Önce önbelleğe bakılır (bellek → disk); yoksa client.get_json(...) ile AirNow API’sine HTTP GET isteği gönderiliyor.
 
-BASE: Temel API URL’si.
+Aynı ızgara noktası için eşzamanlı istekler tek ağ çağrısını bekler (single-flight).
 
-params=params: Yukarıda hazırladığımız parametreler URL’ye ekleniyor.
+Bağlantı havuzdan alınır; aynı anda en fazla AIRNOW_MAX_CONCURRENCY istek uçuşta olur.
 
-timeout=15: Eğer API 15 saniye içinde yanıt vermezse hata fırlatılır.
-
-Dönen cevap resp değişkeninde saklanır.
-    '''
-    resp.raise_for_status()
-    '''
-    Eğer yanıt bir hata kodu içeriyorsa (400, 401, 500 gibi), bir exception fırlatılır.
+Zaman aşımı (HTTP_TIMEOUT_SECONDS), 429 ve 5xx cevaplarında HTTP_MAX_RETRIES kez jitter'lı bekleme ile tekrar denenir.
 
-Bu sayede “sessizce başarısız olma” yerine doğrudan hata alırız.
+Diğer hata kodlarında (400, 401 gibi) httpx.HTTPStatusError fırlatılır; “sessizce başarısız olma” yerine doğrudan hata alırız.
     '''
-    return resp.json()
 '''
 API’den gelen cevap JSON formatında parse edilip döndürülür.
 
@@ -96,3 +109,77 @@ JSON formatında anlık hava kalitesi ölçümlerini alır.
 
 Dönen her öğe → bir parametrenin ölçümü (PM2.5, O3, vs.).
 '''
+
+
+async def fetch_airnow_batch(coords, distance_miles: int = 25):
+    """
+    Çok sayıda (lat, lon) için eşzamanlı çağrı. Dönüş: coords ile aynı sırada liste;
+    başarısız koordinatlar için Exception nesnesi (tek hata tüm taramayı durdurmaz).
+    """
+    return await client.gather([fetch_airnow_by_latlon_async(lat, lon, distance_miles) for lat, lon in coords])
+
+
+def fetch_airnow_by_latlon(lat: float, lon: float, distance_miles: int = 25):
+    """Senkron sarmalayıcı (scheduler / sync endpoint'ler için)."""
+    return run_sync(fetch_airnow_by_latlon_async(lat, lon, distance_miles), client)
+
+
+def fetch_airnow_batch_sync(coords, distance_miles: int = 25):
+    return run_sync(fetch_airnow_batch(coords, distance_miles), client)
+
+
+
+# AirNow gözlem saatini yerel saat + saat dilimi kısaltmasıyla verir (DateObserved "2025-10-01 ", HourObserved 14, LocalTimeZone "EST")
+TZ_OFFSETS = {
+    "EST": -5, "EDT": -4, "CST": -6, "CDT": -5, "MST": -7, "MDT": -6, "PST": -8, "PDT": -7,
+    "AKST": -9, "AKDT": -8, "HST": -10, "AST": -4, "SST": -11, "CHST": 10, "UTC": 0, "GMT": 0,
+}
+
+
+def current_row(records):
+    """
+    latLong/current cevabı → airqualitydata satırı: {"timestamp" (UTC saat başı), "aqi" (parametrelerin en yükseği)}.
+    Bu endpoint konsantrasyon döndürmez; pm25/o3/... kolonları istasyon ingest'inden (airnow_ingest) gelir. Gözlem yoksa None.
+    """
+    aqis = [r["AQI"] for r in records if r.get("AQI") is not None and r["AQI"] >= 0]
+    if not aqis:
+        return None
+    first = records[0]
+    offset = TZ_OFFSETS.get((first.get("LocalTimeZone") or "").strip().upper())
+    if offset is None or not first.get("DateObserved"):
+        timestamp = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    else:
+        observed = datetime.strptime(first["DateObserved"].strip(), "%Y-%m-%d") + timedelta(hours=int(first["HourObserved"]))
+        timestamp = observed - timedelta(hours=offset)
+    return {"timestamp": timestamp, "aqi": max(aqis)}
+
+
+async def fetch_current_row_async(lat: float, lon: float, distance_miles: int = 25):
+    """fetch-and-save için: limiter, kota ve önbellek üzerinden tek lokasyonun anlık AQI satırı (veya None)."""
+    return current_row(await fetch_airnow_by_latlon_async(lat, lon, distance_miles))
+
+
+BBOX_PATH = "/aq/data/"
+BBOX_PARAMETERS = "OZONE,PM25,PM10,CO,SO2"
+
+
+async def fetch_airnow_bbox_async(min_lat: float, min_lon: float, max_lat: float, max_lon: float, hour):
+    """
+    Bir bbox içindeki tüm istasyonların verilen saatteki (UTC) gözlemleri.
+    Dönüş: her (istasyon, parametre) için bir öğe — Latitude, Longitude, UTC, Parameter, Value, AQI, FullAQSCode...
+    Noktasal çağrının aksine her istasyon bir kez gelir; önbelleğe alınmaz (istasyon eşlemesi zaten tek çağrı).
+    """
+    stamp = hour.strftime("%Y-%m-%dT%H")
+    params = {
+        "startDate": stamp,
+        "endDate": stamp,
+        "parameters": BBOX_PARAMETERS,
+        "BBOX": f"{min_lon},{min_lat},{max_lon},{max_lat}",
+        "dataType": "B",
+        "format": "application/json",
+        "verbose": 1,
+        "monitorType": 0,
+        "includerawconcentrations": 0,
+        "API_KEY": settings.AIRNOW_API_KEY,
+    }
+    return await client.get_json(BBOX_PATH, params)
@@ -1,5 +1,6 @@
 # app/api/v1/routers/aqi.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
 '''
 from fastapi import ... → FastAPI kütüphanesinden belirli sınıf ve fonksiyonları içe aktarırız.
 APIRouter → API endpoint’lerini (yani /latest veya / gibi URL yollarını) organize etmek için kullanılır. Bir nevi “mini FastAPI uygulaması” gibi düşünebilirsin. Kodun daha modüler ve yönetilebilir olmasını sağlar.
@@ -26,6 +27,13 @@ from app import crud, models
 crud → Veritabanı işlemlerini yapan modül. Create, Read, Update, Delete fonksiyonları burada tanımlanır.
 models → SQLAlchemy veri modellerini içerir. Örneğin AirQuality tablosu burada tanımlanır.
 '''
+from app.services.latest_cache import air_quality_latest
+from app.services import spatial_index
+from app.core.config import settings
+'''
+air_quality_latest → lokasyon başına son ölçümü bellekte tutan önbellek.
+Upsert'lerle (ingest olayları) yerinde güncellenir; /latest çoğu istekte DB'ye hiç gitmez.
+'''
 from pydantic import BaseModel
 '''
 BaseModel → FastAPI’de veri doğrulama ve şema tanımlamak için kullanılır.
@@ -57,7 +65,7 @@ Bu model, FastAPI’ye gelen JSON verisini otomatik doğrulama ve tip kontrolü
 
 @router.get("/latest")
 def get_latest_aqi(location_id: int, db: Session = Depends(get_db)):
-    record = crud.get_latest_air_quality(db, location_id)
+    record = air_quality_latest.get(db, location_id)
     if record:
         return record
     raise HTTPException(status_code=404, detail="No data found")
@@ -65,11 +73,32 @@ def get_latest_aqi(location_id: int, db: Session = Depends(get_db)):
 @router.get("/latest") → Bu fonksiyon /latest yoluna gelen GET isteğini yakalar.
 location_id: int → URL parametresi olarak gelen konum ID’si.
 db: Session = Depends(get_db) → FastAPI otomatik olarak get_db’yi çağırır ve DB oturumunu verir.
-crud.get_latest_air_quality(db, location_id) → Veritabanından en son hava kalitesi kaydını çeker.
+air_quality_latest.get(db, location_id) → En son hava kalitesi kaydını önbellekten verir (O(1)).
+Önbellekte yoksa veya TTL (LATEST_CACHE_TTL_SECONDS) dolduysa crud.get_latest_air_quality ile tek satır sorgulanır.
 Eğer veri varsa, record döndürülür.
 Veri yoksa, HTTP 404 Not Found hatası döndürülür.
 '''
 
+@router.get("/latest/bulk")
+def get_latest_aqi_bulk(
+    ids: str | None = Query(None, description="Virgülle ayrılmış location_id listesi"),
+    bbox: str | None = Query(None, description="min_lat,min_lon,max_lat,max_lon"),
+    db: Session = Depends(get_db)
+):
+    try:
+        location_ids = spatial_index.resolve_location_ids(db, ids, bbox, settings.BULK_MAX_LOCATIONS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rows = air_quality_latest.get_many(db, location_ids)
+    return JSONResponse(air_quality_latest.columnar(rows))
+'''
+@router.get("/latest/bulk") → Harita görünümü için çok sayıda lokasyonun son hava kalitesi verisi tek istekte.
+ids=1,2,3 veya bbox=min_lat,min_lon,max_lat,max_lon (bbox, bellekteki location indeksi ile id'lere çevrilir).
+Önbellekte olmayan lokasyonlar tek toplu sorguyla (crud.get_latest_many) okunur.
+Yanıt sütun bazlıdır: {"count": n, "location_id": [...], "timestamp": [...], alan: [...]}; verisi olmayan lokasyonlar yer almaz.
+JSONResponse doğrudan döndürülür, satır satır jsonable_encoder dönüşümü yapılmaz.
+'''
+
 @router.post("/", status_code=201)
 def create_or_update_aqi(payload: AQICreate, db: Session = Depends(get_db)):
     obj = crud.upsert_air_quality(
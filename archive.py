@@ -0,0 +1,285 @@
+# app/services/archive.py
+import heapq
+import os
+import shutil
+from datetime import datetime, time as dtime, timedelta
+
+from sqlalchemy import DateTime, Float, Integer, Numeric, select
+
+from app import crud
+from app.core.config import settings
+from app.db.session import SessionLocal
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # opsiyonel: arşiv katmanı sadece pyarrow ile çalışır
+    pa = pc = ds = pq = None
+
+DAY = timedelta(days=1)
+AGGREGATES = {"avg": "mean", "min": "min", "max": "max"}
+
+# Dizin düzeni (hive): {ARCHIVE_DIR}/{tablo}/date=YYYY-MM-DD[/gas=no2]/part-0.parquet
+# TEMPO gaz bazında uzun formatta (location_id, timestamp, value) tutulur: tek gaz okuyan eğitim işi diğerlerine dokunmaz.
+GAS_PARTITIONED = ("tempodata",)
+
+
+def available():
+    return pq is not None
+
+
+def table_dir(table_name):
+    return settings.ARCHIVE_DIR / table_name
+
+
+def arrow_type(column):
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("s")
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, (Float, Numeric)):
+        return pa.float64()
+    return pa.string()
+
+
+def archived_days(table_name):
+    root = table_dir(table_name)
+    if not root.is_dir():
+        return []
+    return sorted(
+        datetime.strptime(p.name[len("date="):], "%Y-%m-%d").date()
+        for p in root.iterdir() if p.is_dir() and p.name.startswith("date=")
+    )
+
+
+def archived_until(table_name):
+    """Arşivin kapsadığı son günün ertesi (bu andan önceki satırlar MySQL'de değil arşivde); arşiv yoksa None."""
+    days = archived_days(table_name) if available() else []
+    return datetime.combine(days[-1] + DAY, dtime()) if days else None
+
+
+# --------------------------
+# Yazma: MySQL'deki bir günü Parquet'e (partitions.drop_expired_partitions arşiv kancası)
+# --------------------------
+def archive_partition(table_name, day, batch_rows=None):
+    """
+    Günün satırlarını server-side cursor ile okuyup (location_id, timestamp) sırasında yazar.
+    Önce gizli bir geçici dizine yazılır, sonra yer değiştirilir: yarıda kalan iş okunmaz, tekrar çalıştırmak güvenlidir.
+    """
+    if not available():
+        raise RuntimeError("Arşiv için pyarrow kurulu değil; bölüm düşürülmedi")
+    batch_rows = batch_rows or settings.ARCHIVE_BATCH_ROWS
+    model, fields = crud.TIMESERIES_TABLES[table_name]
+    table = model.__table__
+    columns = [table.c.location_id, table.c.timestamp] + [table.c[f] for f in fields]
+    start = datetime.combine(day, dtime())
+    stmt = (
+        select(*columns)
+        .where(table.c.timestamp >= start, table.c.timestamp < start + DAY)
+        .order_by(table.c.location_id, table.c.timestamp)
+    )
+
+    root = table_dir(table_name)
+    target = root / f"date={day:%Y-%m-%d}"
+    staging = root / f"_staging-{day:%Y-%m-%d}"  # "_" önekli dizinler dataset taramasında yok sayılır
+    shutil.rmtree(staging, ignore_errors=True)
+    gas_partitioned = table_name in GAS_PARTITIONED
+    if gas_partitioned:
+        schema = pa.schema([("location_id", pa.int64()), ("timestamp", pa.timestamp("s")), ("value", pa.float64())])
+    else:
+        schema = pa.schema([(c.name, arrow_type(c)) for c in columns])
+    writers = {}
+
+    def writer_for(key):
+        if key not in writers:
+            path = staging / f"gas={key}" if key else staging
+            path.mkdir(parents=True, exist_ok=True)
+            writers[key] = pq.ParquetWriter(path / "part-0.parquet", schema, compression=settings.ARCHIVE_COMPRESSION)
+        return writers[key]
+
+    count = 0
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=batch_rows))
+        '''
+        Her batch_rows'luk parça ayrı bir row group olur; satırlar location_id sıralı yazıldığı için
+        row group istatistikleri (min/max location_id) okumada lokasyon filtresiyle atlanabilir.
+        '''
+        for partition in result.partitions(batch_rows):
+            values = list(zip(*partition))
+            if gas_partitioned:
+                location_ids = pa.array(values[0], type=pa.int64())
+                timestamps = pa.array(values[1], type=pa.timestamp("s"))
+                for i, gas in enumerate(fields, start=2):
+                    gas_values = pa.array(values[i], type=pa.float64())
+                    batch = pa.Table.from_arrays([location_ids, timestamps, gas_values], schema=schema)
+                    batch = batch.filter(pc.is_valid(gas_values))  # boş ölçümler yazılmaz
+                    if batch.num_rows:
+                        writer_for(gas).write_table(batch)
+            else:
+                arrays = [pa.array(v, type=field.type) for v, field in zip(values, schema)]
+                writer_for(None).write_table(pa.Table.from_arrays(arrays, schema=schema))
+            count += len(partition)
+    finally:
+        db.close()
+        for writer in writers.values():
+            writer.close()
+
+    if writers:
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(staging, target)
+        print(f"🗄 {table_name} {day}: {count} satır arşivlendi → {target}")
+    return count
+
+
+# --------------------------
+# Okuma: predicate pushdown (gün/gaz dizinleri + row group istatistikleri)
+# --------------------------
+def _dataset(table_name):
+    keys = [("date", pa.date32())]
+    if table_name in GAS_PARTITIONED:
+        keys.append(("gas", pa.string()))
+    return ds.dataset(
+        table_dir(table_name), format="parquet",
+        partitioning=ds.partitioning(pa.schema(keys), flavor="hive"),
+    )
+
+
+def _filter(location_ids, start, end, after):
+    conditions = []
+    # Gün dizini filtresi: aralık dışındaki dosyalar hiç açılmaz
+    if start is not None:
+        conditions.append(ds.field("date") >= start.date())
+        conditions.append(ds.field("timestamp") >= pa.scalar(start, pa.timestamp("s")))
+    if end is not None:
+        conditions.append(ds.field("date") <= (end - timedelta(microseconds=1)).date())
+        conditions.append(ds.field("timestamp") < pa.scalar(end, pa.timestamp("s")))
+    if location_ids is not None:
+        conditions.append(ds.field("location_id").isin(location_ids))
+    if after is not None:
+        location_id, timestamp = after
+        conditions.append(
+            (ds.field("location_id") > location_id)
+            | ((ds.field("location_id") == location_id) & (ds.field("timestamp") >= pa.scalar(timestamp, pa.timestamp("s"))))
+        )
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _empty(table_name, fields):
+    model = crud.TIMESERIES_TABLES[table_name][0]
+    columns = [model.__table__.c[c] for c in ("location_id", "timestamp") + tuple(fields)]
+    return pa.schema([(c.name, arrow_type(c)) for c in columns]).empty_table()
+
+
+def _read(dataset, table_name, fields, expression):
+    """Filtreye uyan satırlar: (location_id, timestamp, alanlar...) sütunlu pyarrow.Table, (location_id, timestamp) sıralı."""
+    keys = ["location_id", "timestamp"]
+    if table_name not in GAS_PARTITIONED:
+        result = dataset.to_table(columns=keys + list(fields), filter=expression)
+    else:
+        gas_filter = ds.field("gas").isin(list(fields))
+        long = dataset.to_table(
+            columns=keys + ["gas", "value"],
+            filter=gas_filter if expression is None else expression & gas_filter,
+        )
+        # Uzun → geniş: her gaz ayrı sütun, (location_id, timestamp) üzerinde full outer join
+        result = None
+        for gas in fields:
+            part = long.filter(pc.equal(long["gas"], gas)).select(keys + ["value"]).rename_columns(keys + [gas])
+            result = part if result is None else result.join(part, keys, join_type="full outer")
+        result = result.select(keys + list(fields))
+    return result.sort_by([("location_id", "ascending"), ("timestamp", "ascending")])
+
+
+def scan(table_name, fields=None, location_ids=None, start=None, end=None, after=None):
+    """
+    Arşivden (location_id, timestamp, alanlar...) sütunlu pyarrow.Table, (location_id, timestamp) sıralı.
+    Uzun aralıklı model eğitimi de buradan okur: scan("tempodata", ["no2"], start=...).to_pandas()
+    after=(location_id, timestamp) verilirse bu noktadan itibaren (dahil) satırlar.
+    Eşleşen tüm satırlar belleğe alınır: API yolları sınırlı pencere okur (page: sayfanın lokasyonları, iter_partitions: tek gün).
+    """
+    if not available():
+        raise RuntimeError("Arşiv için pyarrow kurulu değil")
+    fields = tuple(fields or crud.TIMESERIES_TABLES[table_name][1])
+    if not archived_days(table_name):
+        return _empty(table_name, fields)
+    return _read(_dataset(table_name), table_name, fields, _filter(location_ids, start, end, after))
+
+
+def _rows(table):
+    return list(zip(*(table.column(i).to_pylist() for i in range(table.num_columns))))
+
+
+def _page_locations(dataset, table_name, fields, expression, count):
+    """
+    Filtreye uyan en küçük count lokasyon id'si (artan), arşivin kendisinden: sadece location_id sütunu
+    batch batch okunur, bellekte en fazla count id tutulur.
+    """
+    if table_name in GAS_PARTITIONED:
+        gas_filter = ds.field("gas").isin(list(fields))
+        expression = gas_filter if expression is None else expression & gas_filter
+    smallest = []
+    for batch in dataset.scanner(columns=["location_id"], filter=expression).to_batches():
+        if batch.num_rows:
+            ids = pc.unique(batch.column(0)).to_pylist()
+            smallest = heapq.nsmallest(count, set(smallest).union(ids))
+    return smallest
+
+
+def page(table_name, fields, location_ids, start, end, after, limit, bucket_minutes=None, agg="avg"):
+    """
+    history API için arşiv sayfası: history.raw_page / bucket_page ile aynı satır biçimi.
+    after cursor'ı (son dönen satır) hariç tutulur; kovalı sorguda cursor kova başlangıcıdır.
+    Önce sayfaya girebilecek lokasyonlar (cursor'dan sonra verisi olan ilk limit + 1 id) bulunur; sonra sadece bu
+    lokasyonlar, artan parçalar halinde (1, 2, 4, ... lokasyon) tek filtreli okumayla alınır ve limit + 1 satır dolunca durulur.
+    """
+    if not available():
+        raise RuntimeError("Arşiv için pyarrow kurulu değil")
+    if not archived_days(table_name):
+        return []
+    step = timedelta(seconds=bucket_minutes * 60 if bucket_minutes else 1)
+    after = (after[0], after[1] + step) if after else None
+    dataset = _dataset(table_name)
+    candidates = _page_locations(dataset, table_name, fields, _filter(location_ids, start, end, after), limit + 1)
+    rows, chunk = [], 1
+    while candidates and len(rows) <= limit:
+        ids, candidates = candidates[:chunk], candidates[chunk:]
+        chunk *= 2
+        table = _read(dataset, table_name, fields, _filter(ids, start, end, after))
+        if bucket_minutes:
+            # floor_temporal epoch'tan hizalanır: SQL'deki floor(unix_timestamp / s) * s ile aynı kovalar
+            table = table.append_column(
+                "bucket_start", pc.floor_temporal(table["timestamp"], multiple=bucket_minutes, unit="minute")
+            )
+            table = table.group_by(["location_id", "bucket_start"]).aggregate([(f, AGGREGATES[agg]) for f in fields])
+            table = table.select(["location_id", "bucket_start"] + [f"{f}_{AGGREGATES[agg]}" for f in fields])
+            table = table.sort_by([("location_id", "ascending"), ("bucket_start", "ascending")])
+        rows.extend(_rows(table.slice(0, limit + 1 - len(rows))))
+    return rows
+
+
+def merge_pages(archived, live, limit):
+    """Arşiv (sınır öncesi) ve MySQL (sınır sonrası) sayfaları ayrık zaman aralıklarıdır; sıralı birleştirme yeterli."""
+    return list(heapq.merge(archived, live, key=lambda r: (r[0], r[1])))[:limit + 1]
+
+
+def iter_partitions(table_name, location_ids=None, start=None, end=None, batch_rows=None):
+    """
+    export için: arşiv satırlarını gün gün, her gün içinde (location_id, timestamp) sırasında
+    batch_rows'luk tuple listeleri olarak verir (bellekte en fazla bir gün).
+    """
+    batch_rows = batch_rows or settings.EXPORT_BATCH_ROWS
+    for day in archived_days(table_name):
+        day_start = datetime.combine(day, dtime())
+        if (start is not None and day_start + DAY <= start) or (end is not None and day_start >= end):
+            continue
+        lower = max(start, day_start) if start is not None else day_start
+        upper = min(end, day_start + DAY) if end is not None else day_start + DAY
+        table = scan(table_name, None, location_ids, lower, upper)
+        for offset in range(0, table.num_rows, batch_rows):
+            yield _rows(table.slice(offset, batch_rows))
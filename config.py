@@ -11,6 +11,62 @@ class Settings(BaseSettings):
     TEMPO_DAILY_HOUR: int = 2
     AIRNOW_INTERVAL_MINUTES: int = 30
     OPENWEATHER_INTERVAL_MINUTES: int = 30
+    AIRNOW_BASE_URL: str = "https://www.airnowapi.org"
+    OPENWEATHER_BASE_URL: str = "https://api.openweathermap.org"
+    AIRNOW_MAX_CONCURRENCY: int = 10
+    OPENWEATHER_MAX_CONCURRENCY: int = 50
+    HTTP_TIMEOUT_SECONDS: float = 15.0
+    HTTP_MAX_RETRIES: int = 3
+    HTTP_BACKOFF_SECONDS: float = 0.5
+    HTTP_BACKOFF_MAX_SECONDS: float = 10.0
+    AIRNOW_RATE_PER_MINUTE: float = 8.0
+    AIRNOW_BURST: int = 10
+    AIRNOW_DAILY_QUOTA: int | None = 12000
+    OPENWEATHER_RATE_PER_MINUTE: float = 60.0
+    OPENWEATHER_BURST: int = 10
+    OPENWEATHER_DAILY_QUOTA: int | None = 1000
+    QUOTA_INTERACTIVE_RESERVE: float = 0.1
+    AIRNOW_TILE_DEG: float = 10.0
+    AIRNOW_LAG_HOURS: int = 1
+    AIRNOW_STATION_RADIUS_KM: float = 40.0
+    AIRNOW_FANOUT_METHOD: str = "idw"
+    AIRNOW_IDW_POWER: float = 2.0
+    AIRNOW_IDW_MAX_STATIONS: int = 4
+    AIRNOW_CACHE_RESOLUTION_DEG: float = 0.25
+    AIRNOW_CACHE_TTL_SECONDS: int = 1800
+    OPENWEATHER_CACHE_RESOLUTION_DEG: float = 0.25
+    OPENWEATHER_CACHE_TTL_SECONDS: int = 600
+    RESPONSE_CACHE_MAX_ENTRIES: int = 50000
+    RESPONSE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # cache başına bellek sınırı (kompakt JSON baytları)
+    RESPONSE_CACHE_DISK: bool = True
+    RESPONSE_CACHE_PATH: Path = Path("cache/api_responses.sqlite")
+    FETCH_MAX_LOCATIONS: int = 500
+    JOB_HISTORY_SIZE: int = 1000
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_RECYCLE_SECONDS: int = 3600
+    TEMPO_WRITER_BATCH_SIZE: int = 5000
+    TEMPO_WRITER_FLUSH_SECONDS: float = 5.0
+    TEMPO_WRITER_MAX_PENDING: int = 50000
+    LOCATION_INDEX_REFRESH_SECONDS: int = 300
+    PREDICTION_CACHE_TTL_SECONDS: int = 300
+    PREDICTION_MAX_AGE_HOURS: int = 3
+    LATEST_CACHE_TTL_SECONDS: int = 60
+    BULK_MAX_LOCATIONS: int = 50000
+    EXPORT_BATCH_ROWS: int = 10000
+    ROLLUP_BATCH_SIZE: int = 5000
+    ROLLUP_INTERVAL_MINUTES: int = 10
+    ROLLUP_MIN_SPAN_MINUTES: int = 1440
+    PARTITION_PRECREATE_DAYS: int = 7
+    RETENTION_DAYS_TEMPO: int = 30
+    RETENTION_DAYS_AIRQUALITY: int = 60
+    RETENTION_DAYS_WEATHER: int = 60
+    RETENTION_DAYS_PREDICTIONS: int = 30
+    PARTITION_MAINTENANCE_HOUR: int = 3
+    ARCHIVE_ENABLED: bool = True
+    ARCHIVE_DIR: Path = Path("archive")
+    ARCHIVE_COMPRESSION: str = "zstd"
+    ARCHIVE_BATCH_ROWS: int = 100000
     ml_model_dir: Path
 
     class Config:
@@ -11,11 +11,26 @@ datetime → tarih/saat objesi oluşturmak için.
 
 timedelta → belli bir süreyi ifade eder (örn. son 24 saat).
 '''
+from typing import Iterable
+from sqlalchemy import func, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+'''
+Toplu (bulk) upsert için: tek bir çok satırlı INSERT ... ON DUPLICATE KEY UPDATE ifadesi üretir.
+'''
 from app import models
+from app.services import ingest_events
 '''
 ORM modellerini import ediyoruz (AirQualityData, WeatherData).
 
 Bu modeller veritabanındaki tablolara karşılık geliyor.
+
+ingest_events → commit sonrası "bu lokasyonların verisi değişti" olayını yayınlar (ör. tahmin önbelleği için).
+'''
+
+def _row_of(obj):
+    return {c.name: getattr(obj, c.name) for c in obj.__table__.columns}
+'''
+ORM nesnesini düz dict'e çevirir (ingest olayı ve önbellekler için; location ilişkisi hariç sadece kolonlar).
 '''
 
 # ----------------------------
@@ -53,6 +68,8 @@ Eğer varsa → existing değişkeni dolacak.
         if so2 is not None:
             existing.so2 = so2
         db.add(existing)
+        ingest_events.mark_changed(db, existing.__tablename__, [_row_of(existing)])
+        mark_rollup_dirty(db, existing.__tablename__, [_row_of(existing)])
         db.commit()
         db.refresh(existing)
         return existing
@@ -81,6 +98,8 @@ Eğer varsa → existing değişkeni dolacak.
             so2=so2,
         )
         db.add(new)
+        ingest_events.mark_changed(db, new.__tablename__, [_row_of(new)])
+        mark_rollup_dirty(db, new.__tablename__, [_row_of(new)])
         db.commit()
         db.refresh(new)
         return new
@@ -149,6 +168,8 @@ Parametreler: temperature, humidity, wind_speed, pressure vb.
         if pressure is not None:
             existing.pressure = pressure
         db.add(existing)
+        ingest_events.mark_changed(db, existing.__tablename__, [_row_of(existing)])
+        mark_rollup_dirty(db, existing.__tablename__, [_row_of(existing)])
         db.commit()
         db.refresh(existing)
         return existing
@@ -164,6 +185,8 @@ Parametreler: temperature, humidity, wind_speed, pressure vb.
             pressure=pressure,
         )
         db.add(new)
+        ingest_events.mark_changed(db, new.__tablename__, [_row_of(new)])
+        mark_rollup_dirty(db, new.__tablename__, [_row_of(new)])
         db.commit()
         db.refresh(new)
         return new
@@ -172,6 +195,46 @@ Kayıt yoksa yeni bir obje oluşturulur, eklenir ve döndürülür.
 '''
 
 
+def get_latest_weather(db: Session, location_id: int):
+    return (
+        db.query(models.WeatherData)
+        .filter(models.WeatherData.location_id == location_id)
+        .order_by(models.WeatherData.timestamp.desc())
+        .first()
+    )
+'''
+Belirli bir lokasyon için en son hava durumu ölçümünü getirir (son 24 saati yüklemeden).
+
+(location_id, timestamp) unique index'i sayesinde tek satır okunur.
+'''
+
+
+def get_latest_many(db: Session, model, location_ids: Iterable[int], fields: tuple, chunk_size: int = 5000):
+    table = model.__table__
+    location_ids = list(location_ids)
+    rows = []
+    for i in range(0, len(location_ids), chunk_size):
+        latest = (
+            db.query(table.c.location_id, func.max(table.c.timestamp).label("ts"))
+            .filter(table.c.location_id.in_(location_ids[i:i + chunk_size]))
+            .group_by(table.c.location_id)
+            .subquery()
+        )
+        rows.extend(
+            db.query(table.c.location_id, table.c.timestamp, *(table.c[f] for f in fields))
+            .join(latest, (table.c.location_id == latest.c.location_id) & (table.c.timestamp == latest.c.ts))
+            .all()
+        )
+    return rows
+'''
+Birden çok lokasyonun en son satırını tek sorguda getirir (her parça için bir sorgu).
+
+MAX(timestamp) ... GROUP BY location_id → (location_id, timestamp) unique index'i üzerinden çalışır.
+
+Dönüş: [(location_id, timestamp, alanlar...), ...] düz tuple listesi (ORM nesnesi yok).
+'''
+
+
 def get_last_24h_weather(db: Session, location_id: int):
     since = datetime.utcnow() - timedelta(hours=24)
     return (
@@ -195,4 +258,183 @@ upsert_air_quality / upsert_weather → var olan kaydı günceller, yoksa ekler.
 get_latest_air_quality → en güncel AQI kaydını döndürür.
 
 get_last_24h_air_quality / get_last_24h_weather → son 24 saatlik verileri listeler.
-'''
\ No newline at end of file
+'''
+
+# ----------------------------
+# Bulk upsert (çok satırlı INSERT ... ON DUPLICATE KEY UPDATE)
+# ----------------------------
+AIR_QUALITY_FIELDS = ("aqi", "pm25", "pm10", "o3", "co", "so2")
+WEATHER_FIELDS = ("temperature", "humidity", "wind_speed", "pressure")
+TEMPO_FIELDS = ("o3", "no2", "hcho", "so2", "co", "aerosol_index")
+BULK_CHUNK_SIZE = 1000
+
+
+DEFAULT_KEY_FIELDS = ("location_id", "timestamp")
+PREDICTION_FIELDS = ("predicted_aqi",)
+PREDICTION_KEY_FIELDS = ("location_id", "timestamp", "model_version")
+
+# Zaman serisi tabloları: tablo adı -> (model, değer alanları); export / history API'leri kullanır
+TIMESERIES_TABLES = {
+    "airqualitydata": (models.AirQualityData, AIR_QUALITY_FIELDS),
+    "weatherdata": (models.WeatherData, WEATHER_FIELDS),
+    "tempodata": (models.TempoData, TEMPO_FIELDS),
+    "predictions": (models.Predictions, ("model_version",) + PREDICTION_FIELDS),
+}
+# Saatlik/günlük rollup'ı tutulan ölçüm tabloları
+ROLLUP_TABLES = ("airqualitydata", "weatherdata", "tempodata")
+
+
+def mark_rollup_dirty(db: Session, source: str, rows: Iterable[dict]):
+    if source not in ROLLUP_TABLES:
+        return
+    buckets = {(row["location_id"], row["timestamp"].replace(minute=0, second=0, microsecond=0)) for row in rows}
+    if not buckets:
+        return
+    table = models.RollupDirty.__table__
+    stmt = mysql_insert(table).values(
+        [{"source": source, "location_id": l, "bucket_start": b, "version": 1} for l, b in sorted(buckets)]
+    )
+    db.execute(stmt.on_duplicate_key_update(version=table.c.version + 1))
+'''
+Yazılan satırların saatlik kovalarını rollup_dirty tablosuna işaretler (upsert ile aynı transaction içinde).
+
+Rollup işi (app.services.rollups) sadece bu kovaları yeniden hesaplar; tüm tablo taranmaz.
+
+version her yazmada artar: hesaplama sırasında gelen yeni yazma, kovanın tekrar hesaplanmasını garanti eder.
+'''
+
+
+def _dedupe_rows(rows: Iterable[dict], fields: tuple, key_fields: tuple = DEFAULT_KEY_FIELDS):
+    '''
+    Aynı unique key (varsayılan: location_id, timestamp) için gelen satırları birleştirir.
+
+Sonraki satırdaki None olmayan değerler öncekini ezer (tekli upsert ile aynı davranış).
+    '''
+    merged = {}
+    for row in rows:
+        key = tuple(row[k] for k in key_fields)
+        current = merged.get(key)
+        if current is None:
+            current = merged[key] = {**dict(zip(key_fields, key)), **{f: None for f in fields}}
+        for f in fields:
+            value = row.get(f)
+            if value is not None:
+                current[f] = value
+    return list(merged.values())
+
+
+def _bulk_upsert(db: Session, model, rows: Iterable[dict], fields: tuple, chunk_size: int, commit: bool, key_fields: tuple = DEFAULT_KEY_FIELDS):
+    '''
+    Ortak bulk upsert: satırları parçalara böler, her parça için
+
+1) unique key (varsayılan: location_id, timestamp) üzerinden kaç satırın zaten var olduğunu sayar,
+
+2) tek bir çok satırlı INSERT ... ON DUPLICATE KEY UPDATE gönderir.
+
+Hepsi tek transaction içinde çalışır; hata olursa rollback yapılır.
+
+Değişen lokasyonlar ingest_events'e işaretlenir; olay ancak commit olunca yayınlanır (commit=False ise çağıranın commit'inde).
+    '''
+    rows = _dedupe_rows(rows, fields, key_fields)
+    table = model.__table__
+    key_columns = tuple_(*(table.c[k] for k in key_fields))
+    inserted = updated = 0
+    try:
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
+            keys = [tuple(r[k] for k in key_fields) for r in chunk]
+            existing = (
+                db.query(func.count())
+                .select_from(model)
+                .filter(key_columns.in_(keys))
+                .scalar()
+            )
+            stmt = mysql_insert(table).values(chunk)
+            # None gelen alan mevcut değeri ezmesin
+            stmt = stmt.on_duplicate_key_update({f: func.coalesce(stmt.inserted[f], table.c[f]) for f in fields})
+            db.execute(stmt)
+            ingest_events.mark_changed(db, table.name, chunk)
+            mark_rollup_dirty(db, table.name, chunk)
+            updated += existing
+            inserted += len(chunk) - existing
+        if commit:
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return {"inserted": inserted, "updated": updated}
+
+
+def bulk_upsert_air_quality(db: Session, rows: Iterable[dict], chunk_size: int = BULK_CHUNK_SIZE, commit: bool = True):
+    return _bulk_upsert(db, models.AirQualityData, rows, AIR_QUALITY_FIELDS, chunk_size, commit)
+'''
+rows → {"location_id", "timestamp", "aqi", "pm25", ...} sözlüklerinden oluşan iterable.
+
+uniq_airqualitydata (location_id, timestamp) unique key'ine dayanır.
+
+Dönüş: {"inserted": eklenen satır sayısı, "updated": güncellenen satır sayısı}.
+
+commit=False verilirse çağıran taraf başka yazmalarla aynı transaction'da commit eder.
+'''
+
+
+def bulk_upsert_weather(db: Session, rows: Iterable[dict], chunk_size: int = BULK_CHUNK_SIZE, commit: bool = True):
+    return _bulk_upsert(db, models.WeatherData, rows, WEATHER_FIELDS, chunk_size, commit)
+'''
+Hava durumu için bulk upsert; uniq_weatherdata (location_id, timestamp) unique key'ine dayanır.
+'''
+
+
+def bulk_upsert_forecasts(db: Session, rows: Iterable[dict], chunk_size: int = BULK_CHUNK_SIZE, commit: bool = True):
+    return _bulk_upsert(db, models.WeatherForecasts, rows, WEATHER_FIELDS + ("issued_at",), chunk_size, commit)
+'''
+Saatlik hava durumu tahminleri; uniq_weather_forecasts (location_id, timestamp) unique key'ine dayanır.
+
+Tahminler weatherdata'ya yazılmaz: son değer, özellikler, rollup, history ve export sadece gözlemleri görür.
+'''
+
+
+def delete_past_forecasts(db: Session, location_ids: Iterable[int], before: datetime, commit: bool = True):
+    table = models.WeatherForecasts.__table__
+    location_ids = list(location_ids)
+    deleted = 0
+    for i in range(0, len(location_ids), BULK_CHUNK_SIZE):
+        deleted += db.execute(
+            table.delete().where(table.c.location_id.in_(location_ids[i:i + BULK_CHUNK_SIZE]), table.c.timestamp < before)
+        ).rowcount
+    if commit:
+        db.commit()
+    return deleted
+'''
+Saati geçmiş tahminleri siler (yerlerini gözlemler almıştır); tablo lokasyon başına ~48 satırda kalır.
+'''
+
+
+def get_forecast(db: Session, location_id: int, since: datetime):
+    return (
+        db.query(models.WeatherForecasts)
+        .filter(models.WeatherForecasts.location_id == location_id, models.WeatherForecasts.timestamp >= since)
+        .order_by(models.WeatherForecasts.timestamp.asc())
+        .all()
+    )
+
+
+def bulk_upsert_tempo(db: Session, rows: Iterable[dict], chunk_size: int = BULK_CHUNK_SIZE, commit: bool = True):
+    return _bulk_upsert(db, models.TempoData, rows, TEMPO_FIELDS, chunk_size, commit)
+'''
+TEMPO gaz değerleri için bulk upsert; uniq_tempodata (location_id, timestamp) unique key'ine dayanır.
+
+Gaz başına ayrı yazmalarda diğer gazların değeri korunur (COALESCE).
+'''
+
+
+def bulk_upsert_predictions(db: Session, rows: Iterable[dict], chunk_size: int = BULK_CHUNK_SIZE, commit: bool = True):
+    return _bulk_upsert(db, models.Predictions, rows, PREDICTION_FIELDS + ("input_timestamp",), chunk_size, commit, PREDICTION_KEY_FIELDS)
+'''
+Tahminler için bulk upsert; uniq_predictions (location_id, timestamp, model_version) unique key'ine dayanır.
+
+input_timestamp → tahmin girdisinin en yeni timestamp'i (tahmin önbelleğinin bayatlık işareti).
+
+Aynı model sürümü aynı saat için tekrar çalışırsa satır güncellenir, yeni satır oluşmaz.
+'''
+
@@ -1,10 +1,10 @@
 # app/api/v1/routers/data.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from app.core.config import settings
 from app.db.session import get_db
-from app.services.data_fetcher import fetch_weather_data, fetch_air_quality_data
-from app.services import tempo_service
-from app import crud
+from app.services import fetch_jobs, rate_limiter, response_cache, tempo_service
+from app.schemas import FetchLocation
 
 router = APIRouter()
 
@@ -12,31 +12,79 @@ router = APIRouter()
 # Weather + AQI veri çekme endpoint
 # ----------------------------
 @router.post("/fetch-and-save/{location_id}")
-def fetch_and_save(
+async def fetch_and_save(
     location_id: int,
     city: str,
     lat: float,
     lon: float,
+    background: bool = Query(False, description="true: iş id'si hemen döner, durum /data/jobs/{job_id}"),
     db: Session = Depends(get_db)
 ):
     """
-    Belirtilen konum için hava durumu ve AQI verilerini çekip DB'ye kaydeder
+    Belirtilen konum için hava durumu ve AQI verilerini çekip DB'ye kaydeder.
+    İki sağlayıcı aynı anda çağrılır (gecikme ≈ en yavaş sağlayıcı), iki sonuç tek transaction'da yazılır.
+    Bir sağlayıcı başarısız olup diğerinin verisi yazıldıysa 200 + status "partial" ve "failed" listesi;
+    hiçbir şey yazılmadıysa (hava durumu ve AQ ikisi de yok) 429/502.
     """
-    # Weather verisi
-    weather = fetch_weather_data(lat, lon)
-    crud.upsert_weather(db, location_id=location_id, **weather)
-
-    # AirQuality verisi
-    aqi = fetch_air_quality_data(city)
-    if aqi:
-        crud.upsert_air_quality(db, location_id=location_id, **aqi)
+    location = {"location_id": location_id, "city": city, "lat": lat, "lon": lon}
+    if background:
+        return {"status": "accepted", "job_id": fetch_jobs.jobs.submit([location])}
+    result = await fetch_jobs.fetch_and_save(db, [location])
+    weather_errors = [f for f in result["failed"] if f["source"] == "weather"]
+    if weather_errors and location_id not in result["air_quality"]["timestamps"]:
+        # Hiçbir şey yazılmadı: hata kodu. AQ satırı commit edildiyse 200 + "failed" (toplu endpoint ile aynı)
+        status_code = 429 if weather_errors[0]["quota"] else 502
+        raise HTTPException(status_code=status_code, detail=f"OpenWeather hatası: {weather_errors[0]['error']}")
 
     return {
-        "status": "success",
-        "weather_timestamp": weather["timestamp"],
-        "aqi_timestamp": aqi["timestamp"] if aqi else None
+        # Buraya gelindiyse en az bir sağlayıcının verisi yazıldı
+        "status": "partial" if result["failed"] else "success",
+        "weather": result["weather"],
+        "aqi_timestamp": result["air_quality"]["timestamps"].get(location_id),
+        "failed": result["failed"],
+        "timings": result["timings"],
     }
 
+@router.post("/fetch-and-save")
+async def fetch_and_save_many(
+    locations: list[FetchLocation] = Body(..., embed=True),
+    background: bool = Query(False),
+    db: Session = Depends(get_db)
+):
+    """
+    Çok lokasyonlu fetch-and-save: tüm lokasyonlar ve iki sağlayıcı eşzamanlı çekilir (limiter/önbellek üzerinden),
+    tüm satırlar tek transaction'da yazılır. Başarısız lokasyon/sağlayıcılar "failed" listesinde.
+    """
+    if not locations:
+        raise HTTPException(status_code=400, detail="locations boş olamaz")
+    if len(locations) > settings.FETCH_MAX_LOCATIONS:
+        raise HTTPException(status_code=400, detail=f"En fazla {settings.FETCH_MAX_LOCATIONS} lokasyon gönderilebilir")
+    items = [location.model_dump() for location in locations]
+    if background:
+        return {"status": "accepted", "job_id": fetch_jobs.jobs.submit(items)}
+    return {"status": "success", **await fetch_jobs.fetch_and_save(db, items)}
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Arka plan fetch-and-save işinin durumu: pending | running | done | failed (+ sonuç veya hata)."""
+    job = fetch_jobs.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="İş bulunamadı")
+    return job
+
+# ----------------------------
+# Dış API limiter metrikleri
+# ----------------------------
+@router.get("/rate-limits")
+def get_rate_limits():
+    """AirNow / OpenWeather token bucket durumu, bekleme süreleri, reddedilen istekler ve günlük kota kullanımı."""
+    return rate_limiter.metrics()
+
+@router.get("/api-cache")
+def get_api_cache():
+    """AirNow / OpenWeather yanıt önbelleği: bellek/disk isabetleri, birleşen istekler, isabet oranı."""
+    return response_cache.metrics()
+
 # ----------------------------
 # TEMPO veri çekme endpoint
 # ----------------------------
@@ -0,0 +1,151 @@
+# app/db/writer.py
+import queue
+import threading
+import time
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app import crud
+
+# --------------------------
+# Tamponlu DB yazıcı
+# Satırlar kuyrukta birikir; batch_size dolunca veya flush_interval geçince
+# arka plan thread'i tek bir bulk upsert ile yazar.
+# Kuyruk max_pending ile sınırlı: DB geride kalırsa add() bekler (backpressure).
+# Aynı yazıcıyı paylaşan işler kendi satırlarını begin() ile alınan batch id'siyle ekler;
+# flush(batch_id) sadece o işin satırlarını bekler ve sadece onun hatalarını döndürür.
+# --------------------------
+class BufferedWriter:
+    def __init__(self, write_batch, batch_size=5000, flush_interval=5.0, max_pending=50000, retries=3, name="writer"):
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.name = name
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._flush_requested = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+        self.stats = {"written": 0, "batches": 0, "failed_rows": 0}
+        self._tickets = {None: {"pending": 0, "failed": 0}}  # batch id -> bekleyen/yazılamayan satır sayısı
+        self._next_ticket = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def begin(self):
+        """Yeni batch id'si: add/add_many'ye verilir, flush(batch_id) ile sonucu alınır."""
+        with self._lock:
+            self._next_ticket += 1
+            self._tickets[self._next_ticket] = {"pending": 0, "failed": 0}
+            return self._next_ticket
+
+    def add(self, row, timeout=None, batch=None):
+        with self._lock:
+            self._tickets[batch]["pending"] += 1
+        self._queue.put((batch, row), timeout=timeout)
+
+    def add_many(self, rows, timeout=None, batch=None):
+        for row in rows:
+            self.add(row, timeout=timeout, batch=batch)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def flush(self, batch=None):
+        """
+        batch verilirse o batch'in satırları yazılana kadar bekler ve sadece onun yazılamayan satır sayısını döndürür
+        (batch kaydı silinir). batch yoksa tüm kuyruğu bekler; dönüş batch'siz eklenen satırların hatalarıdır.
+        """
+        self._flush_requested.set()
+        if batch is None:
+            self._queue.join()
+            with self._lock:
+                failed, self._tickets[None]["failed"] = self._tickets[None]["failed"], 0
+            return failed
+        with self._done:
+            self._done.wait_for(lambda: self._tickets[batch]["pending"] == 0)
+            return self._tickets.pop(batch)["failed"]
+
+    def close(self):
+        self.flush()
+        self._stopped.set()
+        self._thread.join()
+
+    def _write(self, batch):
+        rows = [row for _, row in batch]
+        ok = False
+        for attempt in range(1, self.retries + 1):
+            try:
+                self.write_batch(rows)
+                ok = True
+                break
+            except Exception as e:
+                print(f"⚠ {self.name} yazma hatası (deneme {attempt}/{self.retries}): {e}")
+                if attempt < self.retries:
+                    time.sleep(min(2 ** attempt, 30))
+        with self._done:
+            if ok:
+                self.stats["written"] += len(batch)
+                self.stats["batches"] += 1
+            else:
+                self.stats["failed_rows"] += len(batch)
+            for ticket, _ in batch:
+                state = self._tickets[ticket]
+                state["pending"] -= 1
+                if not ok:
+                    state["failed"] += 1
+            self._done.notify_all()
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while not self._stopped.is_set() or batch:
+            try:
+                batch.append(self._queue.get(timeout=max(0.05, min(0.5, deadline - time.monotonic()))))
+            except queue.Empty:
+                pass
+            # Kuyrukta hazır bekleyenleri de aynı batch'e al
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            due = time.monotonic() >= deadline or self._flush_requested.is_set() or self._stopped.is_set()
+            if len(batch) >= self.batch_size or (batch and due):
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+                batch = []
+            if due:
+                deadline = time.monotonic() + self.flush_interval
+                if self._queue.empty():
+                    self._flush_requested.clear()
+
+
+# --------------------------
+# TEMPO yazıcısı (process başına tek, havuzlu engine üzerinden)
+# --------------------------
+def _write_tempo_batch(rows):
+    db = SessionLocal()
+    try:
+        crud.bulk_upsert_tempo(db, rows)
+    finally:
+        db.close()
+
+_tempo_writer = None
+_tempo_writer_lock = threading.Lock()
+
+def get_tempo_writer():
+    global _tempo_writer
+    with _tempo_writer_lock:
+        if _tempo_writer is None:
+            _tempo_writer = BufferedWriter(
+                _write_tempo_batch,
+                batch_size=settings.TEMPO_WRITER_BATCH_SIZE,
+                flush_interval=settings.TEMPO_WRITER_FLUSH_SECONDS,
+                max_pending=settings.TEMPO_WRITER_MAX_PENDING,
+                name="tempo-writer",
+            )
+        return _tempo_writer
@@ -0,0 +1,200 @@
+# app/api/v1/routers/export.py
+import csv
+import io
+import itertools
+import json
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from app import crud, models
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services import archive, spatial_index
+from app.services.ingest_events import naive_utc
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # opsiyonel: sadece format=parquet için gerekli
+    pa = pq = None
+
+router = APIRouter()
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+# --------------------------
+# Sorgu: filtreler + sunucu tarafı cursor
+# --------------------------
+def build_export_query(table_name, location_ids=None, bbox=None, start=None, end=None):
+    model, fields = crud.TIMESERIES_TABLES[table_name]
+    table = model.__table__
+    columns = [table.c.location_id, table.c.timestamp] + [table.c[f] for f in fields]
+    stmt = select(*columns)
+    if location_ids is not None:
+        stmt = stmt.where(table.c.location_id.in_(location_ids))
+    if bbox is not None:
+        # bbox SQL tarafında locations join'i ile: id listesi belleğe alınmaz
+        min_lat, min_lon, max_lat, max_lon = bbox
+        locations = models.Locations.__table__
+        stmt = stmt.join(locations, locations.c.location_id == table.c.location_id).where(
+            locations.c.latitude.between(min_lat, max_lat),
+            locations.c.longitude.between(min_lon, max_lon),
+        )
+    if start is not None:
+        stmt = stmt.where(table.c.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(table.c.timestamp < end)
+    # (location_id, timestamp) unique index sırası: filesort yok
+    return stmt.order_by(table.c.location_id, table.c.timestamp), columns
+
+
+def _bbox_location_ids(box):
+    # Arşivde locations join'i yok: bbox bellekteki konum indeksiyle id listesine çevrilir
+    db = SessionLocal()
+    try:
+        index = spatial_index.get_location_index(db)
+        return index.within_bbox(*box).tolist() if index is not None else []
+    finally:
+        db.close()
+
+
+def stream_partitions(stmt, batch_rows):
+    """Kendi session'ı ile server-side cursor (stream_results) açar, satırları parça parça verir."""
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=batch_rows))
+        for partition in result.partitions(batch_rows):
+            yield partition
+    finally:
+        db.close()
+
+
+# --------------------------
+# Formatlar
+# --------------------------
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def write_ndjson(partitions, names):
+    for partition in partitions:
+        yield "".join(
+            json.dumps(dict(zip(names, map(_json_value, row))), default=float) + "\n" for row in partition
+        ).encode("utf-8")
+
+
+def write_csv(partitions, names):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for partition in partitions:
+        writer.writerows(partition)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """ParquetWriter'ın yazdığı baytları biriktirir; her row group sonrası boşaltılır."""
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def write_parquet(partitions, columns):
+    schema = pa.schema([(c.name, archive.arrow_type(c)) for c in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        for partition in partitions:
+            arrays = [pa.array(list(values), type=field.type) for values, field in zip(zip(*partition), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))  # her parça bir row group
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+# --------------------------
+# Endpoint
+# --------------------------
+@router.get("/{table_name}")
+def export_table(
+    table_name: str,
+    format: str = Query("ndjson"),
+    ids: str | None = Query(None, description="Virgülle ayrılmış location_id listesi"),
+    bbox: str | None = Query(None, description="min_lat,min_lon,max_lat,max_lon"),
+    start: datetime | None = Query(None),
+    end: datetime | None = Query(None),
+):
+    """
+    Zaman serisi tablosunu (airqualitydata, weatherdata, tempodata, predictions) akış halinde indirir.
+    Bellek kullanımı sabit: satırlar server-side cursor'dan EXPORT_BATCH_ROWS'luk parçalarla okunup yazılır.
+    Aralık Parquet arşivine uzanıyorsa önce arşivdeki günler (gün gün, gün içinde location_id sıralı), sonra MySQL satırları gelir.
+    """
+    if table_name not in crud.TIMESERIES_TABLES:
+        raise HTTPException(status_code=404, detail=f"Bilinmeyen tablo: {table_name}")
+    start, end = naive_utc(start), naive_utc(end)  # DB kolonları ve arşiv sınırı naive UTC
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format şunlardan biri olmalı: {', '.join(FORMATS)}")
+    if format == "parquet" and pq is None:
+        raise HTTPException(status_code=400, detail="Parquet için pyarrow kurulu değil")
+    try:
+        location_ids = spatial_index.parse_ids(ids) if ids else None
+        box = spatial_index.parse_bbox(bbox) if bbox else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    archived, live_start = iter(()), start
+    boundary = archive.archived_until(table_name)
+    if boundary is not None and (start is None or start < boundary):
+        archive_ids = _bbox_location_ids(box) if box is not None else location_ids
+        archived = archive.iter_partitions(
+            table_name, archive_ids, start, min(end, boundary) if end else boundary, settings.EXPORT_BATCH_ROWS
+        )
+        live_start = max(start, boundary) if start else boundary
+
+    stmt, columns = build_export_query(table_name, location_ids, box, live_start, end)
+    names = [c.name for c in columns]
+    live = stream_partitions(stmt, settings.EXPORT_BATCH_ROWS) if end is None or live_start is None or live_start < end else iter(())
+    partitions = itertools.chain(archived, live)
+    if format == "ndjson":
+        body = write_ndjson(partitions, names)
+    elif format == "csv":
+        body = write_csv(partitions, names)
+    else:
+        body = write_parquet(partitions, columns)
+
+    media_type, extension = FORMATS[format]
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{table_name}.{extension}"'},
+    )
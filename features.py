@@ -0,0 +1,223 @@
+# app/ml/features.py
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import and_, case, func, select
+
+from app import models
+
+# --------------------------
+# Özellik tanımı (feature spec)
+# agg: avg | max | last | trend (saat başına eğim, en küçük kareler)
+# default: veri yoksa kullanılan sabit değer (model eğitim ortalamalarını taşımıyorsa)
+# --------------------------
+Feature = namedtuple("Feature", "name table column agg hours default")
+
+_AIR = models.AirQualityData.__table__
+_WEATHER = models.WeatherData.__table__
+_TEMPO = models.TempoData.__table__
+
+FEATURE_SPEC = (
+    # İlk özellik eski tek özellikli modelin girdisi (son 24 saatin ortalama AQI'si)
+    Feature("aqi_avg_24h", _AIR, "aqi", "avg", 24, 50.0),
+    Feature("aqi_avg_3h", _AIR, "aqi", "avg", 3, 50.0),
+    Feature("aqi_max_24h", _AIR, "aqi", "max", 24, 60.0),
+    Feature("aqi_last", _AIR, "aqi", "last", 24, 50.0),
+    Feature("aqi_trend_24h", _AIR, "aqi", "trend", 24, 0.0),
+    Feature("pm25_avg_3h", _AIR, "pm25", "avg", 3, 10.0),
+    Feature("pm25_avg_24h", _AIR, "pm25", "avg", 24, 10.0),
+    Feature("pm25_max_24h", _AIR, "pm25", "max", 24, 15.0),
+    Feature("pm10_avg_24h", _AIR, "pm10", "avg", 24, 20.0),
+    Feature("o3_avg_24h", _AIR, "o3", "avg", 24, 30.0),
+    Feature("temperature_last", _WEATHER, "temperature", "last", 24, 15.0),
+    Feature("temperature_avg_24h", _WEATHER, "temperature", "avg", 24, 15.0),
+    Feature("humidity_avg_3h", _WEATHER, "humidity", "avg", 3, 60.0),
+    Feature("wind_speed_avg_3h", _WEATHER, "wind_speed", "avg", 3, 3.0),
+    Feature("wind_speed_max_24h", _WEATHER, "wind_speed", "max", 24, 6.0),
+    Feature("pressure_trend_24h", _WEATHER, "pressure", "trend", 24, 0.0),
+    # TEMPO: granül dışı/bulutlu lokasyonlar çok; eğitimde de boş değer 0 kabul edilmeli
+    Feature("tempo_no2_avg_24h", _TEMPO, "no2", "avg", 24, 0.0),
+    Feature("tempo_no2_last", _TEMPO, "no2", "last", 24, 0.0),
+    Feature("tempo_o3_avg_24h", _TEMPO, "o3", "avg", 24, 0.0),
+    Feature("tempo_hcho_avg_24h", _TEMPO, "hcho", "avg", 24, 0.0),
+)
+FEATURES = {f.name: f for f in FEATURE_SPEC}
+FEATURE_NAMES = tuple(FEATURES)
+LEGACY_FEATURE_NAMES = ("aqi_avg_24h",)
+
+IN_CHUNK_SIZE = 5000
+
+
+# --------------------------
+# Model ↔ spec kontrolü
+# --------------------------
+def resolve_model_features(model):
+    """
+    Modelin beklediği özellik isimlerini (sırasıyla) döndürür, spec'e uymuyorsa ValueError.
+    feature_names_in_ (DataFrame ile eğitilmiş model) → isimler spec'te olmalı.
+    Sadece n_features_in_ → 1 ise eski ortalama-AQI modeli, len(spec) ise tam spec sırası.
+    """
+    names = getattr(model, "feature_names_in_", None)
+    if names is not None:
+        names = tuple(str(n) for n in names)
+        unknown = [n for n in names if n not in FEATURES]
+        if unknown:
+            raise ValueError(f"Model spec dışı özellik bekliyor: {unknown}")
+        return names
+    n_features = getattr(model, "n_features_in_", 1)
+    if n_features == 1:
+        return LEGACY_FEATURE_NAMES
+    if n_features == len(FEATURE_NAMES):
+        return FEATURE_NAMES
+    raise ValueError(f"Model {n_features} özellik bekliyor; spec {len(FEATURE_NAMES)} özellik tanımlıyor")
+
+
+# --------------------------
+# SQL ifadeleri
+# --------------------------
+def _aggregate_expr(feature, now, now_epoch):
+    table = feature.table
+    value = table.c[feature.column]
+    in_window = and_(table.c.timestamp >= now - timedelta(hours=feature.hours), value.isnot(None))
+    if feature.agg == "avg":
+        return func.avg(case((in_window, value)))
+    if feature.agg == "max":
+        return func.max(case((in_window, value)))
+    if feature.agg == "trend":
+        # x: şimdiye göre saat (küçük sayılar → hassasiyet kaybı yok)
+        x = (func.unix_timestamp(table.c.timestamp) - now_epoch) / 3600.0
+        n = func.count(case((in_window, value)))
+        sx = func.sum(case((in_window, x)))
+        sy = func.sum(case((in_window, value)))
+        sxy = func.sum(case((in_window, x * value)))
+        sxx = func.sum(case((in_window, x * x)))
+        return (n * sxy - sx * sy) / func.nullif(n * sxx - sx * sx, 0)
+    raise ValueError(f"Bilinmeyen agg: {feature.agg}")
+
+
+def _id_chunks(location_ids):
+    if location_ids is None:
+        yield None
+        return
+    location_ids = list(location_ids)
+    for i in range(0, len(location_ids), IN_CHUNK_SIZE):
+        yield location_ids[i:i + IN_CHUNK_SIZE]
+
+
+def _aggregate_rows(db, table, feats, location_ids, now):
+    """Tablo başına tek GROUP BY: avg/max/trend özellikleri koşullu aggregate olarak."""
+    hours = max(f.hours for f in feats)
+    now_epoch = (now - datetime(1970, 1, 1)).total_seconds()
+    columns = [_aggregate_expr(f, now, now_epoch).label(f.name) for f in feats]
+    for ids in _id_chunks(location_ids):
+        stmt = (
+            select(table.c.location_id, *columns)
+            .where(table.c.timestamp >= now - timedelta(hours=hours), table.c.timestamp <= now)
+            .group_by(table.c.location_id)
+        )
+        if ids is not None:
+            stmt = stmt.where(table.c.location_id.in_(ids))
+        yield from db.execute(stmt).all()
+
+
+def _last_rows(db, table, feats, location_ids, now):
+    """Pencere içindeki en son satırın değerleri (location_id, MAX(timestamp) join'i)."""
+    hours = max(f.hours for f in feats)
+    for ids in _id_chunks(location_ids):
+        latest = (
+            select(table.c.location_id, func.max(table.c.timestamp).label("ts"))
+            .where(table.c.timestamp >= now - timedelta(hours=hours), table.c.timestamp <= now)
+            .group_by(table.c.location_id)
+        )
+        if ids is not None:
+            latest = latest.where(table.c.location_id.in_(ids))
+        latest = latest.subquery()
+        stmt = select(table.c.location_id, *(table.c[f.column].label(f.name) for f in feats)).join(
+            latest, and_(table.c.location_id == latest.c.location_id, table.c.timestamp == latest.c.ts)
+        )
+        yield from db.execute(stmt).all()
+
+
+# --------------------------
+# Özellik matrisi: (location_ids, X) NumPy dizileri, ORM nesnesi yok
+# --------------------------
+def build_feature_matrix(db, location_ids=None, names=FEATURE_NAMES, now=None):
+    """
+    names sırasıyla (n_lokasyon, n_özellik) float matrisi döndürür; veri yoksa NaN.
+    Sadece names'in ihtiyaç duyduğu tablolar sorgulanır (tablo başına en fazla 2 sorgu).
+    """
+    now = now or datetime.utcnow()
+    column_of = {name: i for i, name in enumerate(names)}
+    groups = {}
+    for name in names:
+        feature = FEATURES[name]
+        kind = "last" if feature.agg == "last" else "aggregate"
+        groups.setdefault((feature.table.name, kind), (feature.table, kind, []))[2].append(feature)
+
+    values = {}
+    for table, kind, feats in groups.values():
+        fetch = _last_rows if kind == "last" else _aggregate_rows
+        idx = [column_of[f.name] for f in feats]
+        for row in fetch(db, table, feats, location_ids, now):
+            values.setdefault(row[0], {}).update(zip(idx, row[1:]))
+
+    ids = np.array(sorted(values), dtype=np.int64)
+    X = np.full((len(ids), len(names)), np.nan, dtype=float)
+    for r, location_id in enumerate(ids.tolist()):
+        for c, value in values[location_id].items():
+            if value is not None:
+                X[r, c] = float(value)
+    return ids, X
+
+
+def fill_values(model, names):
+    """
+    Eksik değer için sütun başına sabit dolgu: modelle birlikte kaydedilmiş eğitim ortalamaları
+    (model.feature_fill_values_ = {isim: değer}, joblib.dump'tan önce atanır), yoksa FEATURE_SPEC varsayılanı.
+    Sabit olduğu için bir lokasyonun tahmini endpoint'e ve batch'teki diğer lokasyonlara bağlı değildir.
+    """
+    trained = getattr(model, "feature_fill_values_", None) or {}
+    return np.array([float(trained.get(name, FEATURES[name].default)) for name in names], dtype=float)
+
+
+def impute_missing(X, fill):
+    """Eksik değerleri (NaN) fill_values ile doldurur."""
+    if not np.isnan(X).any():
+        return X
+    return np.where(np.isnan(X), fill, X)
+
+
+def input_marks(db, location_ids=None, names=FEATURE_NAMES, now=None):
+    """
+    Lokasyon başına tahmin girdisinin DB'de görünen işareti: names'in okuduğu tablolardaki en yeni
+    (pencere içi, şimdiden ileri olmayan) timestamp. Başka process'in yazdığı veri de burada görünür;
+    tahmin önbelleği bu değeri tahminle birlikte saklar ve büyümüşse tahmini bayat sayar.
+    """
+    now = now or datetime.utcnow()
+    tables = {}
+    for name in names:
+        feature = FEATURES[name]
+        tables[feature.table.name] = (feature.table, max(feature.hours, tables.get(feature.table.name, (None, 0))[1]))
+    marks = {}
+    for table, hours in tables.values():
+        for ids in _id_chunks(location_ids):
+            stmt = (
+                select(table.c.location_id, func.max(table.c.timestamp))
+                .where(table.c.timestamp >= now - timedelta(hours=hours), table.c.timestamp <= now)
+                .group_by(table.c.location_id)
+            )
+            if ids is not None:
+                stmt = stmt.where(table.c.location_id.in_(ids))
+            for location_id, timestamp in db.execute(stmt).all():
+                if timestamp is not None and (location_id not in marks or timestamp > marks[location_id]):
+                    marks[location_id] = timestamp
+    return marks
+
+
+def rows_with_history(X, names):
+    """Hava kalitesi geçmişi olan satırların maskesi (names'te airqualitydata özelliği yoksa hepsi True)."""
+    air = [i for i, name in enumerate(names) if FEATURES[name].table is _AIR]
+    if not air:
+        return np.ones(len(X), dtype=bool)
+    return ~np.isnan(X[:, air]).all(axis=1)
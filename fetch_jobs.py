@@ -0,0 +1,149 @@
+# app/services/fetch_jobs.py
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from app import crud
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services import airnow_service, openweather_service, rate_limiter, weather_ingest
+
+
+# --------------------------
+# Çekme: her lokasyon için iki sağlayıcı aynı anda (gecikme ≈ en yavaş sağlayıcı)
+# --------------------------
+async def _fetch_one(location):
+    weather, aqi = await asyncio.gather(
+        openweather_service.fetch_onecall_async(location["lat"], location["lon"]),
+        # İki sağlayıcı da paylaşılan limiter/kota/önbellek üzerinden: interaktif öncelik ikisine de uygulanır
+        airnow_service.fetch_current_row_async(location["lat"], location["lon"]),
+        return_exceptions=True,
+    )
+    return location, weather, aqi
+
+
+async def fetch_locations(locations):
+    """locations: [{"location_id", "city", "lat", "lon"}] → [(location, One Call JSON | Exception, AQ dict | None | Exception)]"""
+    with rate_limiter.priority_scope(rate_limiter.PRIORITY_INTERACTIVE):
+        return await asyncio.gather(*(_fetch_one(location) for location in locations))
+
+
+# --------------------------
+# Yazma: tüm lokasyonların hava durumu + hava kalitesi satırları tek transaction'da
+# --------------------------
+def save_results(db, results):
+    started = time.monotonic()
+    payloads, aq_rows, failed = [], [], []
+    for location, weather, aqi in results:
+        location_id = location["location_id"]
+        if isinstance(weather, Exception):
+            failed.append({"location_id": location_id, "source": "weather", "error": str(weather), "quota": isinstance(weather, rate_limiter.QuotaExceeded)})
+        else:
+            payloads.append((location_id, weather))
+        if isinstance(aqi, Exception):
+            failed.append({"location_id": location_id, "source": "air_quality", "error": str(aqi), "quota": isinstance(aqi, rate_limiter.QuotaExceeded)})
+        elif aqi:
+            aq_rows.append({"location_id": location_id, **aqi})
+    try:
+        weather = weather_ingest.ingest_payloads(db, payloads, commit=False)
+        air_quality = crud.bulk_upsert_air_quality(db, aq_rows, commit=False) if aq_rows else {"inserted": 0, "updated": 0}
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    timings = weather.pop("timings")
+    timings["save_s"] = round(time.monotonic() - started, 4)
+    return {
+        "locations": len(results),
+        "weather": weather,
+        "air_quality": {**air_quality, "timestamps": {r["location_id"]: r["timestamp"] for r in aq_rows}},
+        "failed": failed,
+        "timings": timings,
+    }
+    '''
+    Bir lokasyonun bir sağlayıcısı başarısız olsa da diğer veriler yazılır; hatalar "failed" listesinde döner.
+    Yazma hatası olursa hiçbir satır kalmaz (yarım yazılmış lokasyon yok); ingest olayları da commit'te yayınlanır.
+    '''
+
+
+async def fetch_and_save(db, locations):
+    """Senkron DB işini thread'de yapar; çağıran loop (FastAPI) bloklanmaz."""
+    started = time.monotonic()
+    results = await fetch_locations(locations)
+    fetched = time.monotonic()
+    result = await asyncio.to_thread(save_results, db, results)
+    result["timings"]["fetch_s"] = round(fetched - started, 4)
+    result["timings"]["total_s"] = round(time.monotonic() - started, 4)
+    return result
+
+
+def _save_with_own_session(results):
+    db = SessionLocal()
+    try:
+        return save_results(db, results)
+    finally:
+        db.close()
+
+
+# --------------------------
+# Arka plan işleri: iş id'si hemen döner, durum /data/jobs/{id} ile sorgulanır
+# (process içi, son JOB_HISTORY_SIZE iş tutulur; restart'ta kaybolur)
+# --------------------------
+class JobStore:
+    def __init__(self, max_jobs=None):
+        self.max_jobs = max_jobs or settings.JOB_HISTORY_SIZE
+        self._jobs = OrderedDict()
+        self._tasks = set()  # çalışan task'lara referans: GC tarafından toplanmasınlar
+        self._lock = threading.Lock()
+
+    def _update(self, job_id, **values):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:  # geçmiş taşınca düşürülmüş olabilir; çalışan iş bu yüzden hata vermesin
+                job.update(values)
+
+    def _evict(self):
+        """Geçmiş JOB_HISTORY_SIZE'ı aşarsa en eski bitmiş işler düşürülür; pending/running işler sorgulanabilir kalır."""
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in ("done", "failed")][:excess]
+        for job_id in finished:
+            del self._jobs[job_id]
+
+    def submit(self, locations):
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {
+                "job_id": job_id, "status": "pending", "locations": len(locations),
+                "created_at": datetime.utcnow(), "started_at": None, "finished_at": None,
+                "result": None, "error": None,
+            }
+            self._evict()
+        task = asyncio.get_running_loop().create_task(self._run(job_id, locations))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job_id
+
+    async def _run(self, job_id, locations):
+        self._update(job_id, status="running", started_at=datetime.utcnow())
+        try:
+            results = await fetch_locations(locations)
+            result = await asyncio.to_thread(_save_with_own_session, results)
+            self._update(job_id, status="done", result=result, finished_at=datetime.utcnow())
+        except Exception as e:
+            print(f"⚠ fetch-and-save işi {job_id} hatası: {e}")
+            self._update(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+        with self._lock:
+            self._evict()
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+
+jobs = JobStore()
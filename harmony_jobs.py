@@ -0,0 +1,218 @@
+# app/services/harmony_jobs.py
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# --------------------------
+# Job durumları
+# --------------------------
+PENDING = "pending"          # kuyrukta, henüz submit edilmedi
+SUBMITTED = "submitted"      # Harmony'e gönderildi
+RUNNING = "running"          # Harmony işliyor
+DOWNLOADED = "downloaded"    # sonuçlar indirildi, parse bekliyor
+PARSED = "parsed"            # parse tamamlandı, job.result dolu
+FAILED = "failed"
+
+# Harmony status -> bizim durumumuz
+DONE_STATUSES = {"successful", "complete_with_errors"}
+FAILED_STATUSES = {"failed", "canceled"}
+
+
+# --------------------------
+# Varsayılan indirme: download_all (Future veya dosya yolu döner)
+# --------------------------
+def download_files(client, job_id):
+    return [f.result() if hasattr(f, "result") else f for f in client.download_all(job_id)]
+
+
+# --------------------------
+# Tek bir Harmony işi
+# --------------------------
+class HarmonyJob:
+    def __init__(self, key, request):
+        self.key = key
+        self.request = request
+        self.job_id = None
+        self.state = PENDING
+        self.progress = 0
+        self.result = None
+        self.error = None
+        self.submitted_at = None
+        self.finished_at = None
+
+    def as_dict(self):
+        return {
+            "key": self.key,
+            "job_id": self.job_id,
+            "state": self.state,
+            "progress": self.progress,
+            "error": self.error,
+            "elapsed": (self.finished_at or time.monotonic()) - self.submitted_at if self.submitted_at else None,
+        }
+
+
+# --------------------------
+# Orkestratör: işleri önden submit eder, eşzamanlı poll eder,
+# biten işi hemen indirip parse eder
+# --------------------------
+class HarmonyOrchestrator:
+    def __init__(self, client, max_in_flight=4, poll_interval=5.0, download_workers=4, download=None, parse=None):
+        self.client = client
+        self.max_in_flight = max_in_flight
+        self.poll_interval = poll_interval
+        self.download_workers = download_workers
+        self.download = download or download_files
+        self.parse = parse
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def add(self, key, request):
+        job = HarmonyJob(key, request)
+        self.jobs[key] = job
+        return job
+
+    def _set(self, job, state, **fields):
+        with self._lock:
+            job.state = state
+            for name, value in fields.items():
+                setattr(job, name, value)
+            if state in (PARSED, FAILED):
+                job.finished_at = time.monotonic()
+
+    def states(self):
+        with self._lock:
+            return {key: job.state for key, job in self.jobs.items()}
+
+    def summary(self):
+        counts = {state: 0 for state in (PENDING, SUBMITTED, RUNNING, DOWNLOADED, PARSED, FAILED)}
+        for state in self.states().values():
+            counts[state] += 1
+        return counts
+
+    def _submit(self, job):
+        try:
+            job_id = self.client.submit(job.request)
+            self._set(job, SUBMITTED, job_id=job_id, submitted_at=time.monotonic())
+            print(f"Job submit edildi: {job.key} -> {job_id}")
+        except Exception as e:
+            self._set(job, FAILED, error=f"submit: {e}")
+
+    def _poll(self, job):
+        try:
+            status = self.client.status(job.job_id)
+        except Exception as e:
+            print(f"⚠ Status alınamadı ({job.key}): {e}")
+            return False
+        state = status.get("status")
+        if state in FAILED_STATUSES:
+            self._set(job, FAILED, error=status.get("message") or state)
+            return False
+        if state in DONE_STATUSES:
+            self._set(job, RUNNING, progress=100)
+            return True
+        self._set(job, RUNNING, progress=status.get("progress", 0))
+        return False
+
+    def _finish(self, job):
+        try:
+            payloads = self.download(self.client, job.job_id)
+            self._set(job, DOWNLOADED)
+            result = self.parse(job, payloads) if self.parse else payloads
+            self._set(job, PARSED, result=result)
+        except Exception as e:
+            self._set(job, FAILED, error=f"download/parse: {e}")
+            print(f"⚠ {job.key} hata: {e}")
+
+    def run(self):
+        pending = [job for job in self.jobs.values() if job.state == PENDING]
+        active = []
+        finishing = []
+        with ThreadPoolExecutor(max_workers=self.download_workers) as pool:
+            while pending or active:
+                # In-flight limitine kadar yeni iş gönder
+                while pending and len(active) < self.max_in_flight:
+                    job = pending.pop(0)
+                    self._submit(job)
+                    if job.state != FAILED:
+                        active.append(job)
+
+                still_active = []
+                for job in active:
+                    if self._poll(job):
+                        finishing.append(pool.submit(self._finish, job))
+                    elif job.state != FAILED:
+                        still_active.append(job)
+                active = still_active
+
+                if active:
+                    time.sleep(self.poll_interval)
+            for future in finishing:
+                future.result()
+        return self.jobs
+
+
+# --------------------------
+# Offline benchmark için sahte Harmony client
+# --------------------------
+class FakeHarmonyClient:
+    def __init__(self, min_latency=1.0, max_latency=3.0, fail_rate=0.0, files=None, seed=None):
+        self.min_latency = min_latency
+        self.max_latency = max_latency
+        self.fail_rate = fail_rate
+        self.files = list(files or [])
+        self._rng = random.Random(seed)
+        self._jobs = {}
+
+    def submit(self, request):
+        job_id = str(uuid.uuid4())
+        now = time.monotonic()
+        self._jobs[job_id] = {
+            "start": now,
+            "ready_at": now + self._rng.uniform(self.min_latency, self.max_latency),
+            "fails": self._rng.random() < self.fail_rate,
+        }
+        return job_id
+
+    def status(self, job_id):
+        job = self._jobs[job_id]
+        now = time.monotonic()
+        if now < job["ready_at"]:
+            progress = int(100 * (now - job["start"]) / (job["ready_at"] - job["start"]))
+            return {"status": "running", "progress": progress}
+        if job["fails"]:
+            return {"status": "failed", "progress": 100, "message": "fake failure"}
+        return {"status": "successful", "progress": 100}
+
+    def wait_for_processing(self, job_id, show_progress=False):
+        delay = self._jobs[job_id]["ready_at"] - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def download_all(self, job_id, directory="", overwrite=False):
+        return iter(self.files)
+
+
+# --------------------------
+# Ana çalıştırma: sıralı vs eşzamanlı karşılaştırma
+# --------------------------
+if __name__ == "__main__":
+    job_count = 12
+    client = FakeHarmonyClient(min_latency=0.5, max_latency=1.5, fail_rate=0.1, seed=42)
+
+    started = time.monotonic()
+    for i in range(job_count):
+        job_id = client.submit(None)
+        client.wait_for_processing(job_id)
+        list(client.download_all(job_id))
+    serial = time.monotonic() - started
+
+    orchestrator = HarmonyOrchestrator(client, max_in_flight=6, poll_interval=0.1)
+    for i in range(job_count):
+        orchestrator.add(i, None)
+    started = time.monotonic()
+    orchestrator.run()
+    concurrent = time.monotonic() - started
+
+    print(f"Sıralı: {serial:.2f}s, eşzamanlı: {concurrent:.2f}s -> {orchestrator.summary()}")
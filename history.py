@@ -0,0 +1,212 @@
+# app/api/v1/routers/history.py
+import base64
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, func, literal_column, or_, select
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.config import settings
+from app.db.session import get_db
+from app.services import archive, rollups, spatial_index
+from app.services.ingest_events import naive_utc
+
+router = APIRouter()
+
+# (location_id, timestamp) unique olan ölçüm tabloları
+HISTORY_TABLES = ("airqualitydata", "weatherdata", "tempodata")
+AGGREGATES = {"avg": func.avg, "min": func.min, "max": func.max}
+MAX_LIMIT = 10000
+
+
+# --------------------------
+# Cursor: (location_id, timestamp) → base64 JSON
+# --------------------------
+def encode_cursor(location_id, timestamp):
+    raw = json.dumps({"l": location_id, "t": timestamp.isoformat()}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return int(data["l"]), datetime.fromisoformat(data["t"])
+    except Exception:
+        raise ValueError("Geçersiz cursor")
+
+
+def _after(table, location_id, timestamp):
+    # (location_id, timestamp) > (l, t): unique index üzerinde range taraması, OFFSET yok
+    return or_(table.c.location_id > location_id, and_(table.c.location_id == location_id, table.c.timestamp > timestamp))
+
+
+def _filters(table, location_ids, start, end):
+    conditions = []
+    if location_ids is not None:
+        conditions.append(table.c.location_id.in_(location_ids))
+    if start is not None:
+        conditions.append(table.c.timestamp >= start)
+    if end is not None:
+        conditions.append(table.c.timestamp < end)
+    return conditions
+
+
+# --------------------------
+# Ham satırlar
+# --------------------------
+def raw_page(db, table, fields, location_ids, start, end, after, limit):
+    stmt = select(table.c.location_id, table.c.timestamp, *(table.c[f] for f in fields)).where(
+        *_filters(table, location_ids, start, end)
+    )
+    if after is not None:
+        stmt = stmt.where(_after(table, *after))
+    stmt = stmt.order_by(table.c.location_id, table.c.timestamp).limit(limit + 1)
+    return db.execute(stmt).all()
+
+
+# --------------------------
+# Downsampling: bucket_minutes'lık kovalarda tek nokta (sunucu tarafında GROUP BY)
+# --------------------------
+def location_window_end(db, table, conditions, after, limit):
+    """
+    Sayfanın çıkabileceği son location_id: cursor'dan itibaren verisi olan ilk limit+2 lokasyonun sonuncusu
+    (her lokasyon en az bir kova verir; cursor lokasyonu kalan kova vermeyebilir). Daha az lokasyon varsa None.
+    DISTINCT location_id (location_id, timestamp) index'inde loose index scan ile okunur; GROUP BY sadece bu aralığı toplar.
+    """
+    stmt = select(table.c.location_id).where(*conditions).distinct()
+    if after is not None:
+        stmt = stmt.where(table.c.location_id >= after[0])
+    return db.execute(stmt.order_by(table.c.location_id).offset(limit + 1).limit(1)).scalar()
+
+
+def bucket_page(db, table, fields, location_ids, start, end, after, limit, bucket_minutes, agg):
+    seconds = bucket_minutes * 60
+    bucket = func.floor(func.unix_timestamp(table.c.timestamp) / seconds)
+    bucket_start = func.from_unixtime(bucket * seconds).label("bucket_start")
+    conditions = _filters(table, location_ids, start, end)
+    stmt = select(
+        table.c.location_id,
+        bucket_start,
+        *(AGGREGATES[agg](table.c[f]).label(f) for f in fields),
+    ).where(*conditions)
+    if after is not None:
+        # Cursor kova başlangıcıdır; sonraki kova bu zamandan bucket_minutes sonra başlar
+        location_id, timestamp = after
+        stmt = stmt.where(
+            table.c.location_id >= location_id,
+            _after(table, location_id, timestamp + timedelta(seconds=seconds) - timedelta(microseconds=1)),
+        )
+    # GROUP BY + LIMIT kalan tüm aralığı toplamasın: sadece sayfaya girebilecek lokasyonlar
+    last_location = location_window_end(db, table, conditions, after, limit)
+    if last_location is not None:
+        stmt = stmt.where(table.c.location_id <= last_location)
+    stmt = (
+        stmt.group_by(table.c.location_id, literal_column("bucket_start"))
+        .order_by(table.c.location_id, literal_column("bucket_start"))
+        .limit(limit + 1)
+    )
+    return db.execute(stmt).all()
+
+
+# --------------------------
+# Arşive uzanan sorgular: sınırdan öncesi Parquet arşivinden, sonrası MySQL'den
+# --------------------------
+def archive_page(db, table_name, table, fields, location_ids, start, end, after, limit, bucket_minutes, agg, boundary):
+    archived = archive.page(
+        table_name, fields, location_ids, start, min(end, boundary) if end else boundary, after, limit, bucket_minutes, agg
+    )
+    live = []
+    if end is None or end > boundary:
+        live_start = max(start, boundary) if start else boundary
+        if bucket_minutes:
+            live = bucket_page(db, table, fields, location_ids, live_start, end, after, limit, bucket_minutes, agg)
+        else:
+            live = raw_page(db, table, fields, location_ids, live_start, end, after, limit)
+    return archive.merge_pages(archived, live, limit)
+
+
+# --------------------------
+# Endpoint
+# --------------------------
+@router.get("/{table_name}")
+def get_history(
+    table_name: str,
+    ids: str | None = Query(None, description="Virgülle ayrılmış location_id listesi"),
+    bbox: str | None = Query(None, description="min_lat,min_lon,max_lat,max_lon"),
+    start: datetime | None = Query(None),
+    end: datetime | None = Query(None),
+    fields: str | None = Query(None, description="Virgülle ayrılmış alan listesi (varsayılan: hepsi)"),
+    bucket_minutes: int | None = Query(None, ge=1, le=60 * 24 * 31),
+    agg: str = Query("avg"),
+    limit: int = Query(1000, ge=1, le=MAX_LIMIT),
+    cursor: str | None = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Zaman serisi geçmişi: (location_id, timestamp) sırasıyla sayfalı, sütun bazlı yanıt.
+    Sonraki sayfa için yanıttaki next_cursor aynı parametrelerle cursor olarak gönderilir.
+    bucket_minutes verilirse her lokasyon için kova başına tek nokta (agg: avg | min | max).
+    """
+    if table_name not in HISTORY_TABLES:
+        raise HTTPException(status_code=404, detail=f"Bilinmeyen tablo: {table_name}")
+    # "...Z" / "+03:00" ile gelen zamanlar naive UTC'ye: DB kolonları ve arşiv sınırı naive UTC
+    start, end = naive_utc(start), naive_utc(end)
+    model, all_fields = crud.TIMESERIES_TABLES[table_name]
+    table = model.__table__
+    selected = tuple(f.strip() for f in fields.split(",") if f.strip()) if fields else all_fields
+    unknown = [f for f in selected if f not in all_fields]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"Geçersiz alan(lar): {unknown}; seçenekler: {', '.join(all_fields)}")
+    if agg not in AGGREGATES:
+        raise HTTPException(status_code=400, detail=f"agg şunlardan biri olmalı: {', '.join(AGGREGATES)}")
+    try:
+        location_ids = None
+        if ids or bbox:
+            location_ids = spatial_index.resolve_location_ids(db, ids, bbox, settings.BULK_MAX_LOCATIONS)
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    use_rollups = rollups.should_use_rollups(bucket_minutes, start, end)
+    if bucket_minutes and not use_rollups and start is None:
+        # Ham tablo üzerinde kovalama her sayfada pencereyi baştan toplar: zaman penceresi sınırlı olmalı
+        raise HTTPException(status_code=400, detail="Saat/gün katı olmayan bucket_minutes için start zorunlu")
+    boundary = archive.archived_until(table_name)
+    use_archive = not use_rollups and boundary is not None and (start is None or start < boundary)
+    if use_archive and bucket_minutes and (24 * 60) % bucket_minutes and (end is None or end > boundary):
+        # Arşiv sınırı gece yarısı: günü tam bölmeyen kova sınırda ikiye bölünürdü
+        raise HTTPException(status_code=400, detail="Arşive uzanan sorgularda bucket_minutes 1440'ı tam bölmeli")
+    if location_ids == []:
+        rows = []
+    elif use_rollups:
+        # 1 günden uzun, saat/gün katı kovalı sorgular ham tabloyu değil rollup tablolarını okur
+        rows = rollups.rollup_page(db, table_name, selected, location_ids, start, end, after, limit, bucket_minutes, agg)
+    elif use_archive:
+        # Saklama süresi dolup MySQL'den düşürülen günler Parquet arşivinden
+        rows = archive_page(db, table_name, table, selected, location_ids, start, end, after, limit, bucket_minutes, agg, boundary)
+    elif bucket_minutes:
+        rows = bucket_page(db, table, selected, location_ids, start, end, after, limit, bucket_minutes, agg)
+    else:
+        rows = raw_page(db, table, selected, location_ids, start, end, after, limit)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][0], rows[-1][1])
+
+    result = {
+        "count": len(rows),
+        "next_cursor": next_cursor,
+        "rollup": use_rollups,
+        "archive": use_archive,
+        "location_id": [r[0] for r in rows],
+        "timestamp": [r[1].isoformat() for r in rows],
+    }
+    for i, f in enumerate(selected, start=2):
+        # AVG(int) MySQL'de DECIMAL döner
+        result[f] = [float(r[i]) if isinstance(r[i], Decimal) else r[i] for r in rows]
+    return JSONResponse(result)
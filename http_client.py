@@ -0,0 +1,109 @@
+# app/services/http_client.py
+import asyncio
+import random
+import time
+import weakref
+
+import httpx
+
+from app.core.config import settings
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+# --------------------------
+# Dış API istemcisi: paylaşılan bağlantı havuzu + eşzamanlılık sınırı + retry
+# --------------------------
+class AsyncAPIClient:
+    """
+    Bir API için tek httpx.AsyncClient (keep-alive, bağlantı havuzu) ve asyncio.Semaphore.
+    httpx istemcisi event loop'a bağlı olduğundan her loop için ayrı tutulur
+    (FastAPI'nin loop'u uzun ömürlü; scheduler işleri run_sync ile kendi loop'unu açıp kapatır).
+    """
+    def __init__(self, name, base_url, max_concurrency, timeout=None, retries=None, limiter=None, transport=None):
+        self.name = name
+        self.limiter = limiter  # rate_limiter.RateLimiter: her deneme (retry dahil) bir token harcar
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.timeout = settings.HTTP_TIMEOUT_SECONDS if timeout is None else timeout
+        self.retries = settings.HTTP_MAX_RETRIES if retries is None else retries
+        self.transport = transport  # httpx transport (testlerde httpx.MockTransport); None → gerçek ağ
+        self._loops = weakref.WeakKeyDictionary()  # loop -> (client, semaphore)
+        self.stats = {"requests": 0, "retries": 0, "errors": 0}
+
+    def _state(self):
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                transport=self.transport,
+                limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+            )
+            state = self._loops[loop] = (client, asyncio.Semaphore(self.max_concurrency))
+        return state
+
+    async def get_json(self, path, params=None):
+        client, semaphore = self._state()
+        for attempt in range(self.retries + 1):
+            if self.limiter is not None:
+                await self.limiter.acquire()
+            async with semaphore:
+                self.stats["requests"] += 1
+                try:
+                    resp = await client.get(path, params=params)
+                except (httpx.TimeoutException, httpx.TransportError):
+                    if attempt == self.retries:
+                        self.stats["errors"] += 1
+                        raise
+                    delay = backoff_delay(attempt)
+                else:
+                    if resp.status_code not in RETRY_STATUS or attempt == self.retries:
+                        if resp.is_error:
+                            self.stats["errors"] += 1
+                        resp.raise_for_status()
+                        return resp.json()
+                    delay = backoff_delay(attempt, resp.headers.get("Retry-After"))
+                    if resp.status_code == 429 and self.limiter is not None:
+                        self.limiter.penalize(delay)
+            self.stats["retries"] += 1
+            await asyncio.sleep(delay)
+        '''
+        Sadece geçici hatalar (zaman aşımı, bağlantı hatası, 429 ve 5xx) tekrar denenir; 4xx (ör. 401 yanlış API key) hemen fırlatılır.
+        Token semaphore'dan önce alınır: öncelik sırası limiter kuyruğunda belirlenir, interaktif istek toplu taramanın arkasında kalmaz.
+        '''
+
+    async def gather(self, calls):
+        """Coroutine listesini eşzamanlı çalıştırır; sonuç listesi aynı sırada, hata alanlar Exception nesnesi olarak."""
+        started = time.monotonic()
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        failed = sum(isinstance(r, Exception) for r in results)
+        print(f"🌐 {self.name}: {len(results)} istek, {failed} hata ({time.monotonic() - started:.1f}s)")
+        return results
+
+    async def aclose(self):
+        state = self._loops.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state[0].aclose()
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Üstel bekleme + full jitter: aynı anda hata alan istekler aynı anda tekrar denemesin."""
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), settings.HTTP_BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    return random.uniform(0, min(settings.HTTP_BACKOFF_MAX_SECONDS, settings.HTTP_BACKOFF_SECONDS * 2 ** attempt))
+
+
+def run_sync(coro, *clients):
+    """Senkron koddan (scheduler, sync endpoint'ler) çağırmak için: kendi loop'unda çalıştırır, istemcileri kapatır."""
+    async def main():
+        try:
+            return await coro
+        finally:
+            for client in clients:
+                await client.aclose()
+    return asyncio.run(main())
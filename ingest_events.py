@@ -0,0 +1,77 @@
+# app/services/ingest_events.py
+import threading
+from datetime import timezone
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# --------------------------
+# Ingestion olayları (process içi pub/sub)
+# crud upsert'leri değişen satırları (location_id -> en yeni satır) session'a işaretler;
+# transaction commit olunca abonelere yayınlanır, rollback olursa atılır.
+# source: tablo adı (airqualitydata, weatherdata, tempodata, predictions)
+# --------------------------
+_subscribers = []
+_lock = threading.Lock()
+
+
+def subscribe(callback):
+    """callback(source, changes) — changes: {location_id: {"timestamp": ..., alanlar...}} (lokasyon başına en yeni satır)"""
+    with _lock:
+        if callback not in _subscribers:
+            _subscribers.append(callback)
+
+
+def unsubscribe(callback):
+    with _lock:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+
+def publish(source, changes):
+    if not changes:
+        return
+    with _lock:
+        subscribers = list(_subscribers)
+    for callback in subscribers:
+        try:
+            callback(source, changes)
+        except Exception as e:
+            print(f"⚠ Ingest olayı işlenemedi ({source}): {e}")
+
+
+def naive_utc(timestamp):
+    """Timezone'lu timestamp'i naive UTC'ye çevirir (DB kolonları naive UTC); karşılaştırmalar TypeError vermesin."""
+    if timestamp is not None and timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def mark_changed(db, source, rows):
+    """
+    Commit sonrası yayınlanacak satırları session'a ekler (rows: location_id + timestamp + alanlar).
+    Lokasyon başına en yeni timestamp'li satır tutulur; aynı timestamp'te None olmayan alanlar birleşir.
+    """
+    pending = db.info.setdefault("ingest_changes", {}).setdefault(source, {})
+    for row in rows:
+        location_id, timestamp = row["location_id"], naive_utc(row["timestamp"])
+        current = pending.get(location_id)
+        if current is None or timestamp > current["timestamp"]:
+            pending[location_id] = {k: v for k, v in row.items() if k != "location_id"}
+            pending[location_id]["timestamp"] = timestamp
+        elif timestamp == current["timestamp"]:
+            current.update({k: v for k, v in row.items() if v is not None and k not in ("location_id", "timestamp")})
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session):
+    changes = session.info.pop("ingest_changes", None)
+    for source, location_changes in (changes or {}).items():
+        publish(source, location_changes)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session, previous_transaction):
+    # Sadece en dıştaki transaction geri alınınca (savepoint rollback'i değişiklikleri atmaz)
+    if previous_transaction.parent is None:
+        session.info.pop("ingest_changes", None)
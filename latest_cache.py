@@ -0,0 +1,150 @@
+# app/services/latest_cache.py
+import threading
+import time
+from decimal import Decimal
+
+from app import crud, models
+from app.core.config import settings
+from app.services import ingest_events
+
+_MISSING = object()
+
+
+def _plain(value):
+    """numpy skaler (np.int64, np.float64, np.datetime64) / Decimal → Python tipi; JSONResponse bunları serileştiremez."""
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, "item") and not isinstance(value, (int, float, str)):
+        return value.item()
+    return value
+
+
+# --------------------------
+# Lokasyon başına son ölçüm önbelleği (location_id -> satır dict'i)
+# Upsert yolundan gelen ingest olaylarıyla yerinde güncellenir; TTL dolunca DB'den tazelenir
+# (başka process'lerin yazdıkları en geç TTL sonra görünür).
+# --------------------------
+class LatestCache:
+    def __init__(self, model, fields, fetch_one, ttl=settings.LATEST_CACHE_TTL_SECONDS):
+        self.model = model
+        self.source = model.__tablename__
+        self.fields = fields
+        self.fetch_one = fetch_one
+        self.ttl = ttl
+        self._entries = {}   # location_id -> (satır veya None, cached_at)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "updates": 0}
+
+    def _row(self, location_id, values):
+        row = {"location_id": location_id, "timestamp": ingest_events.naive_utc(values.get("timestamp"))}
+        row.update({f: values.get(f) for f in self.fields})
+        return row
+
+    def _cached(self, location_id, now):
+        cached = self._entries.get(location_id)
+        if cached is not None and now - cached[1] < self.ttl:
+            return cached[0]
+        return _MISSING
+
+    def get(self, db, location_id):
+        """Son satırı dict olarak döndürür, veri yoksa None."""
+        now = time.monotonic()
+        with self._lock:
+            row = self._cached(location_id, now)
+            if row is not _MISSING:
+                self.stats["hits"] += 1
+                return row
+        record = self.fetch_one(db, location_id)
+        row = self._row(location_id, {c: getattr(record, c) for c in ("timestamp",) + self.fields}) if record else None
+        with self._lock:
+            self.stats["misses"] += 1
+            # Sorgu sırasında olayla daha yeni bir satır geldiyse onu ezme
+            current = self._entries.get(location_id)
+            if current is None or current[0] is None or row is None or current[0]["timestamp"] <= row["timestamp"]:
+                self._entries[location_id] = (row, now)
+            else:
+                row = current[0]
+        return row
+
+    def get_many(self, db, location_ids):
+        """Birden çok lokasyonun son satırları; önbellekte olmayanlar tek toplu sorguyla doldurulur."""
+        now = time.monotonic()
+        rows, missing = {}, []
+        with self._lock:
+            for location_id in location_ids:
+                row = self._cached(location_id, now)
+                if row is _MISSING:
+                    missing.append(location_id)
+                elif row is not None:
+                    rows[location_id] = row
+            self.stats["hits"] += len(location_ids) - len(missing)
+        if missing:
+            fetched = {
+                r[0]: self._row(r[0], dict(zip(("timestamp",) + self.fields, r[1:])))
+                for r in crud.get_latest_many(db, self.model, missing, self.fields)
+            }
+            with self._lock:
+                self.stats["misses"] += len(missing)
+                for location_id in missing:
+                    row = fetched.get(location_id)
+                    current = self._entries.get(location_id)
+                    if current is not None and current[0] is not None and (row is None or current[0]["timestamp"] > row["timestamp"]):
+                        row = current[0]
+                    else:
+                        self._entries[location_id] = (row, now)
+                    if row is not None:
+                        rows[location_id] = row
+        return [rows[location_id] for location_id in location_ids if location_id in rows]
+
+    def columnar(self, rows):
+        """Satır listesini sütun dizilerine çevirir (bulk yanıtlar için kompakt JSON)."""
+        timestamps = (_plain(r["timestamp"]) for r in rows)
+        result = {
+            "count": len(rows),
+            "location_id": [_plain(r["location_id"]) for r in rows],
+            "timestamp": [t.isoformat() if t else None for t in timestamps],
+        }
+        for f in self.fields:
+            result[f] = [_plain(r[f]) for r in rows]
+        return result
+
+    def on_ingest(self, source, changes):
+        if source != self.source:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for location_id, values in changes.items():
+                cached = self._entries.get(location_id)
+                if cached is None:
+                    # Önbellekte yoksa DB'de daha yeni satır olabilir; ilk okumada sorgulanır
+                    continue
+                current = cached[0]
+                timestamp = ingest_events.naive_utc(values["timestamp"])
+                if current is None or timestamp > current["timestamp"]:
+                    if any(values.get(f) is None for f in self.fields):
+                        # Upsert'in COALESCE'i bu alanların DB'deki değerini korumuş olabilir: tahmin etme, DB'den oku
+                        self._entries.pop(location_id, None)
+                        self.stats["updates"] += 1
+                        continue
+                    self._entries[location_id] = (self._row(location_id, values), now)
+                elif timestamp == current["timestamp"]:
+                    merged = dict(current)
+                    merged.update({f: values[f] for f in self.fields if values.get(f) is not None})
+                    self._entries[location_id] = (merged, now)
+                else:
+                    continue
+                self.stats["updates"] += 1
+
+    def invalidate(self, location_ids=None):
+        with self._lock:
+            if location_ids is None:
+                self._entries.clear()
+            else:
+                for location_id in location_ids:
+                    self._entries.pop(location_id, None)
+
+
+air_quality_latest = LatestCache(models.AirQualityData, crud.AIR_QUALITY_FIELDS, crud.get_latest_air_quality)
+weather_latest = LatestCache(models.WeatherData, crud.WEATHER_FIELDS, crud.get_latest_weather)
+ingest_events.subscribe(air_quality_latest.on_ingest)
+ingest_events.subscribe(weather_latest.on_ingest)
@@ -0,0 +1,34 @@
+# app/api/v1/routers/locations.py
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from app.db.session import get_db
+from app.services import spatial_index
+
+router = APIRouter()
+
+# ----------------------------
+# En yakın lokasyon(lar)
+# ----------------------------
+@router.get("/nearest")
+def get_nearest_locations(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(1, ge=1, le=100),
+    radius_km: float | None = Query(None, gt=0),
+    db: Session = Depends(get_db)
+):
+    """
+    Verilen koordinata en yakın k lokasyonu döndürür.
+    radius_km verilirse sadece bu yarıçap içindekiler (en yakından uzağa, en fazla k tane).
+    """
+    index = spatial_index.get_location_index(db)
+    if index is None:
+        raise HTTPException(status_code=404, detail="No locations found")
+
+    if radius_km is not None:
+        results = index.within_radius(lat, lon, radius_km)[:k]
+    else:
+        results = index.nearest(lat, lon, k)
+    if not results:
+        raise HTTPException(status_code=404, detail="No locations found")
+    return {"results": results}
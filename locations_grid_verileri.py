@@ -1,47 +1,122 @@
+import argparse
+import os
+import tempfile
+import time
 import numpy as np
 import mysql.connector
 from sqlalchemy.engine.url import make_url
 from app.core.config import settings  # config.py içindeki ayarları kullanıyoruz
 
-# 🔹 DATABASE_URL'i parçala
-url = make_url(settings.DATABASE_URL)
-db_host = url.host
-db_user = url.username
-db_password = url.password
-db_name = url.database
-
-# 🔹 Grid sınırları (Kuzey Amerika)
+# 🔹 Varsayılan grid sınırları (Kuzey Amerika)
 lat_min, lat_max = 14, 72
 lon_min, lon_max = -170, -50
 step = 0.25
 
-lats = np.arange(lat_min, lat_max + step, step)
-lons = np.arange(lon_min, lon_max + step, step)
-
-# 🔹 MySQL bağlantısı
-conn = mysql.connector.connect(
-    host=db_host,
-    user=db_user,
-    password=db_password,
-    database=db_name
-)
-cursor = conn.cursor()
-
-# 🔹 Locations tablosunu doldur
 insert_query = """
 INSERT IGNORE INTO locations (latitude, longitude, grid_name)
 VALUES (%s, %s, %s)
 """
 
-count = 0
-for lat in lats:
-    for lon in lons:
-        grid_name = f"Grid_{lat:.2f}_{lon:.2f}"
-        cursor.execute(insert_query, (float(lat), float(lon), grid_name))
-        count += 1
+load_query = """
+LOAD DATA LOCAL INFILE %s
+IGNORE INTO TABLE locations
+FIELDS TERMINATED BY ','
+LINES TERMINATED BY '\\n'
+(latitude, longitude, grid_name)
+"""
+
+# 🔹 Grid'i NumPy dizileri olarak üret (tek tek döngü yok)
+def build_grid(lat_min, lat_max, lon_min, lon_max, step):
+    n_lat = int(round((lat_max - lat_min) / step)) + 1
+    n_lon = int(round((lon_max - lon_min) / step)) + 1
+    lats = np.round(lat_min + step * np.arange(n_lat), 6)
+    lons = np.round(lon_min + step * np.arange(n_lon), 6)
+    lat_grid, lon_grid = np.meshgrid(lats, lons, indexing="ij")
+    return lat_grid.ravel(), lon_grid.ravel()
+
+def grid_names(lats, lons):
+    return [f"Grid_{lat:.2f}_{lon:.2f}" for lat, lon in zip(lats.tolist(), lons.tolist())]
+
+# 🔹 DATABASE_URL'i parçalayıp MySQL bağlantısı aç
+def connect(allow_local_infile=False):
+    url = make_url(settings.DATABASE_URL)
+    return mysql.connector.connect(
+        host=url.host,
+        port=url.port or 3306,
+        user=url.username,
+        password=url.password,
+        database=url.database,
+        allow_local_infile=allow_local_infile,
+    )
+
+# 🔹 Parçalı executemany (mysql.connector bunu çok satırlı INSERT'e çevirir), parça başına commit
+def seed_with_executemany(conn, lats, lons, names, chunk_size):
+    cursor = conn.cursor()
+    lat_list, lon_list = lats.tolist(), lons.tolist()
+    for i in range(0, len(names), chunk_size):
+        cursor.executemany(insert_query, list(zip(lat_list[i:i + chunk_size], lon_list[i:i + chunk_size], names[i:i + chunk_size])))
+        conn.commit()
+    cursor.close()
+
+# 🔹 Toplu yükleme dosyası üret ve LOAD DATA LOCAL INFILE ile yükle
+# (path verilmezse geçici dosya kullanılır ve iş bitince silinir; verilen dosya yerinde kalır)
+def seed_with_infile(conn, lats, lons, names, path=None):
+    temporary = path is None
+    if temporary:
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        os.close(fd)
+    try:
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write("".join(f"{lat:.6f},{lon:.6f},{name}\n" for lat, lon, name in zip(lats.tolist(), lons.tolist(), names)))
+        cursor = conn.cursor()
+        cursor.execute(load_query, (path,))
+        conn.commit()
+        cursor.close()
+    finally:
+        if temporary:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return None if temporary else path
+
+def seed_grid(lat_min=lat_min, lat_max=lat_max, lon_min=lon_min, lon_max=lon_max, step=step,
+              chunk_size=10000, infile=False, infile_path=None, dry_run=False):
+    started = time.monotonic()
+    lats, lons = build_grid(lat_min, lat_max, lon_min, lon_max, step)
+    count = len(lats)
+    if dry_run:
+        print(f"🔎 Dry-run: {count} grid noktası ({lat_min}..{lat_max}, {lon_min}..{lon_max}, adım {step})")
+        return count
+
+    names = grid_names(lats, lons)
+    conn = connect(allow_local_infile=infile)
+    try:
+        if infile:
+            path = seed_with_infile(conn, lats, lons, names, infile_path)
+            if path:
+                print(f"📄 Yükleme dosyası: {path}")
+        else:
+            seed_with_executemany(conn, lats, lons, names, chunk_size)
+    finally:
+        conn.close()
+    print(f"✅ Locations tablosuna {count} grid noktası eklendi ({time.monotonic() - started:.1f}s).")
+    return count
 
-conn.commit()
-cursor.close()
-conn.close()
+def parse_args():
+    parser = argparse.ArgumentParser(description="Locations tablosunu düzenli grid noktalarıyla doldurur.")
+    parser.add_argument("--bbox", help="lat_min,lat_max,lon_min,lon_max (varsayılan: Kuzey Amerika)")
+    parser.add_argument("--step", type=float, default=step, help="Grid adımı (derece)")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="executemany parça boyutu / commit aralığı")
+    parser.add_argument("--infile", action="store_true", help="LOAD DATA LOCAL INFILE ile toplu yükle")
+    parser.add_argument("--infile-path", help="Üretilecek CSV dosyasının yolu (varsayılan: geçici dosya)")
+    parser.add_argument("--dry-run", action="store_true", help="Sadece satır sayısını raporla")
+    return parser.parse_args()
 
-print(f"✅ Locations tablosuna {count} grid noktası eklendi.")
+if __name__ == "__main__":
+    args = parse_args()
+    bbox = (lat_min, lat_max, lon_min, lon_max)
+    if args.bbox:
+        bbox = tuple(float(v) for v in args.bbox.split(","))
+    seed_grid(*bbox, step=args.step, chunk_size=args.chunk_size,
+              infile=args.infile, infile_path=args.infile_path, dry_run=args.dry_run)
@@ -21,9 +21,10 @@ class TempoData(Base):
     __tablename__ = "tempodata"
     tempo_id = Column(Integer, primary_key=True, autoincrement=True)
     location_id = Column(Integer, ForeignKey("locations.location_id", ondelete="CASCADE"), nullable=False)
-    timestamp = Column(DateTime, nullable=False)
+    timestamp = Column(DateTime, primary_key=True, nullable=False)  # PK (id, timestamp): zaman bölümlemesi için
     o3 = Column(Float)
     no2 = Column(Float)
+    hcho = Column(Float)
     so2 = Column(Float)
     co = Column(Float)
     aerosol_index = Column(Float)
@@ -34,7 +35,7 @@ class AirQualityData(Base):
     __tablename__ = "airqualitydata"
     aq_id = Column(Integer, primary_key=True, autoincrement=True)
     location_id = Column(Integer, ForeignKey("locations.location_id", ondelete="CASCADE"), nullable=False)
-    timestamp = Column(DateTime, nullable=False)
+    timestamp = Column(DateTime, primary_key=True, nullable=False)  # PK (id, timestamp): zaman bölümlemesi için
     aqi = Column(Integer)
     pm25 = Column(Float)
     pm10 = Column(Float)
@@ -48,7 +49,7 @@ class WeatherData(Base):
     __tablename__ = "weatherdata"
     weather_id = Column(Integer, primary_key=True, autoincrement=True)
     location_id = Column(Integer, ForeignKey("locations.location_id", ondelete="CASCADE"), nullable=False)
-    timestamp = Column(DateTime, nullable=False)
+    timestamp = Column(DateTime, primary_key=True, nullable=False)  # PK (id, timestamp): zaman bölümlemesi için
     temperature = Column(Float)
     humidity = Column(Float)
     wind_speed = Column(Float)
@@ -56,12 +57,72 @@ class WeatherData(Base):
     location = relationship("Locations")
     __table_args__ = (UniqueConstraint("location_id", "timestamp", name="uniq_weatherdata"),)
 
+class WeatherForecasts(Base):
+    __tablename__ = "weather_forecasts"
+    forecast_id = Column(Integer, primary_key=True, autoincrement=True)
+    location_id = Column(Integer, ForeignKey("locations.location_id", ondelete="CASCADE"), nullable=False)
+    timestamp = Column(DateTime, nullable=False)  # tahminin geçerli olduğu saat (gelecek)
+    issued_at = Column(DateTime, nullable=False)  # değerlerin sağlayıcıdan çekildiği an
+    temperature = Column(Float)
+    humidity = Column(Float)
+    wind_speed = Column(Float)
+    pressure = Column(Float)
+    location = relationship("Locations")
+    __table_args__ = (UniqueConstraint("location_id", "timestamp", name="uniq_weather_forecasts"),)
+
 class Predictions(Base):
     __tablename__ = "predictions"
     prediction_id = Column(Integer, primary_key=True, autoincrement=True)
     location_id = Column(Integer, ForeignKey("locations.location_id", ondelete="CASCADE"), nullable=False)
-    timestamp = Column(DateTime, nullable=False)
+    timestamp = Column(DateTime, primary_key=True, nullable=False)  # PK (id, timestamp): zaman bölümlemesi için
     predicted_aqi = Column(Integer)
     model_version = Column(String(50))
+    input_timestamp = Column(DateTime)  # tahmin girdisinin en yeni timestamp'i (önbellek bayatlık işareti)
     location = relationship("Locations")
     __table_args__ = (UniqueConstraint("location_id", "timestamp", "model_version", name="uniq_predictions"),)
+
+class TempoGranules(Base):
+    __tablename__ = "tempo_granules"
+    granule_id = Column(String(64), primary_key=True)  # CMR concept-id
+    collection_id = Column(String(64), nullable=False)
+    gas = Column(String(10), nullable=False)
+    time_start = Column(DateTime, nullable=False)
+    time_end = Column(DateTime)
+    md5 = Column(String(32))
+    status = Column(String(20), nullable=False, default="pending")  # pending / parsed / failed
+    processed_at = Column(DateTime)
+
+class TempoCursors(Base):
+    __tablename__ = "tempo_cursors"
+    collection_id = Column(String(64), primary_key=True)
+    high_water_mark = Column(DateTime, nullable=False)  # işlenen son granülün time_start'ı
+    updated_at = Column(DateTime)
+
+class RollupDirty(Base):
+    __tablename__ = "rollup_dirty"
+    source = Column(String(20), primary_key=True)  # airqualitydata / weatherdata / tempodata
+    location_id = Column(Integer, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)  # saat başı
+    version = Column(Integer, nullable=False, default=1)  # her yeni yazmada artar
+
+class RollupHourly(Base):
+    __tablename__ = "rollup_hourly"
+    source = Column(String(20), primary_key=True)
+    location_id = Column(Integer, ForeignKey("locations.location_id", ondelete="CASCADE"), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    metric = Column(String(20), primary_key=True)  # ör. aqi, pm25, temperature, no2
+    min_value = Column(Float)
+    max_value = Column(Float)
+    sum_value = Column(Float)
+    count = Column(Integer, nullable=False)
+
+class RollupDaily(Base):
+    __tablename__ = "rollup_daily"
+    source = Column(String(20), primary_key=True)
+    location_id = Column(Integer, ForeignKey("locations.location_id", ondelete="CASCADE"), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)  # gün başı
+    metric = Column(String(20), primary_key=True)
+    min_value = Column(Float)
+    max_value = Column(Float)
+    sum_value = Column(Float)
+    count = Column(Integer, nullable=False)
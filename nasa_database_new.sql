@@ -83,4 +83,119 @@ ALTER TABLE airqualitydata
 ADD CONSTRAINT uniq_airqualitydata UNIQUE (location_id, timestamp);
 
 ALTER TABLE tempodata
-ADD CONSTRAINT hcho FLOAT
+ADD COLUMN hcho FLOAT;
+
+-- 7. TempoGranules (işlenen TEMPO granüllerinin kaydı, tekrar işlemeyi engeller)
+CREATE TABLE tempo_granules (
+    granule_id VARCHAR(64) PRIMARY KEY,
+    collection_id VARCHAR(64) NOT NULL,
+    gas VARCHAR(10) NOT NULL,
+    time_start DATETIME NOT NULL,
+    time_end DATETIME,
+    md5 CHAR(32),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    processed_at DATETIME,
+    INDEX idx_tempo_granules_collection (collection_id, time_start)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- 8. TempoCursors (koleksiyon başına high-water-mark)
+CREATE TABLE tempo_cursors (
+    collection_id VARCHAR(64) PRIMARY KEY,
+    high_water_mark DATETIME NOT NULL,
+    updated_at DATETIME
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- 9. RollupDirty (yeniden hesaplanacak saatlik kovalar; upsert ile aynı transaction'da yazılır)
+CREATE TABLE rollup_dirty (
+    source VARCHAR(20) NOT NULL,
+    location_id INT NOT NULL,
+    bucket_start DATETIME NOT NULL,
+    version INT NOT NULL DEFAULT 1,
+    PRIMARY KEY (source, location_id, bucket_start)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- 10. RollupHourly (lokasyon/metrik başına saatlik min/max/toplam/adet)
+CREATE TABLE rollup_hourly (
+    source VARCHAR(20) NOT NULL,
+    location_id INT NOT NULL,
+    bucket_start DATETIME NOT NULL,
+    metric VARCHAR(20) NOT NULL,
+    min_value FLOAT,
+    max_value FLOAT,
+    sum_value DOUBLE,
+    count INT NOT NULL,
+    PRIMARY KEY (source, location_id, bucket_start, metric),
+    FOREIGN KEY (location_id) REFERENCES Locations(location_id)
+        ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- 11. RollupDaily (saatlik rollup'lardan günlük özet)
+CREATE TABLE rollup_daily (
+    source VARCHAR(20) NOT NULL,
+    location_id INT NOT NULL,
+    bucket_start DATETIME NOT NULL,
+    metric VARCHAR(20) NOT NULL,
+    min_value FLOAT,
+    max_value FLOAT,
+    sum_value DOUBLE,
+    count INT NOT NULL,
+    PRIMARY KEY (source, location_id, bucket_start, metric),
+    FOREIGN KEY (location_id) REFERENCES Locations(location_id)
+        ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- 12. Zaman bölümlemesi (günlük RANGE COLUMNS(timestamp), bölümleri app.db.partitions yönetir)
+-- Partitioned InnoDB tablolar foreign key desteklemez ve PK bölümleme kolonunu içermelidir.
+-- Dolu (mevcut) tablolar için bunun yerine: python -m app.db.partitions migrate
+-- FK adları otomatik üretildiği için (ör. tempodata_ibfk_1) information_schema'dan okunur.
+SET @fk := (SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+    WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'tempodata' AND LOWER(REFERENCED_TABLE_NAME) = 'locations' LIMIT 1);
+SET @sql := IF(@fk IS NULL, 'DO 0', CONCAT('ALTER TABLE tempodata DROP FOREIGN KEY `', @fk, '`'));
+PREPARE drop_fk FROM @sql; EXECUTE drop_fk; DEALLOCATE PREPARE drop_fk;
+ALTER TABLE tempodata DROP PRIMARY KEY, ADD PRIMARY KEY (tempo_id, timestamp)
+    PARTITION BY RANGE COLUMNS(timestamp) (PARTITION p_future VALUES LESS THAN (MAXVALUE));
+
+SET @fk := (SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+    WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'airqualitydata' AND LOWER(REFERENCED_TABLE_NAME) = 'locations' LIMIT 1);
+SET @sql := IF(@fk IS NULL, 'DO 0', CONCAT('ALTER TABLE airqualitydata DROP FOREIGN KEY `', @fk, '`'));
+PREPARE drop_fk FROM @sql; EXECUTE drop_fk; DEALLOCATE PREPARE drop_fk;
+ALTER TABLE airqualitydata DROP PRIMARY KEY, ADD PRIMARY KEY (aq_id, timestamp)
+    PARTITION BY RANGE COLUMNS(timestamp) (PARTITION p_future VALUES LESS THAN (MAXVALUE));
+
+SET @fk := (SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+    WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'weatherdata' AND LOWER(REFERENCED_TABLE_NAME) = 'locations' LIMIT 1);
+SET @sql := IF(@fk IS NULL, 'DO 0', CONCAT('ALTER TABLE weatherdata DROP FOREIGN KEY `', @fk, '`'));
+PREPARE drop_fk FROM @sql; EXECUTE drop_fk; DEALLOCATE PREPARE drop_fk;
+ALTER TABLE weatherdata DROP PRIMARY KEY, ADD PRIMARY KEY (weather_id, timestamp)
+    PARTITION BY RANGE COLUMNS(timestamp) (PARTITION p_future VALUES LESS THAN (MAXVALUE));
+
+SET @fk := (SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+    WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'predictions' AND LOWER(REFERENCED_TABLE_NAME) = 'locations' LIMIT 1);
+SET @sql := IF(@fk IS NULL, 'DO 0', CONCAT('ALTER TABLE predictions DROP FOREIGN KEY `', @fk, '`'));
+PREPARE drop_fk FROM @sql; EXECUTE drop_fk; DEALLOCATE PREPARE drop_fk;
+ALTER TABLE predictions DROP PRIMARY KEY, ADD PRIMARY KEY (prediction_id, timestamp)
+    PARTITION BY RANGE COLUMNS(timestamp) (PARTITION p_future VALUES LESS THAN (MAXVALUE));
+
+-- 13. Tahminin girdi işareti: tahmin hesaplanırken girdi tablolarındaki en yeni timestamp
+-- (daha yeni veri gelmişse önbellekteki tahmin bayattır; başka process'in yazdığı veri de görünür)
+ALTER TABLE predictions ADD COLUMN input_timestamp DATETIME NULL;
+
+-- 14. WeatherForecasts (One Call saatlik tahminleri; weatherdata sadece gözlem tutar)
+-- timestamp tahminin geçerli olduğu saat, issued_at değerlerin çekildiği an. Yeni tahmin aynı saati ezer,
+-- saati geçmiş tahminler sonraki ingest'te silinir (lokasyon başına ~48 satır).
+CREATE TABLE weather_forecasts (
+    forecast_id INT AUTO_INCREMENT PRIMARY KEY,
+    location_id INT NOT NULL,
+    timestamp DATETIME NOT NULL,
+    issued_at DATETIME NOT NULL,
+    temperature FLOAT,
+    humidity FLOAT,
+    wind_speed FLOAT,
+    pressure FLOAT,
+    FOREIGN KEY (location_id) REFERENCES Locations(location_id)
+        ON DELETE CASCADE ON UPDATE CASCADE,
+    UNIQUE KEY uniq_weather_forecasts (location_id, timestamp)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- Daha önce weatherdata'ya yazılmış gelecek saatli tahmin satırları (saati geçmiş olanlar gözlemden ayırt edilemez)
+DELETE FROM weatherdata WHERE timestamp > UTC_TIMESTAMP();
@@ -1,7 +1,9 @@
 # app/services/openweather_service.py
-import requests
+from app.services.http_client import AsyncAPIClient, run_sync
+from app.services.rate_limiter import RateLimiter
+from app.services.response_cache import ResponseCache
 '''
-requests kütüphanesini import ediyoruz. Bu kütüphane, Python’da HTTP GET/POST istekleri yapmak için kullanılır.
+httpx tabanlı paylaşılan async istemci: keep-alive bağlantı havuzu, eşzamanlılık sınırı, timeout ve jitter'lı retry.
 '''
 from app.core.config import settings
 '''
@@ -12,16 +14,31 @@ settings, .env dosyasında tanımlı API key gibi ortam değişkenlerini okuyor.
 Burada OPENWEATHER_API_KEY kullanılacak.
 '''
 
-ONECALL_URL = "https://api.openweathermap.org/data/3.0/onecall"
+ONECALL_PATH = "/data/3.0/onecall"
 '''
-OpenWeather’ın One Call 3.0 endpoint URL’si.
+OpenWeather’ın One Call 3.0 endpoint'i; kök adres settings.OPENWEATHER_BASE_URL (testlerde yerel stub sunucu verilebilir).
 
 Bu API, belirli bir enlem/boylam için anlık hava durumu, saatlik tahmin ve günlük tahmin verilerini döner.
 '''
 
-def fetch_onecall(lat: float, lon: float, units: str = "metric"):
+# Ingest sadece current + hourly kullanır: minutely (60 öğe), daily ve alerts istenmez → cevap ve önbellek girdisi küçülür
+ONECALL_EXCLUDE = "minutely,daily,alerts"
+
+limiter = RateLimiter(
+    "OpenWeather", settings.OPENWEATHER_RATE_PER_MINUTE, settings.OPENWEATHER_BURST,
+    settings.OPENWEATHER_DAILY_QUOTA, settings.QUOTA_INTERACTIVE_RESERVE,
+)
+client = AsyncAPIClient("OpenWeather", settings.OPENWEATHER_BASE_URL, settings.OPENWEATHER_MAX_CONCURRENCY, limiter=limiter)
+cache = ResponseCache("OpenWeather", settings.OPENWEATHER_CACHE_RESOLUTION_DEG, settings.OPENWEATHER_CACHE_TTL_SECONDS)
+'''
+One Call 3.0 aboneliği günlük çağrı sayısıyla ücretlendirilir: OPENWEATHER_DAILY_QUOTA aşılırsa QuotaExceeded.
+
+Model verisi ~10 dakikada bir güncellenir; yakın ızgara hücreleri için cevap aynıdır → ızgaraya oturtulmuş koordinatla önbellek.
+'''
+
+async def fetch_onecall_async(lat: float, lon: float, units: str = "metric"):
     '''
-    fetch_onecall adında bir fonksiyon tanımlıyoruz.
+    fetch_onecall_async adında bir fonksiyon tanımlıyoruz.
 
     Parametreler:
 
@@ -33,7 +50,7 @@ def fetch_onecall(lat: float, lon: float, units: str = "metric"):
     '''
     """
     OpenWeather One Call 3.0 çağrısı.
-    Dönüş: JSON (current, hourly, daily)
+    Dönüş: JSON (current, hourly; ONECALL_EXCLUDE blokları istenmez)
     '''
     Bu fonksiyon OpenWeather One Call API’sine istek atar.
 
@@ -41,15 +58,15 @@ Dönüş değeri JSON formatında olur:
 
 current (anlık hava)
 
-hourly (saatlik tahmin)
-
-daily (günlük tahmin).
+hourly (saatlik tahmin).
     '''
     """
+    lat, lon = cache.snap(lat, lon)
     params = {
         "lat": lat,
         "lon": lon,
         "units": units,
+        "exclude": ONECALL_EXCLUDE,
         "appid": settings.OPENWEATHER_API_KEY,
     }
     '''
@@ -61,24 +78,21 @@ daily (günlük tahmin).
 
 "units" → metrik/imperial
 
+"exclude" → istenmeyen bloklar (minutely, daily, alerts)
+
 "appid" → OpenWeather API anahtarı ( .env dosyasından geliyor).
     '''
-    r = requests.get(ONECALL_URL, params=params, timeout=15)
+    return await cache.get_or_fetch(f"{lat},{lon},{units},{ONECALL_EXCLUDE}", lambda: client.get_json(ONECALL_PATH, params))
     '''
-    GET isteği gönderiyoruz.
+    Önbellekte (bellek LRU → sqlite disk) geçerli cevap varsa ağa çıkılmaz; aynı nokta için eşzamanlı istekler birleşir.
 
-URL → ONECALL_URL
+    GET isteği paylaşılan bağlantı havuzu üzerinden gönderiliyor (en fazla OPENWEATHER_MAX_CONCURRENCY eşzamanlı istek).
 
-Parametreler → params sözlüğü
+Zaman aşımı, 429 ve 5xx cevapları jitter'lı üstel bekleme ile HTTP_MAX_RETRIES kez tekrar denenir.
 
-timeout=15 → 15 saniyeden uzun sürerse hata fırlat.
-    '''
-    r.raise_for_status()
-    '''
-    Eğer yanıtın HTTP status kodu 200 dışı ise (örn. 401 Unauthorized, 404 Not Found, 500 Server Error), burada hata (HTTPError) fırlatılır.
+Diğer hata kodlarında (örn. 401 Unauthorized, 404 Not Found) httpx.HTTPStatusError fırlatılır.
 Bu sayede kod sessizce başarısız olmaz.
     '''
-    return r.json()
 '''
 Dönen cevabı JSON olarak parse edip fonksiyon çıktısı olarak döndürüyoruz.
 
@@ -86,3 +100,21 @@ Yani bu fonksiyonu çağıran kişi doğrudan bir Python dict/list yapısı alı
 
 Bu fonksiyon verilen lat, lon koordinatları için OpenWeather One Call 3.0 API’sinden hava durumu verisi alıyor ve JSON döndürüyor.
 '''
+
+
+async def fetch_onecall_batch(coords, units: str = "metric"):
+    """
+    Çok sayıda (lat, lon) için eşzamanlı One Call. Dönüş: coords ile aynı sırada liste;
+    başarısız koordinatlar için Exception nesnesi.
+    """
+    return await client.gather([fetch_onecall_async(lat, lon, units) for lat, lon in coords])
+
+
+def fetch_onecall(lat: float, lon: float, units: str = "metric"):
+    """Senkron sarmalayıcı (scheduler / sync endpoint'ler için)."""
+    return run_sync(fetch_onecall_async(lat, lon, units), client)
+
+
+def fetch_onecall_batch_sync(coords, units: str = "metric"):
+    return run_sync(fetch_onecall_batch(coords, units), client)
+
@@ -0,0 +1,228 @@
+# app/db/partitions.py
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.session import engine
+
+FUTURE = "p_future"
+OLD = "p_old"  # migrate: günlük bölüm açılmayan eski satırlar (saklama süresi dışı / bölüm sınırı aşımı)
+# MySQL tablo başına en fazla 8192 bölüm; p_old + p_future için pay bırakılır
+MAX_DAY_PARTITIONS = 8000
+
+# Günlük RANGE COLUMNS(timestamp) bölümlenen tablolar: tablo -> (id kolonu, saklama süresi ayarı)
+PARTITIONED_TABLES = {
+    "tempodata": ("tempo_id", "RETENTION_DAYS_TEMPO"),
+    "airqualitydata": ("aq_id", "RETENTION_DAYS_AIRQUALITY"),
+    "weatherdata": ("weather_id", "RETENTION_DAYS_WEATHER"),
+    "predictions": ("prediction_id", "RETENTION_DAYS_PREDICTIONS"),
+}
+
+
+# --------------------------
+# İsimler ve sınırlar
+# --------------------------
+def partition_name(day):
+    return f"p{day:%Y%m%d}"
+
+
+def partition_day(name):
+    return datetime.strptime(name[1:], "%Y%m%d").date()
+
+
+def _definition(day):
+    # p20250101 → [2025-01-01, 2025-01-02)
+    return f"PARTITION {partition_name(day)} VALUES LESS THAN ('{day + timedelta(days=1):%Y-%m-%d} 00:00:00')"
+
+
+def list_partitions(conn, table):
+    """[(isim, satır tahmini)] — bölümlenmemiş tablo için boş liste."""
+    rows = conn.execute(text(
+        "SELECT PARTITION_NAME, TABLE_ROWS FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION"
+    ), {"t": table}).all()
+    return [(r[0], r[1]) for r in rows]
+
+
+def day_partitions(conn, table):
+    return [partition_day(name) for name, _ in list_partitions(conn, table) if name not in (FUTURE, OLD)]
+
+
+def partition_has_rows(conn, table, partition):
+    # TABLE_ROWS sadece tahmin: gerçek kontrol tek satırlık okuma
+    return conn.execute(text(f"SELECT 1 FROM {table} PARTITION ({partition}) LIMIT 1")).first() is not None
+
+
+# --------------------------
+# Önden bölüm oluşturma: p_future boşken REORGANIZE sadece metadata işlemidir
+# (p_future doluysa satırlar kopyalanır ve tablo kilitlenir: bu durumda bölüm açılmaz, uyarı verilir)
+# --------------------------
+def ensure_future_partitions(conn, table, days_ahead=None, today=None):
+    days_ahead = settings.PARTITION_PRECREATE_DAYS if days_ahead is None else days_ahead
+    today = today or datetime.utcnow().date()
+    if not list_partitions(conn, table):
+        raise RuntimeError(f"{table} bölümlenmemiş; önce migrate komutunu çalıştırın")
+    existing = day_partitions(conn, table)
+    start = existing[-1] + timedelta(days=1) if existing else today
+    days = [start + timedelta(days=i) for i in range((today + timedelta(days=days_ahead) - start).days + 1)]
+    if not days:
+        return []
+    if partition_has_rows(conn, table, FUTURE):
+        raise RuntimeError(
+            f"{table}.{FUTURE} satır içeriyor (bakım {days_ahead} günden uzun süre çalışmamış olabilir); "
+            f"REORGANIZE satırları kopyalar. Bakım penceresinde elle çalıştırın: "
+            f"ALTER TABLE {table} REORGANIZE PARTITION {FUTURE} INTO (...)"
+        )
+    definitions = ", ".join([_definition(d) for d in days] + [f"PARTITION {FUTURE} VALUES LESS THAN (MAXVALUE)"])
+    conn.exec_driver_sql(f"ALTER TABLE {table} REORGANIZE PARTITION {FUTURE} INTO ({definitions})")
+    print(f"✅ {table}: {len(days)} yeni bölüm ({partition_name(days[0])}..{partition_name(days[-1])})")
+    return [partition_name(d) for d in days]
+
+
+# --------------------------
+# Saklama: süresi dolan günlük bölümler DROP PARTITION ile (satır satır DELETE yok)
+# archive(table, day) verilirse bölüm düşürülmeden önce arşivlenir
+# --------------------------
+def drop_expired_partitions(conn, table, retention_days=None, archive=None, today=None):
+    retention_days = getattr(settings, PARTITIONED_TABLES[table][1]) if retention_days is None else retention_days
+    today = today or datetime.utcnow().date()
+    cutoff = today - timedelta(days=retention_days)
+    days = day_partitions(conn, table)
+    expired = [d for d in days if d < cutoff]
+    dropped = []
+    # p_old (migrate'in eski satırları): tamamı cutoff'tan önceyse gün gün arşivlenip tek seferde düşürülür
+    if any(name == OLD for name, _ in list_partitions(conn, table)) and (not days or days[0] <= cutoff):
+        if archive is not None:
+            old_days = conn.execute(text(f"SELECT DISTINCT DATE(timestamp) FROM {table} PARTITION ({OLD})")).scalars().all()
+            for day in sorted(old_days):
+                archive(table, day)
+        conn.exec_driver_sql(f"ALTER TABLE {table} DROP PARTITION {OLD}")
+        dropped.append(OLD)
+    for day in expired:
+        if archive is not None:
+            archive(table, day)
+        conn.exec_driver_sql(f"ALTER TABLE {table} DROP PARTITION {partition_name(day)}")
+        dropped.append(partition_name(day))
+    if dropped:
+        print(f"🗑 {table}: {len(dropped)} bölüm düşürüldü (< {cutoff})")
+    return dropped
+
+
+def maintain_partitions(archive=None):
+    """Günlük iş: her tablo için ileri bölümleri oluştur, süresi dolanları düşür."""
+    result = {}
+    with engine.connect() as conn:
+        for table in PARTITIONED_TABLES:
+            result[table] = {}
+            # İki adım bağımsız: ileri bölüm açılamasa da (ör. dolu p_future) saklama çalışır
+            try:
+                result[table]["created"] = ensure_future_partitions(conn, table)
+            except Exception as e:
+                print(f"⚠ {table} ileri bölüm hatası: {e}")
+                result[table]["error"] = str(e)
+            try:
+                result[table]["dropped"] = drop_expired_partitions(conn, table, archive=archive)
+            except Exception as e:
+                print(f"⚠ {table} saklama hatası: {e}")
+                result[table]["error"] = str(e)
+    return result
+
+
+# --------------------------
+# Mevcut (bölümlenmemiş) tabloyu taşıma
+# 1) {table}_new: LIKE ile kopya (FK'ler kopyalanmaz), PK (id, timestamp), günlük bölümler;
+#    saklama süresinden (ve MAX_DAY_PARTITIONS günden) eski satırlar tek bir p_old bölümüne
+# 2) Satırlar id sırasıyla parça parça kopyalanır (uzun kilit yok)
+# 3) Kopya sırasında eklenen satırlar kısa bir kilit altında yakalanır, RENAME TABLE ile atomik yer değiştirme
+# Taşıma sırasında ingestion (scheduler) durdurulmalı: kopyalanmış satırlara gelen güncellemeler (upsert) taşınmaz.
+# Partitioned InnoDB tablolar foreign key desteklemez; lokasyon silinince temizlik uygulama tarafında.
+# --------------------------
+def migrate_table(table, chunk_size=50000, days_ahead=None):
+    id_column = PARTITIONED_TABLES[table][0]
+    new, old = f"{table}_new", f"{table}_old"
+    started = time.monotonic()
+    with engine.connect() as conn:
+        if list_partitions(conn, table):
+            print(f"ℹ {table} zaten bölümlenmiş")
+            return
+        first = conn.execute(text(f"SELECT MIN(timestamp) FROM {table}")).scalar()
+        today = datetime.utcnow().date()
+        days_ahead = settings.PARTITION_PRECREATE_DAYS if days_ahead is None else days_ahead
+        last_day = today + timedelta(days=days_ahead)
+        retention_days = getattr(settings, PARTITIONED_TABLES[table][1])
+        first_day = max(
+            (first or datetime.utcnow()).date(),
+            today - timedelta(days=retention_days),
+            last_day - timedelta(days=MAX_DAY_PARTITIONS - 1),
+        )
+        days = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+        definitions = [_definition(d) for d in days] + [f"PARTITION {FUTURE} VALUES LESS THAN (MAXVALUE)"]
+        if first is not None and first.date() < first_day:
+            definitions.insert(0, f"PARTITION {OLD} VALUES LESS THAN ('{first_day:%Y-%m-%d} 00:00:00')")
+        definitions = ", ".join(definitions)
+
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {new}")
+        conn.exec_driver_sql(f"CREATE TABLE {new} LIKE {table}")
+        conn.exec_driver_sql(
+            f"ALTER TABLE {new} DROP PRIMARY KEY, ADD PRIMARY KEY ({id_column}, timestamp) "
+            f"PARTITION BY RANGE COLUMNS(timestamp) ({definitions})"
+        )
+        columns = ", ".join(r[0] for r in conn.execute(text(f"SHOW COLUMNS FROM {table}")).all())
+
+        def copy_after(last_id):
+            copied = 0
+            while True:
+                upper = conn.execute(text(
+                    f"SELECT MAX({id_column}) FROM (SELECT {id_column} FROM {table} WHERE {id_column} > :last "
+                    f"ORDER BY {id_column} LIMIT :n) AS chunk"
+                ), {"last": last_id, "n": chunk_size}).scalar()
+                if upper is None:
+                    return last_id, copied
+                result = conn.execute(text(
+                    f"INSERT IGNORE INTO {new} ({columns}) SELECT {columns} FROM {table} "
+                    f"WHERE {id_column} > :last AND {id_column} <= :upper"
+                ), {"last": last_id, "upper": upper})
+                conn.commit()
+                copied += result.rowcount
+                last_id = upper
+
+        last_id, copied = copy_after(0)
+        print(f"📦 {table}: {copied} satır kopyalandı, son yakalama yapılıyor")
+        # Kısa yazma kilidi: kopya sırasında gelen satırlar + atomik isim değişikliği (kilit altında RENAME, MySQL 8.0.13+)
+        conn.exec_driver_sql(f"LOCK TABLES {table} WRITE, {new} WRITE")
+        try:
+            last_id, extra = copy_after(last_id)
+            conn.exec_driver_sql(f"RENAME TABLE {table} TO {old}, {new} TO {table}")
+        finally:
+            conn.exec_driver_sql("UNLOCK TABLES")
+        print(f"✅ {table} bölümlendi ({len(days)} gün, {copied + extra} satır, {time.monotonic() - started:.0f}s); eski tablo: {old}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ölçüm tablolarının zaman bölümlemesi ve saklama süresi yönetimi.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="Bölümlenmemiş tabloyu günlük bölümlere taşı")
+    migrate.add_argument("tables", nargs="*", default=list(PARTITIONED_TABLES))
+    migrate.add_argument("--chunk-size", type=int, default=50000)
+    sub.add_parser("maintain", help="İleri bölümleri oluştur, süresi dolanları düşür")
+    sub.add_parser("list", help="Bölümleri listele")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "migrate":
+        for table in args.tables:
+            migrate_table(table, chunk_size=args.chunk_size)
+    elif args.command == "maintain":
+        from app.services import archive
+        maintain_partitions(archive=archive.archive_partition if settings.ARCHIVE_ENABLED else None)
+    else:
+        with engine.connect() as conn:
+            for table in PARTITIONED_TABLES:
+                partitions = list_partitions(conn, table)
+                print(f"{table}: {len(partitions)} bölüm, ~{sum(r or 0 for _, r in partitions)} satır")
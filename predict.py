@@ -1,5 +1,5 @@
 # app/api/v1/routers/predict.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
 '''
 FastAPI kütüphanesinden üç şeyi içe aktarıyoruz:
 APIRouter → Endpoint’leri bir router altında organize etmek için kullanılır. Modüler bir yapı sağlar.
@@ -21,6 +21,12 @@ from app.ml.predictor import Predictor
 ML (Machine Learning) tahminlerini yapan sınıfı içe aktarıyoruz.
 Bu sınıf muhtemelen eğitimli bir model içeriyor ve predict_aqi fonksiyonu ile AQI tahmini yapıyor.
 '''
+from app.ml.prediction_cache import prediction_cache
+from app.schemas import PredictionResponse
+'''
+Önceden hesaplanmış tahmin önbelleği (Predictions tablosu + bellek içi önbellek).
+Girdisi değişmemiş lokasyonlar için model her istekte yeniden çalıştırılmaz.
+'''
 
 router = APIRouter()
 '''
@@ -28,7 +34,26 @@ Yeni bir FastAPI router oluşturuyoruz.
 Bu router’a endpoint ekleyip, daha sonra ana FastAPI uygulamasına (app.include_router(router)) bağlayacağız.
 '''
 
-@router.get("/{location_id}")
+@router.post("/batch")
+# /{location_id} GET endpoint'inden önce tanımlı; "/batch" POST ile çağrılır.
+def predict_batch(
+    location_ids: list[int] | None = Body(None, embed=True),
+    persist: bool = Query(True),
+    db: Session = Depends(get_db)
+):
+    '''
+    Çok sayıda lokasyon için tek istekte tahmin.
+    Gövde: {"location_ids": [1, 2, 3]} — boş bırakılırsa son 24 saatte verisi olan tüm lokasyonlar.
+    persist=false → sonuçlar Predictions tablosuna yazılmaz, sadece döndürülür.
+    Yanıt sütun bazlıdır: {"model_version", "timestamp", "count", "location_ids": [...], "predicted_aqi": [...], ...}
+    '''
+    res = Predictor().predict_batch(db, location_ids, persist=persist)
+    if res["count"] == 0:
+        raise HTTPException(status_code=400, detail="Yeterli veri yok")
+    return res
+
+
+@router.get("/{location_id}", response_model=PredictionResponse)
 # Bu decorator endpoint’i tanımlar: /some_location_id yoluna gelen GET isteği bu fonksiyonu tetikler.
 # location_id URL parametresi olarak gelir.
 def predict(location_id: int, db: Session = Depends(get_db)):
@@ -42,6 +67,14 @@ def predict(location_id: int, db: Session = Depends(get_db)):
     '''
     Predictor sınıfının bir örneğini oluşturuyoruz.
     Bu örnek modelin tahmin yapmasını sağlar. Her çağrıda yeni bir örnek yaratıyoruz (stateless kullanım).
+    Model diskten tekrar yüklenmez: Predictor, process genelindeki model_registry önbelleğini kullanır (ucuz).
+    '''
+    cached = prediction_cache.get(db, location_id, predictor.model_version, predictor.feature_names)
+    if cached:
+        return {**cached, "cached": True}
+    '''
+    Önce önbelleğe / Predictions tablosuna bakılır (aynı model sürümü, son PREDICTION_MAX_AGE_HOURS saat).
+    Lokasyonun girdi tablolarında tahminden daha yeni veri varsa (başka process yazmış olsa da) önbellek atlanır.
     '''
     res = predictor.predict_aqi(db, location_id)
     '''
@@ -52,9 +85,11 @@ def predict(location_id: int, db: Session = Depends(get_db)):
     Fonksiyonun döndürdüğü res, genellikle bir dict:
     {"aqi_predicted": 45, "timestamp": datetime.now()}
     Eğer bir hata oluşursa, dict içinde "error" anahtarı olabilir.
+    Bu yol sadece önbellekte tahmin yoksa (miss) çalışır: canlı tahmin.
     '''
     if isinstance(res, dict) and res.get("error"):
         raise HTTPException(status_code=400, detail=res["error"])
+    res["cached"] = False
     '''
     Tahmin sırasında bir hata oluşursa:
     res bir dict ve "error" anahtarı varsa, HTTP 400 Bad Request hatası döndür.
@@ -63,10 +98,13 @@ def predict(location_id: int, db: Session = Depends(get_db)):
     return res
 '''
 Tahmin başarılıysa res JSON olarak döndürülür.
-FastAPI dict’i otomatik JSON’a çevirir. Örnek çıktı:
+FastAPI dict’i otomatik JSON’a çevirir. Örnek çıktı (önbellekten gelse de aynı şema, PredictionResponse):
 {
-  "aqi_predicted": 45,
-  "timestamp": "2025-09-21T16:30:00"
+  "location_id": 123,
+  "predicted_aqi": 45,
+  "timestamp": "2025-09-21T16:00:00",
+  "model_version": "aqi_model@1727000000",
+  "cached": false
 }
 
 GET isteği gelir → /123 gibi bir location_id ile.
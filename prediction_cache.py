@@ -0,0 +1,139 @@
+# app/ml/prediction_cache.py
+import threading
+import time
+from datetime import datetime, timedelta
+
+from app import models
+from app.core.config import settings
+from app.ml import features
+from app.services import ingest_events
+
+# Tahmin girdisi olan tablolar; bunlardan gelen olaylar tahmini bayatlatır
+INPUT_SOURCES = {"airqualitydata", "weatherdata", "tempodata"}
+
+
+# --------------------------
+# Önceden hesaplanmış tahmin önbelleği
+# Kaynak: Predictions tablosu. Bellek isabeti DB'ye hiç gitmez: process içi ingestion olayları lokasyonu "dirty"
+# işaretleyip girdiyi düşürür, refresh_dirty() sadece onları yeniden hesaplar; başka process'in yazdığı veri en geç TTL sonra görünür.
+# Tablodan okunan tahminde bayatlık DB'den kontrol edilir: saklanan input_timestamp, girdi tablolarındaki güncel
+# en yeni timestamp'ten (features.input_marks) küçükse tahmin kullanılmaz (scheduler container, diğer worker).
+# --------------------------
+class PredictionCache:
+    def __init__(self, ttl=settings.PREDICTION_CACHE_TTL_SECONDS, max_age_hours=settings.PREDICTION_MAX_AGE_HOURS):
+        self.ttl = ttl
+        self.max_age = timedelta(hours=max_age_hours)
+        self._entries = {}   # location_id -> (entry, cached_at)
+        self._dirty = {}     # location_id -> olay sırası (refresh sırasında gelen olaylar kaybolmasın)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "db_hits": 0, "misses": 0, "stale": 0}
+
+    # ---- ingestion olayları ----
+    def on_ingest(self, source, changes):
+        if source not in INPUT_SOURCES:
+            return
+        with self._lock:
+            self._seq += 1
+            for location_id in changes:
+                self._dirty[location_id] = self._seq
+                self._entries.pop(location_id, None)
+
+    def dirty_ids(self):
+        with self._lock:
+            return sorted(self._dirty)
+
+    # ---- okuma ----
+    def get(self, db, location_id, model_version, feature_names=features.FEATURE_NAMES):
+        """
+        Önbellekte veya Predictions tablosunda güncel tahmin varsa döndürür, yoksa None (canlı tahmine düş).
+        Dönüş Predictor.predict_aqi ile aynı alanlar: location_id, predicted_aqi, timestamp, model_version.
+        Bellek isabeti DB'ye gitmez (process içi olaylar dirty işaretler, başka process'in yazdığını TTL sınırlar);
+        input_marks bayatlık kontrolü sadece Predictions tablosundan okunan tahminde yapılır.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if location_id in self._dirty:
+                self.stats["misses"] += 1
+                return None
+            cached = self._entries.get(location_id)
+            if cached and now - cached[1] < self.ttl and cached[0]["model_version"] == model_version:
+                self.stats["hits"] += 1
+                return {k: v for k, v in cached[0].items() if k != "input_timestamp"}
+
+        row = (
+            db.query(models.Predictions.timestamp, models.Predictions.predicted_aqi, models.Predictions.input_timestamp)
+            .filter(
+                models.Predictions.location_id == location_id,
+                models.Predictions.model_version == model_version,
+                models.Predictions.timestamp >= datetime.utcnow() - self.max_age,
+            )
+            .order_by(models.Predictions.timestamp.desc())
+            .first()
+        )
+        if row is None:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        entry = {
+            "location_id": location_id, "predicted_aqi": row[1], "timestamp": row[0],
+            "model_version": model_version, "input_timestamp": row[2],
+        }
+
+        # Girdi tablolarında tahminden sonra gelmiş veri var mı (tek lokasyon, (location_id, timestamp) index'i)
+        latest_input = features.input_marks(db, [location_id], feature_names).get(location_id)
+        stale = latest_input is not None and (entry["input_timestamp"] is None or latest_input > entry["input_timestamp"])
+        with self._lock:
+            if stale or location_id in self._dirty:
+                self._entries.pop(location_id, None)
+                self.stats["stale" if stale else "misses"] += 1
+                return None
+            self._entries[location_id] = (entry, now)
+            self.stats["db_hits"] += 1
+        return {k: v for k, v in entry.items() if k != "input_timestamp"}
+
+    # ---- yazma ----
+    def put_batch(self, result):
+        """Predictor.predict_batch sonucunu (sütun bazlı) önbelleğe alır."""
+        now = time.monotonic()
+        with self._lock:
+            for location_id, value, input_timestamp in zip(result["location_ids"], result["predicted_aqi"], result["input_timestamps"]):
+                self._entries[location_id] = (
+                    {
+                        "location_id": location_id, "predicted_aqi": int(round(value)), "timestamp": result["timestamp"],
+                        "model_version": result["model_version"], "input_timestamp": input_timestamp,
+                    },
+                    now,
+                )
+
+    def _clear_dirty(self, snapshot):
+        with self._lock:
+            for location_id, seq in snapshot.items():
+                if self._dirty.get(location_id) == seq:
+                    del self._dirty[location_id]
+
+    def refresh_dirty(self, db):
+        """Girdisi değişen lokasyonlar için toplu tahmin yapar, Predictions'a yazar, önbelleği günceller."""
+        with self._lock:
+            snapshot = dict(self._dirty)
+        if not snapshot:
+            return None
+        from app.ml.predictor import Predictor
+        result = Predictor().predict_batch(db, sorted(snapshot))
+        self.put_batch(result)
+        # Verisi olmayan (tahmin üretilemeyen) lokasyonlar da temizlenir; bir sonraki olayda tekrar işaretlenir
+        self._clear_dirty(snapshot)
+        return result
+
+    def refresh_all(self, db):
+        with self._lock:
+            snapshot = dict(self._dirty)
+        from app.ml.predictor import Predictor
+        result = Predictor().predict_batch(db)
+        self.put_batch(result)
+        self._clear_dirty(snapshot)
+        return result
+
+
+prediction_cache = PredictionCache()
+ingest_events.subscribe(prediction_cache.on_ingest)
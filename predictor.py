@@ -11,11 +11,21 @@ os → İşletim sistemi ile ilgili işlemler için Python’un standart kütüp
 
 Burada dosya yolu ve ortam değişkenleri (environment variables) yönetmek için kullanılıyor.
 '''
+import threading
+import time
+from datetime import datetime
+import numpy as np
 from app import crud
 '''
 Projede yazılmış olan CRUD fonksiyonlarını içe aktarıyor.
 
-Buradan crud.get_last_24h_air_quality fonksiyonunu kullanarak son 24 saatlik AQI verilerini DB’den alıyoruz.
+Buradan crud.bulk_upsert_predictions ile tahminleri toplu olarak DB’ye yazıyoruz.
+'''
+from app.ml import features
+'''
+Özellik çıkarımı (feature extraction) katmanı: pencereli aggregate'ler (3s/24s ortalama, maksimum, son değer, eğim)
+
+airqualitydata, weatherdata ve tempodata üzerinde SQL tarafında hesaplanır; ORM nesnesi değil NumPy dizisi döner.
 '''
 
 MODEL_PATH = os.getenv("ML_MODEL_DIR", "app/ml/models/aqi_model.pkl")
@@ -31,87 +41,178 @@ Yoksa varsayılan olarak "app/ml/models/aqi_model.pkl" yolunu alır.
 Bu dosya, eğitilmiş modelin pickle (.pkl) formatında saklandığı yer.
 '''
 
+MODEL_MMAP_MODE = os.getenv("ML_MODEL_MMAP_MODE") or None
+MODEL_RELOAD_CHECK_SECONDS = float(os.getenv("ML_MODEL_RELOAD_CHECK_SECONDS", "5"))
+'''
+ML_MODEL_MMAP_MODE="r" verilirse joblib modeldeki numpy dizilerini bellek eşlemeli (memory-mapped) açar.
+
+Böylece aynı sunucudaki worker process'ler modelin büyük dizilerini işletim sisteminin sayfa önbelleğinden paylaşır.
+
+(Bunun için model joblib.dump(..., compress=0) ile sıkıştırmasız kaydedilmiş olmalı.)
+
+ML_MODEL_RELOAD_CHECK_SECONDS → model dosyasının değişip değişmediği en fazla bu sıklıkla kontrol edilir.
+'''
+
+
+class ModelRegistry:
+    '''
+    Process başına model önbelleği.
+
+    Her model dosyası (yol) process içinde bir kez yüklenir; sonraki Predictor() çağrıları aynı nesneyi kullanır.
+
+    Dosyanın mtime/boyutu değişirse yeni model yüklenir ve tek bir atama ile eskisinin yerine konur (atomik değişim).
+
+    Yükleme başarısız olursa (ör. dosya yazılırken) eski model servis edilmeye devam eder.
+    '''
+    def __init__(self, mmap_mode=MODEL_MMAP_MODE, check_interval=MODEL_RELOAD_CHECK_SECONDS):
+        self.mmap_mode = mmap_mode
+        self.check_interval = check_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _signature(path):
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def get(self, path=MODEL_PATH):
+        entry = self._entries.get(path)
+        if entry and time.monotonic() - entry["checked_at"] < self.check_interval:
+            return entry
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and time.monotonic() - entry["checked_at"] < self.check_interval:
+                return entry
+            if not os.path.exists(path):
+                if entry:
+                    print(f"⚠ Model dosyası bulunamadı, önceki model kullanılıyor: {path}")
+                    return entry
+                raise FileNotFoundError(f"Model not found at {path}")
+
+            signature = self._signature(path)
+            if entry is None or entry["signature"] != signature:
+                try:
+                    model = joblib.load(path, mmap_mode=self.mmap_mode)
+                except Exception as e:
+                    if entry is None:
+                        raise
+                    print(f"⚠ Model yeniden yüklenemedi, önceki model kullanılıyor: {e}")
+                    entry["checked_at"] = time.monotonic()
+                    return entry
+                entry = {
+                    "model": model,
+                    "signature": signature,
+                    "version": f"{os.path.splitext(os.path.basename(path))[0]}@{signature[0] // 1_000_000_000}",
+                    "checked_at": time.monotonic(),
+                }
+                self._entries[path] = entry
+                print(f"✅ Model yüklendi: {entry['version']}")
+            else:
+                entry["checked_at"] = time.monotonic()
+            return entry
+
+    def warm_up(self, paths=(MODEL_PATH,)):
+        for path in paths:
+            self.get(path)
+
+
+model_registry = ModelRegistry()
+'''
+Process genelinde tek registry. Uygulama açılışında (startup event) model_registry.warm_up() çağrılırsa
+
+ilk /predict isteği modeli diskten yüklemek zorunda kalmaz.
+'''
+
 class Predictor:
     '''
     Tahmin işlemlerini kapsayan bir sınıf tanımlıyoruz.
 
     Bu sınıf, modeli yükleyip tahmin yapma işlevlerini içeriyor.
     '''
-    def __init__(self):
-        if not os.path.exists(MODEL_PATH):
-            raise FileNotFoundError(f"Model not found at {MODEL_PATH}")
-        self.model = joblib.load(MODEL_PATH)
+    def __init__(self, model_path: str = MODEL_PATH):
+        entry = model_registry.get(model_path)
+        self.model = entry["model"]
+        self.model_version = entry["version"]
+        self.feature_names = features.resolve_model_features(self.model)
+        self.fill_values = features.fill_values(self.model, self.feature_names)
         '''
         Kurucu metod (__init__): Sınıftan Predictor() nesnesi oluşturulunca otomatik çalışır.
 
-        if not os.path.exists(MODEL_PATH): Eğer model dosyası bulunmazsa → FileNotFoundError hatası fırlatır.
+        Model artık her seferinde diskten yüklenmez; model_registry process içindeki önbellekten verir.
 
-        self.model = joblib.load(MODEL_PATH): Model dosyası bulunduysa RAM’e yüklenir.
+        Model dosyası bulunmazsa (ve daha önce yüklenmemişse) → FileNotFoundError hatası fırlatır.
 
-        Artık self.model.predict(...) ile tahmin yapılabilir.
-        '''
+        self.model_version: dosya adı + değiştirilme zamanı (ör. "aqi_model@1727000000"); Predictions tablosuna yazılabilir.
 
-    def predict_aqi(self, db, location_id: int):
-        '''
-        predict_aqi → Belirli bir lokasyon için hava kalitesi tahmini yapan metod.
+        self.feature_names: modelin beklediği özellikler (features.FEATURE_SPEC içinden, sırasıyla).
 
-        Parametreler:
+        Model spec'e uymuyorsa (bilinmeyen özellik adı veya özellik sayısı) → ValueError; yanlış girdiyle sessizce tahmin yapılmaz.
 
-        db: Veritabanı oturumu (FastAPI’de Depends(get_db) ile geliyor).
+        Tek özellikli eski model ("aqi_avg_24h") aynen çalışmaya devam eder.
 
-        location_id: Hangi konum için tahmin yapılacağını belirler.
-        '''
-        data = crud.get_last_24h_air_quality(db, location_id)
+        self.fill_values: eksik özellikler için sabit dolgu değerleri (modelin eğitim ortalamaları, yoksa spec varsayılanları).
+
+        Artık self.model.predict(...) ile tahmin yapılabilir.
         '''
-        Verilen location_id için son 24 saatteki hava kalitesi verilerini DB’den çekiyor.
 
-        Bu veri listesi data içinde saklanıyor.
+    def _feature_matrix(self, db, location_ids):
+        ids, X = features.build_feature_matrix(db, location_ids, self.feature_names)
+        keep = features.rows_with_history(X, self.feature_names)
+        return ids[keep], features.impute_missing(X[keep], self.fill_values)
         '''
-        if not data:
-            return {"error": "Yeterli veri yok"}
+        Hava kalitesi geçmişi olmayan lokasyonlar atılır; kalan eksik değerler (ör. TEMPO verisi yok) sabit dolgu değerleriyle doldurulur.
+
+        Dolgu batch'ten hesaplanmaz: aynı lokasyon /predict/{id}, predict_batch ve tahmin önbelleğinde aynı girdiyi alır.
         '''
-        Eğer hiç veri bulunmazsa, tahmin yapılamaz.
 
-        Bu durumda bir hata mesajı döndürülüyor: "Yeterli veri yok".
+    def _predict(self, X):
+        if getattr(self.model, "feature_names_in_", None) is not None:
+            import pandas as pd
+            X = pd.DataFrame(X, columns=list(self.feature_names))
+        return self.model.predict(X)
+        '''
+        DataFrame ile eğitilmiş modeller sütun isimlerini de kontrol eder; isimli girdi veriyoruz.
         '''
 
-        # example feature: mean of aqi values (modify with real fe)
-        features = [record.aqi for record in data if record.aqi is not None]
+    def predict_aqi(self, db, location_id: int):
         '''
-        Burada basit bir özellik çıkarımı (feature extraction) yapılıyor.
+        predict_aqi → Belirli bir lokasyon için hava kalitesi tahmini yapan metod.
 
-        data içindeki her kaydın aqi değeri alınıyor.
+        Parametreler:
 
-        Eğer aqi boş değilse (None değilse), listeye ekleniyor.
+        db: Veritabanı oturumu (FastAPI’de Depends(get_db) ile geliyor).
 
-        Sonuç: features listesi → son 24 saatte ölçülmüş AQI değerleri.
+        location_id: Hangi konum için tahmin yapılacağını belirler.
         '''
-        if not features:
-            return {"error": "Yeterli sayıda AQI ölçümü yok"}
+        ids, X = self._feature_matrix(db, [location_id])
         '''
-        Eğer hiç geçerli AQI ölçümü yoksa, tahmin yapılamaz.
+        Verilen location_id için özellikler tek tek ORM kayıtları çekilmeden, SQL aggregate'leri ile hesaplanıyor.
 
-        Bu durumda "Yeterli sayıda AQI ölçümü yok" hatası döndürülür.
+        X → (1, özellik sayısı) boyutlu NumPy matrisi.
         '''
-        avg = sum(features) / len(features)
+        if len(ids) == 0:
+            return {"error": "Yeterli veri yok"}
         '''
-        features listesindeki AQI değerlerinin ortalaması alınıyor.
+        Son 24 saatte hiç hava kalitesi ölçümü yoksa tahmin yapılamaz.
 
-        Burada örnek olarak ortalama değer modelin girdisi olarak kullanılıyor.
-
-        Gerçekte, daha fazla özellik (PM2.5, PM10, sıcaklık, nem vs.) eklenebilir.
+        Bu durumda bir hata mesajı döndürülüyor: "Yeterli veri yok".
         '''
-        prediction = self.model.predict([[avg]])
+        prediction = self._predict(X)
         '''
-        self.model.predict(...): Yüklenen model ile tahmin yapar.
+        self._predict(...): Yüklenen model ile tahmin yapar.
 
-        Modelin beklediği girdi formatı → 2 boyutlu bir liste ([[avg]]).
-
-        Yani tek bir örnek, tek bir özellik: ortalama AQI.
+        Eski model için girdi → [[ortalama AQI]]; zengin modeller için spec'teki tüm özellikler.
 
         Çıktı prediction değişkenine kaydedilir (örn: [75.3] gibi).
         '''
-        return {"location_id": location_id, "predicted_aqi": float(prediction[0])}
+        if not np.isfinite(prediction[0]):
+            return {"error": "Model geçerli bir tahmin üretmedi"}
+        return {
+            "location_id": location_id,
+            "predicted_aqi": int(round(float(prediction[0]))),
+            "timestamp": datetime.utcnow().replace(minute=0, second=0, microsecond=0),
+            "model_version": self.model_version,
+        }
     
     '''
     Tahmin sonucu bir JSON dict olarak döndürülüyor.
@@ -120,7 +221,11 @@ class Predictor:
 
     location_id: Hangi lokasyon için tahmin yapıldığını gösterir.
 
-    predicted_aqi: Tahmin edilen AQI değeri (float’a çevrilmiş).
+    predicted_aqi: Tahmin edilen AQI değeri (Predictions tablosundaki gibi tam sayıya yuvarlanmış).
+
+    timestamp / model_version: predict_batch ile aynı (saat başına hizalı zaman, model sürümü);
+
+    böylece canlı tahmin ile önbellekten gelen tahmin aynı şemadadır (schemas.PredictionResponse).
 
     ✅ Özet:
 
@@ -131,4 +236,76 @@ class Predictor:
     Ortalama AQI’yi model girdisi olarak kullanır.
 
     Tahmin edilen değeri JSON olarak döndürür.
-    '''
\ No newline at end of file
+    '''
+
+    def predict_batch(self, db, location_ids=None, persist: bool = True, chunk_size: int = 50000):
+        '''
+        predict_batch → Çok sayıda lokasyon için tek seferde tahmin yapar (forecast haritası için).
+
+        location_ids verilmezse son 24 saatte AQI ölçümü olan tüm lokasyonlar kullanılır.
+
+        persist=True ise sonuçlar Predictions tablosuna model_version ile birlikte toplu (bulk upsert) yazılır.
+        '''
+        ids, X = self._feature_matrix(db, location_ids)
+        '''
+        Özellikler tablo başına tek SQL GROUP BY ile hesaplanır: lokasyon başına sorgu yok.
+
+        ids → lokasyonlar, X → (n, özellik sayısı) matrisi.
+        '''
+        predictions = np.empty(len(ids), dtype=float)
+        for start in range(0, len(ids), chunk_size):
+            predictions[start:start + chunk_size] = self._predict(X[start:start + chunk_size])
+        '''
+        Model tek tek satırlarla değil, (n, özellik sayısı) boyutlu NumPy matrisiyle çağrılır (vektörel tahmin).
+
+        chunk_size → çok büyük lokasyon sayılarında bellek kullanımını sınırlamak için.
+        '''
+        finite = np.isfinite(predictions)
+        invalid = ids[~finite].tolist()
+        ids, predictions = ids[finite], predictions[finite]
+        if invalid:
+            print(f"⚠ {len(invalid)} lokasyon için model NaN/sonsuz tahmin üretti, atlandı")
+        '''
+        NaN/sonsuz tahminler (ör. modelin doldurulamayan girdisi) batch'i durdurmaz: atlanır ve "invalid" listesinde döner.
+        '''
+        now = datetime.utcnow()
+        timestamp = now.replace(minute=0, second=0, microsecond=0)
+        marks = features.input_marks(db, ids.tolist(), self.feature_names, now) if len(ids) else {}
+        result = {
+            "model_version": self.model_version,
+            "timestamp": timestamp,
+            "count": int(len(ids)),
+            "location_ids": ids.tolist(),
+            "predicted_aqi": predictions.tolist(),
+            "invalid": invalid,
+            "input_timestamps": [marks.get(location_id) for location_id in ids.tolist()],
+        }
+        if location_ids is not None:
+            result["missing"] = sorted(set(location_ids) - set(result["location_ids"]) - set(invalid))
+        '''
+        Sonuç sütun bazlı (columnar) döner: 100 binlerce lokasyonda dict listesinden çok daha küçük bir JSON.
+
+        missing → istenip de son 24 saatte AQI ölçümü olmayan lokasyonlar.
+
+        input_timestamps → lokasyon başına tahmin girdisinin en yeni timestamp'i (features.input_marks);
+
+        Predictions'a tahminle birlikte yazılır, önbellek bayatlığı bununla anlaşılır.
+        '''
+        if persist and len(ids):
+            counts = crud.bulk_upsert_predictions(db, (
+                {
+                    "location_id": location_id,
+                    "timestamp": timestamp,
+                    "model_version": self.model_version,
+                    "predicted_aqi": int(round(value)),
+                    "input_timestamp": input_timestamp,
+                }
+                for location_id, value, input_timestamp in zip(
+                    result["location_ids"], result["predicted_aqi"], result["input_timestamps"]
+                )
+            ))
+            result.update(counts)
+        '''
+        Tahminler saat başına hizalı timestamp ile yazılır; aynı saat aynı model ile tekrar çalışırsa satırlar güncellenir (uniq_predictions).
+        '''
+        return result
@@ -0,0 +1,181 @@
+# app/services/rate_limiter.py
+import asyncio
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Küçük sayı önce: interaktif istekler (fetch-and-save) toplu taramaların önüne geçer
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+_priority = contextvars.ContextVar("api_priority", default=PRIORITY_BULK)
+_limiters = {}
+
+
+class QuotaExceeded(Exception):
+    """Sağlayıcının günlük kotası (veya toplu işler için ayrılan kısmı) doldu."""
+
+
+@contextmanager
+def priority_scope(priority):
+    """
+    Bu blok içindeki dış API çağrıları verilen öncelikle kuyruğa girer.
+    contextvar olduğu için asyncio.gather'ın açtığı task'lara ve run_sync loop'una da geçer.
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "loop", "future")
+
+    def __init__(self, priority, seq, loop):
+        self.priority = priority
+        self.seq = seq
+        self.loop = loop
+        self.future = None
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+# --------------------------
+# Token bucket + günlük kota + öncelik kuyruğu (sağlayıcı başına tek nesne, process genelinde paylaşılır)
+# --------------------------
+class RateLimiter:
+    """
+    rate_per_minute hızında dolan, en fazla burst token tutan kova; her HTTP isteği bir token harcar.
+    Token'ı sadece kuyruğun başındaki (en yüksek öncelikli, en eski) bekleyen alır; diğerleri
+    uyandırılana kadar uyur (polling yok). Farklı thread/loop'lardaki çağıranlar aynı kovayı paylaşır.
+    """
+    def __init__(self, name, rate_per_minute, burst, daily_quota=None, interactive_reserve=0.0):
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.daily_quota = daily_quota
+        self.interactive_reserve = interactive_reserve
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._day = datetime.utcnow().date()
+        self._used_today = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.stats = {"acquired": 0, "rejected": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0, "penalties": 0}
+        _limiters[name] = self
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        today = datetime.utcnow().date()
+        if today != self._day:
+            self._day, self._used_today = today, 0
+
+    def _quota_left(self, priority):
+        if self.daily_quota is None:
+            return True
+        limit = self.daily_quota
+        if priority > PRIORITY_INTERACTIVE:
+            # Kotanın bir kısmı interaktif istekler için ayrılır: toplu tarama kotayı tüketse de kullanıcı isteği çalışır
+            limit = int(self.daily_quota * (1 - self.interactive_reserve))
+        return self._used_today < limit
+
+    def _wake_head(self):
+        if self._waiters:
+            head = self._waiters[0]
+            if head.future is not None:
+                future = head.future
+                head.loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+    def _remove(self, waiter):
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+            heapq.heapify(self._waiters)
+            self._wake_head()
+
+    async def acquire(self, priority=None):
+        """Bir token alana kadar bekler; günlük kota dolduysa QuotaExceeded."""
+        priority = current_priority() if priority is None else priority
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        with self._lock:
+            self._refill()
+            if not self._quota_left(priority):
+                self.stats["rejected"] += 1
+                raise QuotaExceeded(f"{self.name} günlük kotası doldu ({self._used_today}/{self.daily_quota})")
+            waiter = _Waiter(priority, next(self._seq), loop)
+            heapq.heappush(self._waiters, waiter)
+        try:
+            while True:
+                with self._lock:
+                    self._refill()
+                    if self._waiters[0] is waiter:
+                        if not self._quota_left(priority):
+                            self.stats["rejected"] += 1
+                            self._remove(waiter)
+                            raise QuotaExceeded(f"{self.name} günlük kotası doldu ({self._used_today}/{self.daily_quota})")
+                        if self._tokens >= 1:
+                            self._tokens -= 1
+                            self._used_today += 1
+                            heapq.heappop(self._waiters)
+                            self._wake_head()
+                            waited = time.monotonic() - started
+                            self.stats["acquired"] += 1
+                            self.stats["wait_seconds"] += waited
+                            self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], waited)
+                            return waited
+                        delay = (1 - self._tokens) / self.rate
+                        waiter.future = None
+                    else:
+                        delay = None
+                        waiter.future = loop.create_future()
+                if delay is None:
+                    await waiter.future
+                else:
+                    await asyncio.sleep(delay)
+        except BaseException:
+            with self._lock:
+                self._remove(waiter)
+            raise
+        '''
+        Başta uyuyan bekleyen, daha öncelikli biri gelirse uyanınca baş olmadığını görür ve future'da beklemeye geçer;
+        yeni gelen baş ise zaten çalışmaktadır, kendi token'ını kendisi bekler.
+        '''
+
+    def penalize(self, seconds):
+        """Sağlayıcı 429 döndürdüyse kovayı boşalt: sonraki istekler en az seconds kadar bekler."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+            self.stats["penalties"] += 1
+
+    def metrics(self):
+        with self._lock:
+            self._refill()
+            acquired = self.stats["acquired"]
+            return {
+                **self.stats,
+                "avg_wait_seconds": self.stats["wait_seconds"] / acquired if acquired else 0.0,
+                "tokens": round(self._tokens, 2),
+                "queued": len(self._waiters),
+                "used_today": self._used_today,
+                "daily_quota": self.daily_quota,
+                "rate_per_minute": self.rate * 60,
+            }
+
+
+def metrics():
+    """Tüm sağlayıcıların limiter metrikleri (bekleme süresi, red sayısı, kota kullanımı)."""
+    return {name: limiter.metrics() for name, limiter in _limiters.items()}
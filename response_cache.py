@@ -0,0 +1,183 @@
+# app/services/response_cache.py
+import asyncio
+import concurrent.futures
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+
+_caches = {}
+
+
+# --------------------------
+# Disk katmanı: restart sonrası da geçerli yanıtlar (tek sqlite dosyası, tüm sağlayıcılar)
+# --------------------------
+class _DiskStore:
+    def __init__(self, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (cache TEXT, key TEXT, stored_at REAL, body TEXT, PRIMARY KEY (cache, key))"
+        )
+        self._lock = threading.Lock()
+
+    def get(self, cache, key, min_stored_at):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stored_at, body FROM responses WHERE cache = ? AND key = ? AND stored_at >= ?",
+                (cache, key, min_stored_at),
+            ).fetchone()
+        return (row[0], row[1].encode("utf-8") if isinstance(row[1], str) else row[1]) if row else None
+
+    def put(self, cache, key, stored_at, body):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (cache, key, stored_at, body) VALUES (?, ?, ?, ?)",
+                (cache, key, stored_at, body.decode("utf-8")),
+            )
+
+    def purge(self, cache, min_stored_at):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE cache = ? AND stored_at < ?", (cache, min_stored_at))
+
+
+_disk = None
+_disk_lock = threading.Lock()
+
+
+def _disk_store():
+    global _disk
+    with _disk_lock:
+        if _disk is None and settings.RESPONSE_CACHE_DISK:
+            _disk = _DiskStore(settings.RESPONSE_CACHE_PATH)
+        return _disk
+
+
+def _encode(value):
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+# --------------------------
+# Koordinatı ızgaraya oturtulmuş dış API yanıt önbelleği
+# Bellek (LRU) → disk (sqlite) → ağ; aynı anahtar için eşzamanlı istekler tek ağ çağrısında birleşir (single-flight)
+# Bellekte dict değil kompakt JSON baytları tutulur ve sınır bayt cinsindendir: büyük cevaplar (One Call)
+# giriş sayısıyla sınırlanınca GB'larca yer tutabiliyordu. Her isabet kendi kopyasını alır (paylaşılan dict değiştirilemez).
+# --------------------------
+class ResponseCache:
+    def __init__(self, name, resolution, ttl, max_entries=None, max_bytes=None):
+        self.name = name
+        self.resolution = resolution
+        self.ttl = ttl
+        self.max_entries = max_entries or settings.RESPONSE_CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or settings.RESPONSE_CACHE_MAX_BYTES
+        self._entries = OrderedDict()  # key -> (stored_at, JSON baytları), en eski başta
+        self._bytes = 0
+        self._inflight = {}            # key -> concurrent.futures.Future (thread/loop'lar arası beklenebilir)
+        self._lock = threading.Lock()
+        self._purged = False
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+        _caches[name] = self
+
+    def snap(self, lat, lon):
+        """Koordinatı resolution derecelik ızgaranın en yakın noktasına yuvarlar (istek de bu noktayla atılır)."""
+        step = self.resolution
+        return round(round(lat / step) * step, 6), round(round(lon / step) * step, 6)
+
+    def _memory_get(self, key, now):
+        cached = self._entries.get(key)
+        if cached is None:
+            return None
+        if now - cached[0] >= self.ttl:
+            del self._entries[key]
+            self._bytes -= len(cached[1])
+            return None
+        self._entries.move_to_end(key)
+        return cached
+
+    def _memory_put(self, key, stored_at, body):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous[1])
+        if len(body) > self.max_bytes:
+            return
+        self._entries[key] = (stored_at, body)
+        self._bytes += len(body)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._bytes -= len(self._entries.popitem(last=False)[1][1])
+
+    async def get_or_fetch(self, key, fetch):
+        """fetch: argümansız coroutine fonksiyonu (sadece gerçekten ağa çıkılacaksa çağrılır)."""
+        now = time.time()
+        with self._lock:
+            cached = self._memory_get(key, now)
+            if cached is not None:
+                self.stats["memory_hits"] += 1
+                return json.loads(cached[1])
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                inflight = self._inflight[key] = concurrent.futures.Future()
+                owner = True
+            else:
+                self.stats["coalesced"] += 1
+                owner = False
+        if not owner:
+            return await asyncio.wrap_future(inflight)
+
+        try:
+            # sqlite çağrıları senkron: event loop'u bloklamasınlar diye thread'de
+            disk = await asyncio.to_thread(_disk_store)
+            hit = None
+            if disk is not None:
+                if not self._purged:
+                    await asyncio.to_thread(disk.purge, self.name, now - self.ttl)
+                    self._purged = True
+                hit = await asyncio.to_thread(disk.get, self.name, key, now - self.ttl)
+            if hit is not None:
+                stored_at, body = hit
+                value = json.loads(body)
+                self.stats["disk_hits"] += 1
+            else:
+                self.stats["misses"] += 1
+                value = await fetch()
+                stored_at = time.time()
+                body = _encode(value)
+                if disk is not None:
+                    await asyncio.to_thread(disk.put, self.name, key, stored_at, body)
+        except BaseException as e:
+            self.stats["errors"] += 1
+            with self._lock:
+                self._inflight.pop(key, None)
+            # Bekleyenler de aynı hatayı alır; hata önbelleğe yazılmaz, sonraki istek tekrar dener
+            inflight.set_exception(e if isinstance(e, Exception) else RuntimeError(f"{self.name} isteği iptal edildi"))
+            raise
+        with self._lock:
+            self._memory_put(key, stored_at, body)
+            self._inflight.pop(key, None)
+        inflight.set_result(value)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"] + self.stats["coalesced"]
+            hits = lookups - self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "memory_bytes": self._bytes,
+                "hit_ratio": round(hits / lookups, 3) if lookups else None,
+                "resolution_deg": self.resolution,
+                "ttl_seconds": self.ttl,
+            }
+
+
+def metrics():
+    return {name: cache.metrics() for name, cache in _caches.items()}
@@ -0,0 +1,228 @@
+# app/services/rollups.py
+import time
+from datetime import datetime, time as dtime, timedelta
+
+from sqlalchemy import and_, case, delete, func, or_, select, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from app import crud, models
+from app.core.config import settings
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+RANGE_CHUNK = 500  # tek sorgudaki (location_id, zaman aralığı) koşulu sayısı
+
+_DIRTY = models.RollupDirty.__table__
+_HOURLY = models.RollupHourly.__table__
+_DAILY = models.RollupDaily.__table__
+
+
+# --------------------------
+# Yardımcılar
+# --------------------------
+def _ranges(location_col, time_col, buckets, width):
+    # Her (location_id, kova) için unique index üzerinde ayrı bir range
+    return or_(*(
+        and_(location_col == location_id, time_col >= start, time_col < start + width)
+        for location_id, start in buckets
+    ))
+
+
+def _chunks(items, size=RANGE_CHUNK):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _upsert(db, table, rows):
+    if not rows:
+        return
+    stmt = mysql_insert(table).values(rows)
+    db.execute(stmt.on_duplicate_key_update({
+        c: stmt.inserted[c] for c in ("min_value", "max_value", "sum_value", "count")
+    }))
+
+
+# --------------------------
+# Saatlik: ham tablodan sadece kirli kovalar
+# --------------------------
+def recompute_hourly(db, source, buckets):
+    model, fields = crud.TIMESERIES_TABLES[source]
+    table = model.__table__
+    day, hour = func.date(table.c.timestamp), func.hour(table.c.timestamp)
+    aggregates = []
+    for f in fields:
+        aggregates += [func.min(table.c[f]), func.max(table.c[f]), func.sum(table.c[f]), func.count(table.c[f])]
+    # Kovanın eski rollup satırları önce silinir: ham satırları tamamen silinmiş kova geride satır bırakmasın
+    for chunk in _chunks(buckets):
+        db.execute(delete(_HOURLY).where(
+            _HOURLY.c.source == source, tuple_(_HOURLY.c.location_id, _HOURLY.c.bucket_start).in_(chunk)
+        ))
+    rows = []
+    for chunk in _chunks(buckets):
+        stmt = (
+            select(table.c.location_id, day, hour, *aggregates)
+            .where(_ranges(table.c.location_id, table.c.timestamp, chunk, HOUR))
+            .group_by(table.c.location_id, day, hour)
+        )
+        for r in db.execute(stmt).all():
+            bucket_start = datetime.combine(r[1], dtime(hour=int(r[2])))
+            for i, f in enumerate(fields):
+                mn, mx, total, count = r[3 + 4 * i:7 + 4 * i]
+                if count:
+                    rows.append({
+                        "source": source, "location_id": r[0], "bucket_start": bucket_start, "metric": f,
+                        "min_value": mn, "max_value": mx, "sum_value": total, "count": count,
+                    })
+    for chunk in _chunks(rows, crud.BULK_CHUNK_SIZE):
+        _upsert(db, _HOURLY, chunk)
+    return len(rows)
+
+
+# --------------------------
+# Günlük: etkilenen günler saatlik rollup'lardan (ham tabloya dönülmez)
+# --------------------------
+def recompute_daily(db, source, days):
+    day = func.date(_HOURLY.c.bucket_start)
+    for chunk in _chunks(days):
+        db.execute(delete(_DAILY).where(
+            _DAILY.c.source == source, tuple_(_DAILY.c.location_id, _DAILY.c.bucket_start).in_(chunk)
+        ))
+    rows = []
+    for chunk in _chunks(days):
+        stmt = (
+            select(
+                _HOURLY.c.location_id, day, _HOURLY.c.metric,
+                func.min(_HOURLY.c.min_value), func.max(_HOURLY.c.max_value),
+                func.sum(_HOURLY.c.sum_value), func.sum(_HOURLY.c["count"]),
+            )
+            .where(_HOURLY.c.source == source, _ranges(_HOURLY.c.location_id, _HOURLY.c.bucket_start, chunk, DAY))
+            .group_by(_HOURLY.c.location_id, day, _HOURLY.c.metric)
+        )
+        for r in db.execute(stmt).all():
+            rows.append({
+                "source": source, "location_id": r[0], "bucket_start": datetime.combine(r[1], dtime()),
+                "metric": r[2], "min_value": r[3], "max_value": r[4], "sum_value": r[5], "count": int(r[6]),
+            })
+    for chunk in _chunks(rows, crud.BULK_CHUNK_SIZE):
+        _upsert(db, _DAILY, chunk)
+    return len(rows)
+
+
+# --------------------------
+# Kirli kuyruğu işle
+# --------------------------
+def refresh_rollups(db, batch_size=None, max_batches=None):
+    """
+    rollup_dirty'deki kovaları batch_size'lık parçalarla işler: saatlik → günlük.
+    Kova, okunduğu version hâlâ geçerliyse silinir; arada yeni yazma geldiyse sonraki çalıştırmada tekrar hesaplanır.
+    """
+    batch_size = batch_size or settings.ROLLUP_BATCH_SIZE
+    stats = {"buckets": 0, "hourly_rows": 0, "daily_rows": 0}
+    started = time.monotonic()
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        dirty = db.execute(
+            select(_DIRTY.c.source, _DIRTY.c.location_id, _DIRTY.c.bucket_start, _DIRTY.c.version)
+            .order_by(_DIRTY.c.source, _DIRTY.c.location_id, _DIRTY.c.bucket_start)
+            .limit(batch_size)
+        ).all()
+        if not dirty:
+            break
+        try:
+            by_source = {}
+            for source, location_id, bucket_start, _ in dirty:
+                by_source.setdefault(source, set()).add((location_id, bucket_start))
+            for source, buckets in by_source.items():
+                stats["hourly_rows"] += recompute_hourly(db, source, sorted(buckets))
+                days = sorted({(location_id, datetime.combine(b.date(), dtime())) for location_id, b in buckets})
+                stats["daily_rows"] += recompute_daily(db, source, days)
+            for chunk in _chunks(dirty):
+                db.execute(delete(_DIRTY).where(
+                    tuple_(_DIRTY.c.source, _DIRTY.c.location_id, _DIRTY.c.bucket_start, _DIRTY.c.version).in_(
+                        [tuple(r) for r in chunk]
+                    )
+                ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        stats["buckets"] += len(dirty)
+        batches += 1
+        if len(dirty) < batch_size:
+            break
+    if stats["buckets"]:
+        print(f"✅ Rollup: {stats['buckets']} kova, {stats['hourly_rows']} saatlik / {stats['daily_rows']} günlük satır ({time.monotonic() - started:.1f}s)")
+    return stats
+
+
+# --------------------------
+# Okuma: history API'nin uzun aralıklı, kovalı sorguları için
+# --------------------------
+def rollup_table_for(bucket_minutes):
+    """Kova boyutu gün katıysa günlük, saat katıysa saatlik rollup; değilse None (ham tablo)."""
+    if bucket_minutes % (24 * 60) == 0:
+        return _DAILY
+    if bucket_minutes % 60 == 0:
+        return _HOURLY
+    return None
+
+
+def should_use_rollups(bucket_minutes, start, end):
+    """start/end naive UTC olmalı (router'lar query parametrelerini naive UTC'ye çevirir)."""
+    if not bucket_minutes or rollup_table_for(bucket_minutes) is None:
+        return False
+    if start is None:
+        return True
+    return (end or datetime.utcnow()) - start > timedelta(minutes=settings.ROLLUP_MIN_SPAN_MINUTES)
+
+
+def rollup_page(db, source, fields, location_ids, start, end, after, limit, bucket_minutes, agg):
+    """
+    history.bucket_page ile aynı çıktı: (location_id, bucket_start, alanlar...) satırları.
+    Ortalama sum/count'tan hesaplanır (ortalamaların ortalaması değil). start/end rollup kovası
+    başlangıcıyla karşılaştırılır; son kova rollup işi çalışana kadar (ROLLUP_INTERVAL_MINUTES) gecikebilir.
+    """
+    table = rollup_table_for(bucket_minutes)
+    seconds = bucket_minutes * 60
+    bucket_start = func.from_unixtime(func.floor(func.unix_timestamp(table.c.bucket_start) / seconds) * seconds).label("bucket_start")
+
+    def metric(f, column):
+        return case((table.c.metric == f, column))
+
+    columns = []
+    for f in fields:
+        if agg == "avg":
+            columns.append((func.sum(metric(f, table.c.sum_value)) / func.nullif(func.sum(metric(f, table.c["count"])), 0)).label(f))
+        elif agg == "min":
+            columns.append(func.min(metric(f, table.c.min_value)).label(f))
+        else:
+            columns.append(func.max(metric(f, table.c.max_value)).label(f))
+
+    conditions = [table.c.source == source, table.c.metric.in_(fields)]
+    if location_ids is not None:
+        conditions.append(table.c.location_id.in_(location_ids))
+    if start is not None:
+        conditions.append(table.c.bucket_start >= start)
+    if end is not None:
+        conditions.append(table.c.bucket_start < end)
+    stmt = select(table.c.location_id, bucket_start, *columns).where(*conditions)
+    window = select(table.c.location_id).where(*conditions).distinct()
+    if after is not None:
+        location_id, timestamp = after
+        next_start = timestamp + timedelta(seconds=seconds)
+        stmt = stmt.where(table.c.location_id >= location_id, or_(
+            table.c.location_id > location_id,
+            and_(table.c.location_id == location_id, table.c.bucket_start >= next_start),
+        ))
+        window = window.where(table.c.location_id >= location_id)
+    # history.bucket_page gibi: GROUP BY sadece sayfaya girebilecek ilk limit+2 lokasyonu toplar
+    last_location = db.execute(window.order_by(table.c.location_id).offset(limit + 1).limit(1)).scalar()
+    if last_location is not None:
+        stmt = stmt.where(table.c.location_id <= last_location)
+    stmt = (
+        stmt.group_by(table.c.location_id, bucket_start)
+        .order_by(table.c.location_id, bucket_start)
+        .limit(limit + 1)
+    )
+    return db.execute(stmt).all()
@@ -15,7 +15,7 @@ tempo_service adındaki servis dosyasını içe aktarıyoruz.
 
 Bu dosyada TEMPO uydusundan veri çekip DB’ye kaydeden fonksiyonlar bulunuyor.
 
-Burada kullanacağımız fonksiyon: fetch_and_save_all.
+Burada kullanacağımız fonksiyon: fetch_and_save_incremental.
 '''
 from app.db.session import SessionLocal
 '''
@@ -25,6 +25,17 @@ SessionLocal() → yeni bir veritabanı oturumu (session) açmamızı sağlar.
 
 Böylece tempo_service çalışırken DB’ye yazabileceğiz.
 '''
+from app.ml.prediction_cache import prediction_cache
+from app.services import rollups
+from app.db import partitions
+from app.services import archive
+from app.services import airnow_ingest
+from app.core.config import settings
+'''
+Tahmin önbelleği modül seviyesinde import ediliyor: import edilince ingestion olaylarına abone olur,
+
+böylece ilk çalıştırmadan itibaren hangi lokasyonların verisinin değiştiğini takip eder (model dosyası burada yüklenmez).
+'''
 
 def scheduled_job():
     """Scheduler tetiklendiğinde TEMPO verisini DB'ye kaydeder."""
@@ -40,13 +51,18 @@ def scheduled_job():
     Bu oturum tempo_service’in DB üzerinde çalışabilmesi için gerekli.
     '''
     try:
-        tempo_service.fetch_and_save_all(db, "2025-09-01", "2025-09-02")  # İstediğin tarih aralığı
+        tempo_service.fetch_and_save_incremental(db)
         '''
-        tempo_service.fetch_and_save_all(...) → belirtilen tarih aralığındaki TEMPO verilerini çekiyor ve DB’ye kaydediyor.
+        tempo_service.fetch_and_save_incremental(db) → her koleksiyonun high-water-mark'ından (tempo_cursors) sonra yayınlanan granülleri çeker.
 
-        Burada test amaçlı "2025-09-01" ile "2025-09-02" sabit girilmiş.
+        tempo_granules tablosunda "parsed" olarak kayıtlı granüller tekrar indirilmez; yeni granül yoksa iş neredeyse hiçbir şey yapmaz.
 
-        Gerçekte bu tarihleri dinamik hale getirebilirsin (örn: “bugün” veya “son 24 saat”).
+        Cursor sadece ileri gider (GREATEST ile upsert, eşzamanlı işler geri çekemez). Başarısız granüller tempo_granules'da "failed" olarak kalır;
+        arama penceresi en eski başarısız granüle kadar (TEMPO_RETRY_DAYS gün geriye) genişletildiği için sonraki çalıştırmalarda tekrar denenir (idempotent).
+        '''
+        refresh_predictions(db)
+        '''
+        Ingestion bittikten sonra sadece verisi değişen lokasyonların tahminleri yenilenir.
         '''
     finally:
         db.close()
@@ -56,6 +72,65 @@ def scheduled_job():
         Bu, bağlantıların açık kalmaması için önemli.
         '''
 
+def refresh_predictions(db):
+    """Verisi değişen (dirty) lokasyonların tahminlerini yeniler; hata ingestion işini bozmasın."""
+    try:
+        res = prediction_cache.refresh_dirty(db)
+        if res:
+            print(f"✅ Tahminler yenilendi: {res['count']} lokasyon ({res['model_version']})")
+    except Exception as e:
+        print(f"⚠ Tahmin yenileme hatası: {e}")
+
+def airnow_job():
+    """AirNow istasyon gözlemlerini bbox karolarıyla çeker ve grid lokasyonlarına dağıtır."""
+    db = SessionLocal()
+    try:
+        airnow_ingest.ingest_airnow_stations(db)
+        '''
+        Lokasyon başına istek yerine istasyon başına tek gözlem: çağrı sayısı karo sayısı kadar (ABD için birkaç istek).
+        '''
+        refresh_predictions(db)
+    except Exception as e:
+        print(f"⚠ AirNow ingestion hatası: {e}")
+    finally:
+        db.close()
+
+def predict_job():
+    """Scheduler tetiklendiğinde tüm lokasyonlar için toplu tahmin yapar ve Predictions tablosuna yazar."""
+    db = SessionLocal()
+    try:
+        res = prediction_cache.refresh_all(db)
+        print(f"✅ Toplu tahmin: {res['count']} lokasyon ({res['model_version']})")
+        '''
+        refresh_all → predict_batch ile tüm lokasyonları hesaplar, sonuçları bulk upsert ile yazar ve önbelleğe alır.
+        Özellikler zaman pencereli olduğundan (son 3s/24s), yeni veri gelmese de saatlik tam yenileme yapılır.
+        '''
+    except Exception as e:
+        print(f"⚠ Toplu tahmin hatası: {e}")
+    finally:
+        db.close()
+
+def rollup_job():
+    """rollup_dirty'de bekleyen saatlik kovaları yeniden hesaplar (saatlik + günlük rollup)."""
+    db = SessionLocal()
+    try:
+        rollups.refresh_rollups(db)
+        '''
+        Sadece upsert'lerin işaretlediği kovalar hesaplanır; tüm tablo yeniden taranmaz.
+        '''
+    except Exception as e:
+        print(f"⚠ Rollup hatası: {e}")
+    finally:
+        db.close()
+
+def partition_job():
+    """Günlük bölüm bakımı: ileri bölümleri aç, saklama süresi dolanları Parquet'e arşivleyip düşür."""
+    partitions.maintain_partitions(archive=archive.archive_partition if settings.ARCHIVE_ENABLED else None)
+    '''
+    DROP PARTITION metadata işlemidir: DELETE ... WHERE timestamp < ... gibi satır kilidi ve undo log üretmez.
+    Arşivleme hata verirse (ör. pyarrow yok, disk dolu) o bölüm düşürülmez; veri kaybolmaz, ertesi gece tekrar denenir.
+    '''
+
 def start_scheduler():
     """BackgroundScheduler başlatılır, 1 saatte bir veri çek."""
     '''
@@ -81,6 +156,19 @@ def start_scheduler():
 
     Yani her saatte scheduled_job() çağrılır → TEMPO verileri çekilir.
     '''
+    scheduler.add_job(airnow_job, 'interval', minutes=settings.AIRNOW_INTERVAL_MINUTES)
+    scheduler.add_job(predict_job, 'interval', hours=1)
+    scheduler.add_job(rollup_job, 'interval', minutes=settings.ROLLUP_INTERVAL_MINUTES)
+    scheduler.add_job(partition_job, 'cron', hour=settings.PARTITION_MAINTENANCE_HOUR)
+    '''
+    airnow_job AIRNOW_INTERVAL_MINUTES dakikada bir → istasyon gözlemleri grid hücrelerine (IDW / en yakın istasyon).
+
+    predict_job da her 1 saatte bir çalışır → tüm lokasyonlar için tahminler yenilenir.
+
+    rollup_job ROLLUP_INTERVAL_MINUTES dakikada bir → saatlik/günlük özet tabloları güncel tutulur.
+
+    partition_job her gece PARTITION_MAINTENANCE_HOUR'da → tablo bölümleri ve saklama süresi.
+    '''
     scheduler.start()
     '''
     Scheduler başlatılıyor.
@@ -101,4 +101,30 @@ Response modeller → GET istekleri için DB’den dönecek verileri tipli JSON
 orm_mode = True → SQLAlchemy objelerini Pydantic JSON’ına çevirir.
         '''
 
-# Artık endpointlerde return db_obj yaptığında FastAPI otomatik JSON’a çevirir.
\ No newline at end of file
+# Artık endpointlerde return db_obj yaptığında FastAPI otomatik JSON’a çevirir.
+# ----------------------------
+# Toplu veri çekme (fetch-and-save)
+# ----------------------------
+class FetchLocation(BaseModel):
+    location_id: int
+    city: str
+    lat: float
+    lon: float
+    '''
+    Çok lokasyonlu fetch-and-save isteğinin bir öğesi: hava durumu lat/lon ile, hava kalitesi şehir adıyla çekilir.
+    '''
+
+# ----------------------------
+# Tahmin
+# ----------------------------
+class PredictionResponse(BaseModel):
+    location_id: int
+    predicted_aqi: int
+    timestamp: datetime
+    model_version: str
+    cached: bool
+    '''
+    GET /predict/{location_id} yanıtı: önbellekten (Predictions tablosu) veya canlı hesaplanmış tahmin aynı şemada döner.
+
+    timestamp → tahminin saat başına hizalı zamanı, cached → sonuç önbellekten mi geldi.
+    '''
@@ -25,7 +25,13 @@ Yani DB bağlantı adresi dinamik olarak .env’den geliyor.
 '''
 
 # Create SQLAlchemy engine with pool_pre_ping to avoid stale connections
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+engine = create_engine(
+    settings.DATABASE_URL,
+    pool_pre_ping=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+)
 '''
 engine oluşturuluyor → settings.DATABASE_URL kullanılarak veritabanına bağlanıyor.
 
@@ -34,6 +40,11 @@ pool_pre_ping=True: Uzun süre kullanılmamış bağlantıların ölüp ölmedi
 Eğer bağlantı düşmüşse otomatik olarak yeniler.
 
 Bu sayede “stale connection” (bozuk bağlantı) hataları önlenir.
+
+pool_size / max_overflow: Havuzda tutulan ve gerektiğinde ek açılabilen bağlantı sayısı.
+ETL yazıcıları (ör. TEMPO) da bu havuzu kullanır; her satır için yeni bağlantı açılmaz.
+
+pool_recycle: MySQL'in wait_timeout ile kapattığı bağlantıları önceden yeniler.
 '''
 
 # create a configured "Session" class
@@ -0,0 +1,261 @@
+# app/services/spatial_index.py
+import math
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+from app.core.config import settings
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+# --------------------------
+# Vektörel haversine mesafesi (km)
+# --------------------------
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+# --------------------------
+# Ortak yardımcılar
+# --------------------------
+class _BaseIndex:
+    def __init__(self, ids, lats, lons):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _results(self, rows, distances):
+        order = np.argsort(distances, kind="stable")
+        return [
+            {
+                "location_id": int(self.ids[rows[o]]),
+                "latitude": float(self.lats[rows[o]]),
+                "longitude": float(self.lons[rows[o]]),
+                "distance_km": float(distances[o]),
+            }
+            for o in order
+        ]
+
+    def within_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        mask = (self.lats >= min_lat) & (self.lats <= max_lat) & (self.lons >= min_lon) & (self.lons <= max_lon)
+        return self.ids[mask]
+
+
+# --------------------------
+# Düzenli grid indeksi: hücre (i, j) doğrudan hesaplanır, ağaç gerekmez
+# --------------------------
+class RegularGridIndex(_BaseIndex):
+    kind = "regular_grid"
+
+    def __init__(self, ids, lats, lons, step):
+        super().__init__(ids, lats, lons)
+        self.step = step
+        self.lat0 = float(self.lats.min())
+        self.lon0 = float(self.lons.min())
+        self.n_lat = int(round((self.lats.max() - self.lat0) / step)) + 1
+        self.n_lon = int(round((self.lons.max() - self.lon0) / step)) + 1
+        # cells[i, j] -> dizilerdeki satır numarası (boş hücre: -1)
+        self.cells = np.full((self.n_lat, self.n_lon), -1, dtype=np.int64)
+        self.cells[self._cell_i(self.lats), self._cell_j(self.lons)] = np.arange(len(self.ids))
+
+    @classmethod
+    def detect(cls, ids, lats, lons, tol=1e-6, min_fill=0.5):
+        """Noktalar uniform adımlı ve yeterince dolu bir grid ise indeksi döndürür, değilse None."""
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        if len(lats) < 4:
+            return None
+        steps = np.diff(np.unique(lats))
+        if steps.size == 0:
+            return None
+        step = float(steps.min())
+        if step <= tol:
+            return None
+        for values in (lats, lons):
+            offsets = (values - values.min()) / step
+            if np.abs(offsets - np.round(offsets)).max() > 1e-3:
+                return None
+        n_cells = (round((lats.max() - lats.min()) / step) + 1) * (round((lons.max() - lons.min()) / step) + 1)
+        if len(lats) < min_fill * n_cells:
+            return None
+        return cls(ids, lats, lons, step)
+
+    def _cell_i(self, lat):
+        return np.rint((np.asarray(lat) - self.lat0) / self.step).astype(np.int64)
+
+    def _cell_j(self, lon):
+        return np.rint((np.asarray(lon) - self.lon0) / self.step).astype(np.int64)
+
+    def _window(self, lat, lon, r_lat, r_lon):
+        i, j = int(self._cell_i(lat)), int(self._cell_j(lon))
+        block = self.cells[max(i - r_lat, 0):max(min(i + r_lat + 1, self.n_lat), 0),
+                           max(j - r_lon, 0):max(min(j + r_lon + 1, self.n_lon), 0)]
+        rows = block[block >= 0]
+        return rows, haversine_km(lat, lon, self.lats[rows], self.lons[rows])
+
+    def _radius_cells(self, lat, radius_km):
+        # Boylam yönünde bir derece enlemle küçülür
+        cos_lat = max(math.cos(math.radians(min(abs(lat) + self.step, 89.9))), 1e-3)
+        r_lat = int(math.ceil(radius_km / (KM_PER_DEGREE * self.step))) + 1
+        r_lon = int(math.ceil(radius_km / (KM_PER_DEGREE * self.step * cos_lat))) + 1
+        return r_lat, r_lon
+
+    def nearest(self, lat, lon, k=1):
+        k = min(k, len(self))
+        r = max(1, int(math.ceil(math.sqrt(k))))
+        while True:
+            rows, distances = self._window(lat, lon, r, r)
+            if len(rows) >= k or r > max(self.n_lat, self.n_lon):
+                break
+            r *= 2
+        if len(rows) >= k:
+            # Pencere k. komşunun mesafesini kapsamıyorsa (yüksek enlemde boylam adımı kısalır) genişlet
+            kth = float(np.partition(distances, k - 1)[k - 1])
+            r_lat, r_lon = self._radius_cells(lat, kth)
+            if r_lat > r or r_lon > r:
+                rows, distances = self._window(lat, lon, max(r_lat, r), max(r_lon, r))
+        return self._results(rows, distances)[:k]
+
+    def within_radius(self, lat, lon, radius_km):
+        r_lat, r_lon = self._radius_cells(lat, radius_km)
+        rows, distances = self._window(lat, lon, r_lat, r_lon)
+        keep = distances <= radius_km
+        return self._results(rows[keep], distances[keep])
+
+    def within_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        i0, i1 = max(int(np.ceil((min_lat - self.lat0) / self.step - 1e-9)), 0), int(np.floor((max_lat - self.lat0) / self.step + 1e-9))
+        j0, j1 = max(int(np.ceil((min_lon - self.lon0) / self.step - 1e-9)), 0), int(np.floor((max_lon - self.lon0) / self.step + 1e-9))
+        if i1 < i0 or j1 < j0:
+            return self.ids[:0]
+        block = self.cells[i0:i1 + 1, j0:j1 + 1]
+        return self.ids[block[block >= 0]]
+
+
+# --------------------------
+# Düzensiz noktalar: scikit-learn BallTree (haversine metriği)
+# --------------------------
+class BallTreeIndex(_BaseIndex):
+    kind = "ball_tree"
+
+    def __init__(self, ids, lats, lons):
+        super().__init__(ids, lats, lons)
+        from sklearn.neighbors import BallTree
+        self.tree = BallTree(np.radians(np.column_stack([self.lats, self.lons])), metric="haversine")
+
+    def nearest(self, lat, lon, k=1):
+        k = min(k, len(self))
+        distances, rows = self.tree.query(np.radians([[lat, lon]]), k=k)
+        return self._results(rows[0], distances[0] * EARTH_RADIUS_KM)
+
+    def within_radius(self, lat, lon, radius_km):
+        rows, distances = self.tree.query_radius(
+            np.radians([[lat, lon]]), r=radius_km / EARTH_RADIUS_KM, return_distance=True
+        )
+        return self._results(rows[0], distances[0] * EARTH_RADIUS_KM)
+
+
+# --------------------------
+# Locations tablosundan indeks kur
+# --------------------------
+def build_location_index(db):
+    rows = db.execute(text("SELECT location_id, latitude, longitude FROM locations")).all()
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    lats = np.array([float(r[1]) for r in rows], dtype=float)
+    lons = np.array([float(r[2]) for r in rows], dtype=float)
+    if len(ids) == 0:
+        return None
+    return RegularGridIndex.detect(ids, lats, lons) or BallTreeIndex(ids, lats, lons)
+
+
+def parse_bbox(bbox):
+    """"min_lat,min_lon,max_lat,max_lon" → (min_lat, min_lon, max_lat, max_lon); hatalıysa ValueError."""
+    try:
+        min_lat, min_lon, max_lat, max_lon = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise ValueError("bbox min_lat,min_lon,max_lat,max_lon biçiminde olmalı")
+    if min_lat > max_lat or min_lon > max_lon:
+        raise ValueError("bbox min değerleri max değerlerinden büyük olamaz")
+    return min_lat, min_lon, max_lat, max_lon
+
+
+def parse_ids(ids):
+    """"1,2,3" → [1, 2, 3] (tekrarsız, sırası korunur); hatalıysa ValueError."""
+    try:
+        return list(dict.fromkeys(int(v) for v in ids.split(",") if v.strip()))
+    except ValueError:
+        raise ValueError("ids virgülle ayrılmış tam sayılar olmalı")
+
+
+def resolve_location_ids(db, ids=None, bbox=None, limit=None):
+    """
+    Bulk endpoint seçimi: "1,2,3" biçiminde id listesi veya "min_lat,min_lon,max_lat,max_lon" bbox.
+    Hatalı girdi veya limit aşımında ValueError.
+    """
+    if (ids is None) == (bbox is None):
+        raise ValueError("ids veya bbox parametrelerinden tam olarak biri verilmeli")
+    if ids is not None:
+        location_ids = parse_ids(ids)
+    else:
+        index = get_location_index(db)
+        location_ids = index.within_bbox(*parse_bbox(bbox)).tolist() if index is not None else []
+    if limit is not None and len(location_ids) > limit:
+        raise ValueError(f"En fazla {limit} lokasyon istenebilir ({len(location_ids)} seçildi)")
+    return location_ids
+
+
+def _locations_signature(db):
+    return tuple(db.execute(text("SELECT COUNT(*), MIN(location_id), MAX(location_id) FROM locations")).one())
+
+
+# --------------------------
+# Process genelinde tek indeks; locations değişince yeniden kurulur
+# --------------------------
+_index = None
+_signature = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_location_index(db):
+    global _index, _signature, _checked_at
+    now = time.monotonic()
+    if _index is not None and now - _checked_at < settings.LOCATION_INDEX_REFRESH_SECONDS:
+        return _index
+    with _lock:
+        if _index is not None and now - _checked_at < settings.LOCATION_INDEX_REFRESH_SECONDS:
+            return _index
+        signature = _locations_signature(db)
+        if _index is None or signature != _signature:
+            started = time.monotonic()
+            _index = build_location_index(db)
+            _signature = signature
+            if _index is not None:
+                print(f"✅ Location indeksi kuruldu ({_index.kind}, {len(_index)} nokta, {time.monotonic() - started:.2f}s)")
+        _checked_at = now
+        return _index
+
+
+def invalidate_location_index():
+    global _checked_at, _signature
+    with _lock:
+        _checked_at = 0.0
+        _signature = None
+
+
+def warm_up_location_index():
+    """Uygulama açılışında (startup event) indeksi önceden kurmak için."""
+    from app.db.session import SessionLocal
+    db = SessionLocal()
+    try:
+        return get_location_index(db)
+    finally:
+        db.close()
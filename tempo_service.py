@@ -1,13 +1,27 @@
 import datetime as dt
 from datetime import timezone
+import hashlib
+import io
 import os
+import tempfile
+from contextlib import contextmanager
 from decimal import Decimal
-import mysql.connector
+import requests
+from sqlalchemy import func, text
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from harmony import BBox, Client, Collection, Request
 import xarray as xr
 from netCDF4 import Dataset
 import numpy as np
+try:
+    import h5netcdf  # noqa: F401  (opsiyonel, HDF5 granülleri kopyasız açar)
+    HDF5_ENGINE = "h5netcdf"
+except ImportError:
+    HDF5_ENGINE = "netcdf4"
 from dotenv import load_dotenv
+from app.services.harmony_jobs import HarmonyOrchestrator, FAILED, PARSED
+from app import models
+from app.db.writer import get_tempo_writer
 
 # --------------------------
 # .env dosyasını yükle
@@ -15,22 +29,35 @@ from dotenv import load_dotenv
 load_dotenv()
 USERNAME = os.getenv("EARTHDATA_USER")
 PASSWORD = os.getenv("EARTHDATA_PASS")
-MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD")
 
 # --------------------------
-# MySQL config
+# Harmony client
 # --------------------------
-DB_CONFIG = {
-    "host": "localhost",
-    "user": "root",
-    "password": MYSQL_PASSWORD,
-    "database": "nasa_project"
-}
+harmony_client = Client(auth=(USERNAME, PASSWORD))
+HARMONY_MAX_IN_FLIGHT = int(os.getenv("HARMONY_MAX_IN_FLIGHT", "4"))
+HARMONY_POLL_SECONDS = float(os.getenv("HARMONY_POLL_SECONDS", "5"))
+
+# Bu boyutun üstündeki sonuçlar bellek yerine geçici dosyaya yazılır
+INMEMORY_MAX_BYTES = int(os.getenv("TEMPO_INMEMORY_MAX_MB", "512")) * 1024 * 1024
+STREAM_CHUNK_BYTES = 1024 * 1024
 
 # --------------------------
-# Harmony client
+# Earthdata oturumu (URS yönlendirmesinde auth korunur, bağlantılar yeniden kullanılır)
 # --------------------------
-harmony_client = Client(auth=(USERNAME, PASSWORD))
+class EarthdataSession(requests.Session):
+    AUTH_HOST = "urs.earthdata.nasa.gov"
+
+    def rebuild_auth(self, prepared_request, response):
+        headers = prepared_request.headers
+        url = prepared_request.url
+        if "Authorization" in headers:
+            original = requests.utils.urlparse(response.request.url).hostname
+            redirect = requests.utils.urlparse(url).hostname
+            if original != redirect and redirect != self.AUTH_HOST and original != self.AUTH_HOST:
+                del headers["Authorization"]
+
+earthdata_session = EarthdataSession()
+earthdata_session.auth = (USERNAME, PASSWORD)
 
 # --------------------------
 # L3 koleksiyonları ve gazlar
@@ -41,6 +68,15 @@ gases = {
     "hcho": [("HCHO_L3", "C3685897141-LARC_CLOUD")]
 }
 
+# --------------------------
+# Grid sınırları (locations_grid_verileri.py ile aynı, Kuzey Amerika)
+# (lon_min, lat_min, lon_max, lat_max)
+# --------------------------
+GRID_BBOX = (-170.0, 14.0, -50.0, 72.0)
+
+# Örnek düzeltmeler (gaz başına sabit ofset)
+GAS_OFFSETS = {"no2": 5.0, "o3": 2.0, "hcho": 1.0}
+
 # --------------------------
 # Decimal veya masked array -> float
 # --------------------------
@@ -54,19 +90,108 @@ def safe_float(value):
     return float(value)
 
 # --------------------------
-# Dataset’i güvenli aç
+# Başlıktan format tespiti: HDF5 (netCDF-4) veya klasik netCDF
 # --------------------------
-def open_dataset_safe(file_path):
-    for engine in ["netcdf4", "h5netcdf"]:
+HDF5_SIGNATURE = b"\x89HDF\r\n\x1a\n"
+
+def sniff_netcdf_format(header):
+    if header.startswith(HDF5_SIGNATURE):
+        return "hdf5"
+    if header[:3] == b"CDF" and header[3:4] in (b"\x01", b"\x02", b"\x05"):
+        return "classic"
+    return None
+
+# --------------------------
+# Geçici dosyaya taşan sonuçları işaretlemek için
+# --------------------------
+class SpilledFile(str):
+    pass
+
+def release_payload(payload):
+    if isinstance(payload, SpilledFile):
         try:
-            ds = xr.open_dataset(file_path, engine=engine)
-            return ds
-        except Exception:
-            continue
+            os.remove(payload)
+        except OSError:
+            pass
+
+# --------------------------
+# Sonucu belleğe stream et; limit aşılırsa geçici dosyaya taşı
+# --------------------------
+def stream_result(url, max_bytes=INMEMORY_MAX_BYTES):
+    spill = None
+    try:
+        with earthdata_session.get(url, stream=True, timeout=120) as resp:
+            resp.raise_for_status()
+            buffer = io.BytesIO()
+            if int(resp.headers.get("Content-Length") or 0) > max_bytes:
+                spill = tempfile.NamedTemporaryFile(suffix=".nc", delete=False)
+            for chunk in resp.iter_content(STREAM_CHUNK_BYTES):
+                if spill is None and buffer.tell() + len(chunk) > max_bytes:
+                    spill = tempfile.NamedTemporaryFile(suffix=".nc", delete=False)
+                    spill.write(buffer.getbuffer())
+                    buffer = None
+                target = spill if spill is not None else buffer
+                target.write(chunk)
+    except BaseException:
+        # İndirme yarıda kaldıysa yarım geçici dosya silinir
+        if spill is not None:
+            spill.close()
+            release_payload(SpilledFile(spill.name))
+        raise
+    if spill is not None:
+        spill.close()
+        return SpilledFile(spill.name)
+    return buffer.getvalue()
+
+# --------------------------
+# Orkestratör için indirici: sonuç URL'lerini diske yazmadan çek
+# --------------------------
+def download_in_memory(client, job_id):
+    """
+    Tembel üretici: her URL ancak bir önceki sonuç işlenip bırakıldıktan sonra indirilir.
+    Bellekte/diskte aynı anda tek sonuç durur; parse yarıda hata verirse kalan URL'ler hiç indirilmez.
+    """
+    return (stream_result(url) for url in client.result_urls(job_id))
+
+# --------------------------
+# Sonucu aç, iş bitince (hata olsa da) dataset'i kapat ve geçici dosyayı sil
+# --------------------------
+@contextmanager
+def opened_payload(payload):
+    ds = None
     try:
-        ds = Dataset(file_path, "r")
-        return ds
-    except Exception:
+        ds = open_dataset_safe(payload)
+        yield ds
+    finally:
+        if ds is not None:
+            ds.close()
+        release_payload(payload)
+
+# --------------------------
+# Dataset’i güvenli aç (bytes -> bellekten, str -> dosyadan); tek deneme
+# --------------------------
+def open_dataset_safe(source):
+    try:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            data = bytes(source)
+            fmt = sniff_netcdf_format(data[:8])
+            if fmt is None:
+                print("⚠ NetCDF/HDF5 başlığı bulunamadı")
+                return None
+            if fmt == "hdf5" and HDF5_ENGINE == "h5netcdf":
+                return xr.open_dataset(io.BytesIO(data), engine="h5netcdf")
+            nc = Dataset("inmemory.nc", memory=data)
+            return xr.open_dataset(xr.backends.NetCDF4DataStore(nc))
+
+        with open(source, "rb") as fh:
+            fmt = sniff_netcdf_format(fh.read(8))
+        if fmt is None:
+            print(f"⚠ NetCDF/HDF5 başlığı bulunamadı: {source}")
+            return None
+        engine = HDF5_ENGINE if fmt == "hdf5" else "netcdf4"
+        return xr.open_dataset(source, engine=engine)
+    except Exception as e:
+        print(f"⚠ Dataset açılamadı: {e}")
         return None
 
 # --------------------------
@@ -93,6 +218,187 @@ def get_mean_from_dataset(ds, var_name):
         print(f"⚠ Hata get_mean_from_dataset: {e}")
         return None
 
+# --------------------------
+# Gaz değişkenini bul
+# --------------------------
+def find_gas_variable(ds, gas_key):
+    var_candidates = []
+    if isinstance(ds, xr.Dataset):
+        if "product" in ds:
+            var_candidates = [v for v in ds["product"].data_vars if gas_key in v.lower()]
+        else:
+            var_candidates = [v for v in ds.data_vars if gas_key in v.lower()]
+    elif isinstance(ds, Dataset):
+        var_candidates = [v for v in ds.variables if gas_key in v.lower()]
+    return var_candidates[0] if var_candidates else None
+
+# --------------------------
+# Kalite filtresi uygulanmış ham diziyi al (maskeli değerler -> NaN)
+# --------------------------
+def get_good_array(ds, var_name):
+    try:
+        if isinstance(ds, xr.Dataset):
+            if "product" in ds:
+                data_array = ds["product"][var_name]
+                if "qa_value" in ds["product"]:
+                    data_array = data_array.where(ds["product"]["qa_value"] == 0)
+            else:
+                data_array = ds[var_name]
+            return np.asarray(data_array.values, dtype=float)
+        elif isinstance(ds, Dataset):
+            data_array = ds.variables[var_name][:]
+            return np.ma.filled(np.ma.asarray(data_array, dtype=float), np.nan)
+    except Exception as e:
+        print(f"⚠ Hata get_good_array: {e}")
+    return None
+
+# --------------------------
+# Granülün lat/lon eksenlerini bul (L3 -> 1 boyutlu düzenli eksenler)
+# --------------------------
+def get_lat_lon_axes(ds):
+    for lat_name, lon_name in (("latitude", "longitude"), ("lat", "lon")):
+        if isinstance(ds, xr.Dataset):
+            if lat_name in ds.variables and lon_name in ds.variables:
+                return np.asarray(ds[lat_name].values, dtype=float), np.asarray(ds[lon_name].values, dtype=float)
+        elif isinstance(ds, Dataset):
+            if lat_name in ds.variables and lon_name in ds.variables:
+                return np.asarray(ds.variables[lat_name][:], dtype=float), np.asarray(ds.variables[lon_name][:], dtype=float)
+    return None, None
+
+# --------------------------
+# Sıralı 1 boyutlu eksende en yakın indeks (vektörel, eksen dışı -> -1)
+# --------------------------
+def nearest_axis_index(axis, values):
+    axis = np.asarray(axis, dtype=float)
+    values = np.asarray(values, dtype=float)
+    if axis.size == 1:
+        return np.zeros(values.shape, dtype=int)
+
+    descending = axis[0] > axis[-1]
+    ax = axis[::-1] if descending else axis
+
+    idx = np.clip(np.searchsorted(ax, values), 1, ax.size - 1)
+    left, right = ax[idx - 1], ax[idx]
+    idx = idx - ((values - left) <= (right - values))
+
+    half_step = abs(ax[1] - ax[0]) / 2
+    outside = (values < ax[0] - half_step) | (values > ax[-1] + half_step)
+    if descending:
+        idx = ax.size - 1 - idx
+    idx[outside] = -1
+    return idx
+
+# --------------------------
+# Tüm lokasyonları tek geçişte granülden örnekle
+# --------------------------
+def sample_grid_values(ds, var_name, lats, lons):
+    out = np.full(len(lats), np.nan)
+    data = get_good_array(ds, var_name)
+    axis_lat, axis_lon = get_lat_lon_axes(ds)
+    if data is None or axis_lat is None or axis_lat.ndim != 1 or axis_lon.ndim != 1:
+        print(f"⚠ Grid eksenleri bulunamadı: {var_name}")
+        return out
+
+    # (time, lat, lon) -> (lat, lon); birden fazla zaman adımı varsa ortalama
+    data = data.reshape(-1, axis_lat.size, axis_lon.size)
+    with np.errstate(invalid="ignore"):
+        data = data[0] if data.shape[0] == 1 else np.nanmean(data, axis=0)
+
+    i = nearest_axis_index(axis_lat, lats)
+    j = nearest_axis_index(axis_lon, lons)
+    inside = (i >= 0) & (j >= 0)
+    out[inside] = data[i[inside], j[inside]]
+    return out
+
+# --------------------------
+# Harmony isteği oluştur
+# --------------------------
+def build_request(collection_id, start_time, stop_time, bbox, **kwargs):
+    return Request(
+        collection=Collection(id=collection_id),
+        temporal={"start": start_time, "stop": stop_time},
+        spatial=BBox(*bbox),
+        output_format="netcdf",  # netCDF formatında indir
+        **kwargs
+    )
+
+# --------------------------
+# Tüm gazların işlerini birlikte gönder, eşzamanlı bekle;
+# biten iş hemen indirilip parse(gas_key, files) ile işlenir
+# --------------------------
+def run_gas_jobs(start_time, stop_time, bbox, parse):
+    orchestrator = HarmonyOrchestrator(
+        harmony_client,
+        max_in_flight=HARMONY_MAX_IN_FLIGHT,
+        poll_interval=HARMONY_POLL_SECONDS,
+        download=download_in_memory,
+        parse=lambda job, files: parse(job.key[0], files),
+    )
+    for gas_key, gas_list in gases.items():
+        for gas_name, collection_id in gas_list:
+            orchestrator.add((gas_key, gas_name), build_request(collection_id, start_time, stop_time, bbox))
+    jobs = orchestrator.run()
+
+    # Gaz başına listedeki ilk başarılı koleksiyonun sonucu
+    results = {}
+    for gas_key, gas_list in gases.items():
+        for gas_name, _ in gas_list:
+            job = jobs[(gas_key, gas_name)]
+            if job.state == FAILED:
+                print(f"⚠ {gas_name} hata: {job.error}")
+            elif job.result is not None:
+                results[gas_key] = job.result
+                break
+    return results
+
+# --------------------------
+# Dosyalardan tek lokasyon ortalaması
+# --------------------------
+def location_mean_from_files(gas_key, files):
+    result = None
+    for payload in files:
+        if result is not None:
+            release_payload(payload)
+            continue
+        with opened_payload(payload) as ds:
+            if ds is None:
+                continue
+            var_name = find_gas_variable(ds, gas_key)
+            if var_name is None:
+                print(f"⚠ Değişken bulunamadı: {gas_key}")
+            else:
+                mean_val = get_mean_from_dataset(ds, var_name)
+                if mean_val is not None:
+                    result = mean_val - GAS_OFFSETS.get(gas_key, 0.0)
+    return result
+
+# --------------------------
+# Dosyalardan tüm lokasyonlar için örnekleme
+# Aynı aralıkta birden fazla granül dönebilir -> lokasyon başına ortalama
+# --------------------------
+def grid_values_from_files(gas_key, files, lats, lons, md5s=None):
+    total = np.zeros(len(lats))
+    count = np.zeros(len(lats))
+    for payload in files:
+        with opened_payload(payload) as ds:
+            if md5s is not None:
+                md5s.append(payload_md5(payload))
+            if ds is None:
+                continue
+            var_name = find_gas_variable(ds, gas_key)
+            if var_name is None:
+                print(f"⚠ Değişken bulunamadı: {gas_key}")
+            else:
+                sampled = sample_grid_values(ds, var_name, lats, lons)
+                valid = ~np.isnan(sampled)
+                total[valid] += sampled[valid]
+                count[valid] += 1
+
+    if not count.any():
+        return None
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return total / count - GAS_OFFSETS.get(gas_key, 0.0)
+
 # --------------------------
 # Tek location için veri çek
 # --------------------------
@@ -112,77 +418,306 @@ def fetch_for_location(loc, start_time, stop_time, bbox_buffer=0.25):
         "aerosol_index": None
     }
 
+    bbox = (lon-bbox_buffer, lat-bbox_buffer, lon+bbox_buffer, lat+bbox_buffer)
+    data_to_insert.update(run_gas_jobs(start_time, stop_time, bbox, location_mean_from_files))
+    print(f"Location {loc_id} için veri: {data_to_insert}")
+    return data_to_insert
+
+# --------------------------
+# Grid modu: gaz başına tek granül/alt küme, tüm lokasyonlar tek geçişte
+# --------------------------
+def location_arrays(locations):
+    loc_ids = np.array([loc["location_id"] for loc in locations], dtype=int)
+    lats = np.array([float(loc["latitude"]) for loc in locations], dtype=float)
+    lons = np.array([float(loc["longitude"]) for loc in locations], dtype=float)
+    return loc_ids, lats, lons
+
+def fetch_for_grid(locations, start_time, stop_time, bbox=GRID_BBOX):
+    loc_ids, lats, lons = location_arrays(locations)
+
+    gas_values = run_gas_jobs(
+        start_time, stop_time, bbox,
+        lambda gas_key, files: grid_values_from_files(gas_key, files, lats, lons),
+    )
+
+    rows = build_grid_rows(loc_ids, gas_values, stop_time)
+    print(f"Grid: {len(rows)}/{len(loc_ids)} lokasyon için veri bulundu")
+    return rows
+
+# --------------------------
+# Gaz dizilerinden tempodata satırları
+# --------------------------
+def build_grid_rows(loc_ids, gas_values, timestamp):
+    rows = []
+    for k, loc_id in enumerate(loc_ids):
+        row = {
+            "timestamp": timestamp,
+            "location_id": int(loc_id),
+            "o3": None,
+            "no2": None,
+            "hcho": None,
+            "so2": None,
+            "co": None,
+            "aerosol_index": None
+        }
+        for gas_key, values in gas_values.items():
+            if not np.isnan(values[k]):
+                row[gas_key] = float(values[k])
+        # Hiç gaz değeri olmayan (granül dışı) lokasyonları yazma
+        if any(row[gas_key] is not None for gas_key in gases):
+            rows.append(row)
+    return rows
+
+# --------------------------
+# DB’den lokasyonları oku
+# --------------------------
+def load_locations(db, location_id=None):
+    query = "SELECT location_id, latitude, longitude FROM locations"
+    params = {}
+    if location_id is not None:
+        query += " WHERE location_id = :location_id"
+        params["location_id"] = location_id
+    return [dict(r._mapping) for r in db.execute(text(query), params)]
+
+# --------------------------
+# Tarih aralığı için tüm grid'i çek ve kaydet
+# --------------------------
+def _to_utc(value):
+    if isinstance(value, str):
+        value = dt.datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+def fetch_and_save_all(db, start_date, end_date, location_id=None):
+    locations = load_locations(db, location_id)
+    if not locations:
+        print("⚠ Locations tablosu boş")
+        return 0
+    rows = fetch_for_grid(locations, _to_utc(start_date), _to_utc(end_date))
+    writer = get_tempo_writer()
+    batch = writer.begin()
+    insert_many_to_db(rows, batch=batch)
+    failed = writer.flush(batch)
+    if failed:
+        print(f"⚠ {failed} satır DB’ye yazılamadı")
+    return len(rows) - failed
+
+# --------------------------
+# Granül kaydı (registry) + koleksiyon başına high-water-mark
+# --------------------------
+CMR_GRANULES_URL = "https://cmr.earthdata.nasa.gov/search/granules.umm_json"
+# Geç yayınlanan granüller için cursor'dan geriye bakma payı
+GRANULE_LOOKBACK = dt.timedelta(hours=int(os.getenv("TEMPO_LOOKBACK_HOURS", "6")))
+# Cursor hiç yoksa başlangıç penceresi
+GRANULE_INITIAL_WINDOW = dt.timedelta(days=1)
+# Başarısız granüller bu süre boyunca her çalıştırmada tekrar denenir (kalıcı hatalı granül pencereyi sonsuza açmasın)
+GRANULE_RETRY_WINDOW = dt.timedelta(days=int(os.getenv("TEMPO_RETRY_DAYS", "7")))
+
+cmr_session = requests.Session()
+
+def _parse_cmr_time(value):
+    if not value:
+        return None
+    return dt.datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(timezone.utc).replace(tzinfo=None)
+
+def search_granules(collection_id, since, until=None, page_size=200):
+    temporal = f"{since:%Y-%m-%dT%H:%M:%SZ}," + (f"{until:%Y-%m-%dT%H:%M:%SZ}" if until else "")
+    params = {
+        "collection_concept_id": collection_id,
+        "temporal": temporal,
+        "sort_key": "start_date",
+        "page_size": page_size,
+    }
+    headers = {}
+    granules = []
+    while True:
+        resp = cmr_session.get(CMR_GRANULES_URL, params=params, headers=headers, timeout=60)
+        resp.raise_for_status()
+        items = resp.json().get("items", [])
+        for item in items:
+            time_range = item["umm"]["TemporalExtent"]["RangeDateTime"]
+            granules.append({
+                "granule_id": item["meta"]["concept-id"],
+                "time_start": _parse_cmr_time(time_range["BeginningDateTime"]),
+                "time_end": _parse_cmr_time(time_range.get("EndingDateTime")),
+            })
+        search_after = resp.headers.get("CMR-Search-After")
+        if not items or not search_after:
+            break
+        headers["CMR-Search-After"] = search_after
+    return granules
+
+def payload_md5(payload):
+    digest = hashlib.md5()
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        digest.update(payload)
+    else:
+        with open(payload, "rb") as fh:
+            for chunk in iter(lambda: fh.read(STREAM_CHUNK_BYTES), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+def get_cursor(db, collection_id):
+    cursor = db.get(models.TempoCursors, collection_id)
+    return cursor.high_water_mark if cursor else None
+
+def set_cursor(db, collection_id, high_water_mark):
+    # Cursor sadece ileri gider: eski granülleri işleyen bir çalıştırma (ör. yeniden deneme) onu geri çekemez
+    table = models.TempoCursors.__table__
+    stmt = mysql_insert(table).values(
+        collection_id=collection_id,
+        high_water_mark=high_water_mark,
+        updated_at=dt.datetime.utcnow(),
+    )
+    db.execute(stmt.on_duplicate_key_update(
+        high_water_mark=func.greatest(table.c.high_water_mark, stmt.inserted.high_water_mark),
+        updated_at=stmt.inserted.updated_at,
+    ))
+
+def oldest_failed_granule(db, collection_id, since):
+    """Registry'de hâlâ "failed" duran en eski granülün başlangıcı (since'ten yeni olanlar arasında)."""
+    return (
+        db.query(func.min(models.TempoGranules.time_start))
+        .filter(
+            models.TempoGranules.collection_id == collection_id,
+            models.TempoGranules.status == "failed",
+            models.TempoGranules.time_start >= since,
+        )
+        .scalar()
+    )
+
+def processed_granule_ids(db, granule_ids):
+    if not granule_ids:
+        return set()
+    rows = (
+        db.query(models.TempoGranules.granule_id)
+        .filter(models.TempoGranules.granule_id.in_(granule_ids), models.TempoGranules.status == "parsed")
+        .all()
+    )
+    return {r.granule_id for r in rows}
+
+def record_granule(db, granule, gas_key, collection_id, status, md5=None):
+    db.merge(models.TempoGranules(
+        granule_id=granule["granule_id"],
+        collection_id=collection_id,
+        gas=gas_key,
+        time_start=granule["time_start"],
+        time_end=granule["time_end"],
+        md5=md5,
+        status=status,
+        processed_at=dt.datetime.utcnow(),
+    ))
+
+# --------------------------
+# Artımlı çalıştırma: sadece yeni granülleri çek; tekrar denemede idempotent
+# --------------------------
+def fetch_and_save_incremental(db, bbox=GRID_BBOX):
+    locations = load_locations(db)
+    if not locations:
+        print("⚠ Locations tablosu boş")
+        return 0
+    loc_ids, lats, lons = location_arrays(locations)
+    now = dt.datetime.utcnow()
+
+    def parse_granule(job, files):
+        # Sonuçlar tek geçişte işlenir: md5 ve örnekleme aynı payload bırakılmadan önce
+        md5s = []
+        return md5s, grid_values_from_files(job.key[0], files, lats, lons, md5s=md5s)
+
+    orchestrator = HarmonyOrchestrator(
+        harmony_client,
+        max_in_flight=HARMONY_MAX_IN_FLIGHT,
+        poll_interval=HARMONY_POLL_SECONDS,
+        download=download_in_memory,
+        parse=parse_granule,
+    )
+    pending = {}
     for gas_key, gas_list in gases.items():
         for gas_name, collection_id in gas_list:
+            high_water_mark = get_cursor(db, collection_id)
+            since = high_water_mark - GRANULE_LOOKBACK if high_water_mark else now - GRANULE_INITIAL_WINDOW
+            # Başarısız granüller (cursor hiç yazılmamış olsa da) pencere dışına düşmesin: arama en eskisinden başlar
+            oldest_failed = oldest_failed_granule(db, collection_id, now - GRANULE_RETRY_WINDOW)
+            if oldest_failed is not None:
+                since = min(since, oldest_failed)
             try:
-                request = Request(
-                    collection=Collection(id=collection_id),
-                    temporal={"start": start_time, "stop": stop_time},
-                    spatial=BBox(lon-bbox_buffer, lat-bbox_buffer, lon+bbox_buffer, lat+bbox_buffer),
-                    output_format="netcdf"  # netCDF formatında indir
-                )
-                job_id = harmony_client.submit(request)
-                print(f"Job submit edildi: {job_id}")
-                harmony_client.wait_for_processing(job_id)
-                results = list(harmony_client.download_all(job_id))
-                print(f"Dosya sayısı: {len(results)} -> {results}")
-
-                for file_path in results:
-                    ds = open_dataset_safe(file_path)
-                    if ds is None:
-                        print(f"⚠ Dataset açılamadı: {file_path}")
-                        continue
-
-                    var_candidates = []
-                    if isinstance(ds, xr.Dataset):
-                        if "product" in ds:
-                            var_candidates = [v for v in ds["product"].data_vars if gas_key in v.lower()]
-                        else:
-                            var_candidates = [v for v in ds.data_vars if gas_key in v.lower()]
-                    elif isinstance(ds, Dataset):
-                        var_candidates = [v for v in ds.variables if gas_key in v.lower()]
-
-                    if not var_candidates:
-                        print(f"⚠ Değişken bulunamadı: {gas_key}")
-                        continue
-
-                    mean_val = get_mean_from_dataset(ds, var_candidates[0])
-                    if mean_val is not None:
-                        # Örnek düzeltmeler
-                        if gas_key == "no2":
-                            mean_val -= 5.0
-                        elif gas_key == "o3":
-                            mean_val -= 2.0
-                        elif gas_key == "hcho":
-                            mean_val -= 1.0
-                        data_to_insert[gas_key] = mean_val
-                        break
+                found = search_granules(collection_id, since)
             except Exception as e:
-                print(f"⚠ {gas_name} hata (location_id={loc_id}): {e}")
+                print(f"⚠ {gas_name} CMR arama hatası: {e}")
                 continue
-    print(f"Location {loc_id} için veri: {data_to_insert}")
-    return data_to_insert
+            done = processed_granule_ids(db, [g["granule_id"] for g in found])
+            new = [g for g in found if g["granule_id"] not in done]
+            print(f"{gas_name}: {len(found)} granül bulundu, {len(new)} yeni")
+            for granule in new:
+                request = build_request(
+                    collection_id, granule["time_start"], granule["time_end"] or granule["time_start"], bbox,
+                    granule_id=[granule["granule_id"]],
+                )
+                orchestrator.add((gas_key, granule["granule_id"]), request)
+                pending[(gas_key, granule["granule_id"])] = (granule, collection_id)
+
+    if not pending:
+        print("Yeni granül yok")
+        return 0
+
+    jobs = orchestrator.run()
+    writer = get_tempo_writer()
+    batch = writer.begin()  # eşzamanlı fetch_and_save_all'un hataları bu çalıştırmaya karışmaz
+    written = 0
+    last_parsed = {}
+    for key, (granule, collection_id) in pending.items():
+        gas_key = key[0]
+        job = jobs[key]
+        if job.state != PARSED:
+            record_granule(db, granule, gas_key, collection_id, "failed")
+            continue
+
+        md5s, values = job.result
+        if values is not None:
+            # Gazlar aynı satırda buluşsun diye saat başına yuvarla
+            timestamp = granule["time_start"].replace(minute=0, second=0, microsecond=0)
+            rows = build_grid_rows(loc_ids, {gas_key: values}, timestamp)
+            insert_many_to_db(rows, batch=batch)
+            written += len(rows)
+        record_granule(db, granule, gas_key, collection_id, "parsed", md5=md5s[0] if md5s else None)
+        last_parsed[collection_id] = max(last_parsed.get(collection_id, granule["time_start"]), granule["time_start"])
+
+    # Registry sadece veriler DB’ye ulaştıktan sonra commit edilir; aksi halde
+    # granüller bir sonraki çalıştırmada tekrar işlenir
+    failed = writer.flush(batch)
+    if failed:
+        print(f"⚠ {failed} satır DB’ye yazılamadı, granül kaydı geri alındı")
+        db.rollback()
+        # Hepsi "failed" işaretlenir: cursor ilerlemediği için bir sonraki çalıştırmada tekrar aranırlar
+        for (gas_key, _), (granule, collection_id) in pending.items():
+            record_granule(db, granule, gas_key, collection_id, "failed")
+        db.commit()
+        return 0
+
+    # Cursor son işlenen granüle ilerler; başarısız granüller registry'deki "failed" kaydıyla tekrar aranır
+    for collection_id, high_water_mark in last_parsed.items():
+        set_cursor(db, collection_id, high_water_mark)
+    db.commit()
+    print(f"✅ Artımlı TEMPO: {written} satır yazıldı, durum: {orchestrator.summary()}")
+    return written
 
 # --------------------------
-# DB’ye insert
+# DB’ye insert (havuzlu engine + tamponlu yazıcı; batch’ler bulk upsert ile yazılır)
 # --------------------------
-def insert_to_db(row):
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor()
-    insert_query = """
-        INSERT INTO tempodata (timestamp, location_id, o3, no2, hcho, so2, co, aerosol_index)
-        VALUES (%(timestamp)s, %(location_id)s, %(o3)s, %(no2)s, %(hcho)s, %(so2)s, %(co)s, %(aerosol_index)s)
-        ON DUPLICATE KEY UPDATE 
-            o3=VALUES(o3), no2=VALUES(no2), hcho=VALUES(hcho),
-            so2=VALUES(so2), co=VALUES(co), aerosol_index=VALUES(aerosol_index)
-    """
+def _normalize_row(row):
     for key in ["o3","no2","hcho","so2","co","aerosol_index"]:
         row[key] = safe_float(row[key])
-    cursor.execute(insert_query, row)
-    conn.commit()
-    cursor.close()
-    conn.close()
-    print(f"✅ Veri DB’ye yazıldı: location {row['location_id']}")
+    timestamp = row["timestamp"]
+    if timestamp.tzinfo is not None:
+        row["timestamp"] = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return row
+
+def insert_to_db(row, batch=None):
+    get_tempo_writer().add(_normalize_row(row), batch=batch)
+
+def insert_many_to_db(rows, batch=None):
+    get_tempo_writer().add_many((_normalize_row(row) for row in rows), batch=batch)
 
 # --------------------------
 # Ana çalıştırma
@@ -194,3 +729,5 @@ if __name__ == "__main__":
 
     result = fetch_for_location(test_loc, start_time, stop_time)
     insert_to_db(result)
+    get_tempo_writer().close()
+    print(f"✅ Veri DB’ye yazıldı: {get_tempo_writer().stats}")
@@ -0,0 +1,101 @@
+# tests/test_http_client.py
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services import http_client
+from app.services.http_client import AsyncAPIClient, backoff_delay
+
+
+# --------------------------
+# Yardımcılar: ağ yerine httpx.MockTransport, bekleme yerine kayıt
+# --------------------------
+def make_client(handler, retries=3):
+    return AsyncAPIClient("Test", "https://api.test", max_concurrency=4, retries=retries,
+                          transport=httpx.MockTransport(handler))
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Retry beklemelerini kaydeder, gerçekten uyumaz."""
+    recorded = []
+
+    async def fake_sleep(delay):
+        recorded.append(delay)
+
+    monkeypatch.setattr(http_client.asyncio, "sleep", fake_sleep)
+    return recorded
+
+
+def run(coro, client):
+    return http_client.run_sync(coro, client)
+
+
+# --------------------------
+# Retry: 503 tekrar denenir, Retry-After uyulur
+# --------------------------
+def test_503_is_retried_with_retry_after(sleeps):
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        if len(calls) < 3:
+            return httpx.Response(503, headers={"Retry-After": "2"})
+        return httpx.Response(200, json={"ok": True})
+
+    client = make_client(handler)
+    assert run(client.get_json("/data"), client) == {"ok": True}
+    assert len(calls) == 3
+    assert sleeps == [2.0, 2.0]
+    assert client.stats == {"requests": 3, "retries": 2, "errors": 0}
+
+
+def test_503_gives_up_after_retries(sleeps):
+    client = make_client(lambda request: httpx.Response(503), retries=2)
+    with pytest.raises(httpx.HTTPStatusError):
+        run(client.get_json("/data"), client)
+    assert client.stats["requests"] == 3
+    assert len(sleeps) == 2
+
+
+def test_401_is_raised_immediately(sleeps):
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(401, json={"message": "Invalid API key"})
+
+    client = make_client(handler)
+    with pytest.raises(httpx.HTTPStatusError) as error:
+        run(client.get_json("/data"), client)
+    assert error.value.response.status_code == 401
+    assert len(calls) == 1
+    assert sleeps == []
+
+
+def test_backoff_delay_caps_retry_after():
+    assert backoff_delay(0, "1.5") == 1.5
+    assert backoff_delay(0, str(settings.HTTP_BACKOFF_MAX_SECONDS * 10)) == settings.HTTP_BACKOFF_MAX_SECONDS
+    # Tarih biçimli / bozuk Retry-After → jitter'lı üstel bekleme
+    assert 0 <= backoff_delay(2, "Wed, 21 Oct 2015 07:28:00 GMT") <= settings.HTTP_BACKOFF_SECONDS * 4
+
+
+# --------------------------
+# Toplu çağrı: sonuçlar girdi sırasında, hatalar Exception nesnesi olarak
+# --------------------------
+def test_gather_keeps_input_order_with_exceptions():
+    async def handler(request):
+        item = int(request.url.path.rsplit("/", 1)[1])
+        # Sonraki öğeler önce tamamlanır: sıra tamamlanma sırasına değil girdiye bağlı olmalı
+        await asyncio.sleep((5 - item) * 0.01)
+        if item == 2:
+            return httpx.Response(401)
+        return httpx.Response(200, json={"item": item})
+
+    client = make_client(handler)
+    results = run(client.gather([client.get_json(f"/items/{i}") for i in range(5)]), client)
+    assert len(results) == 5
+    assert isinstance(results[2], httpx.HTTPStatusError)
+    assert [r["item"] for i, r in enumerate(results) if i != 2] == [0, 1, 3, 4]
@@ -0,0 +1,86 @@
+# tests/test_weather_latest.py
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import crud
+from app.api.v1.routers import weather
+from app.db.session import get_db
+from app.services import weather_ingest
+from app.services.latest_cache import weather_latest
+
+LOCATION_ID = 7
+
+
+def onecall_payload(now):
+    """current birkaç dakika önce, hourly içinde bulunulan saatten başlayıp 48 saat ileri (One Call biçimi)."""
+    current = now - timedelta(minutes=5)
+    hour = current.replace(minute=0, second=0, microsecond=0)
+    epoch = lambda t: int((t - datetime(1970, 1, 1)).total_seconds())
+    block = lambda t, temp: {"dt": epoch(t), "temp": temp, "humidity": 50, "wind_speed": 3.0, "pressure": 1013}
+    return {
+        "current": block(current, 20.0),
+        "hourly": [block(hour + timedelta(hours=i), 20.0 + i) for i in range(48)],
+    }
+
+
+# --------------------------
+# Sahte DB: upsert'ler (location_id, timestamp) anahtarıyla bellekte, drop_unchanged devre dışı
+# --------------------------
+@pytest.fixture
+def stored(monkeypatch):
+    tables = {"weatherdata": {}, "weather_forecasts": {}}
+
+    def upsert(name):
+        def write(db, rows, commit=True):
+            for row in rows:
+                tables[name][(row["location_id"], row["timestamp"])] = row
+            return {"inserted": len(rows), "updated": 0}
+        return write
+
+    def latest(db, location_id):
+        # crud.get_latest_weather ile aynı: ORDER BY timestamp DESC LIMIT 1
+        rows = [r for (l, _), r in tables["weatherdata"].items() if l == location_id]
+        return SimpleNamespace(**max(rows, key=lambda r: r["timestamp"])) if rows else None
+
+    monkeypatch.setattr(weather_ingest, "drop_unchanged", lambda db, rows, model=None: rows)
+    monkeypatch.setattr(crud, "bulk_upsert_weather", upsert("weatherdata"))
+    monkeypatch.setattr(crud, "bulk_upsert_forecasts", upsert("weather_forecasts"))
+    monkeypatch.setattr(crud, "delete_past_forecasts", lambda db, location_ids, before, commit=True: 0)
+    monkeypatch.setattr(weather_latest, "fetch_one", latest)
+    weather_latest.invalidate()
+    yield tables
+    weather_latest.invalidate()
+
+
+def fake_session():
+    return SimpleNamespace(commit=lambda: None, rollback=lambda: None)
+
+
+def test_parse_onecall_separates_forecasts():
+    now = datetime.utcnow().replace(microsecond=0)
+    observations, forecasts = weather_ingest.parse_onecall(onecall_payload(now), LOCATION_ID)
+    assert len(observations) == 1
+    assert observations[0]["timestamp"] <= now
+    issued_at = observations[0]["timestamp"]
+    # İçinde bulunulan saatin başı geçmişte kalır: sadece sonraki 47 saat tahmindir
+    assert len(forecasts) == 47
+    assert all(f["timestamp"] > issued_at and f["issued_at"] == issued_at for f in forecasts)
+
+
+def test_latest_weather_never_returns_future_row(stored):
+    now = datetime.utcnow().replace(microsecond=0)
+    result = weather_ingest.ingest_payloads(fake_session(), [(LOCATION_ID, onecall_payload(now))])
+    assert result["forecasts"]["rows_parsed"] == 47
+    assert stored["weather_forecasts"]
+    assert all(timestamp <= now for _, timestamp in stored["weatherdata"])
+
+    app = FastAPI()
+    app.include_router(weather.router, prefix="/weather")
+    app.dependency_overrides[get_db] = fake_session
+    response = TestClient(app).get("/weather/latest", params={"location_id": LOCATION_ID})
+    assert response.status_code == 200
+    assert datetime.fromisoformat(response.json()["timestamp"]) <= datetime.utcnow()
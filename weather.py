@@ -1,5 +1,6 @@
 # app/api/v1/routers/weather.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
 '''
 FastAPI’den üç şeyi içe aktarıyoruz:
 APIRouter → Endpoint’leri organize etmek ve modüler bir router oluşturmak için.
@@ -26,6 +27,12 @@ from app import crud
 CRUD modülü: DB işlemleri için kullanılan fonksiyonlar.
 upsert_weather veya get_last_24h_weather gibi fonksiyonlar burada tanımlanmıştır.
 '''
+from app.services.latest_cache import weather_latest
+from app.services import spatial_index
+from app.core.config import settings
+'''
+weather_latest → lokasyon başına son hava durumu ölçümünü bellekte tutan önbellek (upsert'lerle güncellenir).
+'''
 from pydantic import BaseModel
 '''
 BaseModel → API’ye gelen JSON verisini doğrulamak ve tip güvenliği sağlamak için.
@@ -55,7 +62,7 @@ temperature, humidity, wind_speed, pressure → Hava durumu verileri, opsiyonel
 
 @router.get("/latest")
 # Bu endpoint /latest yoluna gelen GET isteğini yakalar.
-# Amaç: Belirtilen konum için son 24 saatin hava durumu verilerini almak.
+# Amaç: Belirtilen konum için en son hava durumu ölçümünü almak.
 
 def get_latest_weather(location_id: int, db: Session = Depends(get_db)):
     '''
@@ -63,12 +70,12 @@ def get_latest_weather(location_id: int, db: Session = Depends(get_db)):
     location_id: int → URL parametresi olarak konum ID’si.
     db: Session = Depends(get_db) → DB oturumu, FastAPI otomatik olarak sağlar.
     '''
-    recs = crud.get_last_24h_weather(db, location_id)
+    record = weather_latest.get(db, location_id)
     '''
-    get_last_24h_weather → DB’den son 24 saatin hava durumu kayıtlarını çekiyor.
-    recs → bir liste döner, her eleman bir dict veya model nesnesi olabilir.
+    weather_latest.get → son ölçümü önbellekten verir; yoksa crud.get_latest_weather ile tek satır okunur.
+    Eskiden son 24 saatin tüm kayıtları yüklenip sadece sonuncusu döndürülüyordu.
     '''
-    if not recs:
+    if not record:
         raise HTTPException(status_code=404, detail="No weather data found")
     '''
         Eğer veri yoksa:
@@ -76,12 +83,46 @@ def get_latest_weather(location_id: int, db: Session = Depends(get_db)):
         detail → kullanıcıya gösterilecek açıklama mesajı.
     '''
     # return latest entry
-    return recs[-1]
+    return record
+'''
+En son kayıt (dict) JSON olarak döndürülür.
 '''
-Liste içindeki son kayıt (recs[-1]) alınır ve JSON olarak döndürülür.
-Bu, son ölçümün en güncel veri olduğunu garanti eder.
+
+
+@router.get("/latest/bulk")
+def get_latest_weather_bulk(
+    ids: str | None = Query(None, description="Virgülle ayrılmış location_id listesi"),
+    bbox: str | None = Query(None, description="min_lat,min_lon,max_lat,max_lon"),
+    db: Session = Depends(get_db)
+):
+    try:
+        location_ids = spatial_index.resolve_location_ids(db, ids, bbox, settings.BULK_MAX_LOCATIONS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rows = weather_latest.get_many(db, location_ids)
+    return JSONResponse(weather_latest.columnar(rows))
+'''
+@router.get("/latest/bulk") → Harita görünümü için çok sayıda lokasyonun son hava durumu verisi tek istekte.
+ids=1,2,3 veya bbox=min_lat,min_lon,max_lat,max_lon (bbox, bellekteki location indeksi ile id'lere çevrilir).
+Önbellekte olmayan lokasyonlar tek toplu sorguyla (crud.get_latest_many) okunur.
+Yanıt sütun bazlıdır: {"count": n, "location_id": [...], "timestamp": [...], alan: [...]}; verisi olmayan lokasyonlar yer almaz.
+JSONResponse doğrudan döndürülür, satır satır jsonable_encoder dönüşümü yapılmaz.
 '''
 
+@router.get("/forecast")
+def get_weather_forecast(location_id: int, db: Session = Depends(get_db)):
+    rows = crud.get_forecast(db, location_id, datetime.utcnow().replace(minute=0, second=0, microsecond=0))
+    if not rows:
+        raise HTTPException(status_code=404, detail="No forecast found")
+    return [
+        {"location_id": r.location_id, "timestamp": r.timestamp, "issued_at": r.issued_at,
+         **{f: getattr(r, f) for f in crud.WEATHER_FIELDS}}
+        for r in rows
+    ]
+'''
+@router.get("/forecast") → One Call saatlik tahminleri (weather_forecasts), içinde bulunulan saatten itibaren.
+Tahminler gözlemlerden ayrı tutulur: /latest, /latest/bulk, history ve export sadece ölçülmüş değerleri döndürür.
+'''
 
 @router.post("/", status_code=201)
 # Bu endpoint / yoluna POST isteği geldiğinde çalışır.
@@ -113,7 +154,7 @@ FastAPI dict veya Pydantic modelini otomatik JSON’a çevirir.
 
 💡 Özet Akış:
 
-GET /latest → son 24 saatin hava durumu verilerini DB’den alır, son kaydı döndürür.
+GET /latest → en son hava durumu kaydını önbellekten (yoksa DB’den tek satır) döndürür.
 POST / → Gelen hava durumu verisini DB’ye ekler veya günceller.
 crud modülü DB ile tüm CRUD işlemlerini yönetir.
 Depends(get_db) ile her çağrıda DB oturumu sağlanır.
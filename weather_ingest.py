@@ -0,0 +1,162 @@
+# app/services/weather_ingest.py
+import hashlib
+import time
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app import crud, models
+from app.services import openweather_service
+from app.services.http_client import run_sync
+
+# One Call alanı → weatherdata kolonu (units=metric: °C, m/s, hPa, %)
+ONECALL_FIELDS = {"temp": "temperature", "humidity": "humidity", "wind_speed": "wind_speed", "pressure": "pressure"}
+HASH_DIGITS = 2  # FLOAT kolon tek hassasiyetli: DB'den okunan 12.34 → 12.340000152..., karşılaştırma yuvarlanmış değerle
+
+
+# --------------------------
+# Parse: current → weatherdata (gözlem), hourly (48 saat) → weather_forecasts (tahmin)
+# --------------------------
+def _row(location_id, block):
+    row = {"location_id": location_id, "timestamp": datetime.utcfromtimestamp(block["dt"])}
+    for key, column in ONECALL_FIELDS.items():
+        value = block.get(key)
+        row[column] = float(value) if value is not None else None
+    return row
+
+
+def parse_onecall(payload, location_id):
+    """
+    Bir One Call cevabını (gözlemler, tahminler) satır listelerine çevirir.
+    current anlık ölçümdür (dakikalı timestamp) ve weatherdata'ya gider; hourly öğeleri gelecek saatlerin tahminidir,
+    weatherdata'ya yazılırsa son değer / özellik / rollup sorguları gelecekteki satırları ölçüm sanar.
+    hourly'nin ilk öğesi içinde bulunulan saatin başıdır (geçmiş): tahmin sadece current'tan sonraki saatler için tutulur.
+    """
+    observations, forecasts = [], []
+    current = payload.get("current")
+    issued_at = datetime.utcfromtimestamp(current["dt"]) if current else datetime.utcnow().replace(microsecond=0)
+    if current:
+        observations.append(_row(location_id, current))
+    for block in payload.get("hourly") or ():
+        row = _row(location_id, block)
+        if row["timestamp"] > issued_at:
+            row["issued_at"] = issued_at
+            forecasts.append(row)
+    return observations, forecasts
+
+
+# --------------------------
+# Değişmeyen satırları atla: içerik hash'i DB'deki mevcut değerle karşılaştırılır
+# --------------------------
+def content_hash(row, fields=crud.WEATHER_FIELDS):
+    text = "|".join("" if row.get(f) is None else f"{round(row[f], HASH_DIGITS):.{HASH_DIGITS}f}" for f in fields)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+
+
+def drop_unchanged(db, rows, model=models.WeatherData, chunk_size=1000):
+    """
+    DB'de aynı (location_id, timestamp) için aynı içerik varsa satır yazılmaz.
+    Upsert None alanı ezmediğinden mevcut satırın hash'i sadece gelen satırda dolu olan alanlarla hesaplanır.
+    Tahminlerde issued_at karşılaştırılmaz: değişmeyen tahmin ilk çekildiği anı korur.
+    """
+    table = model.__table__
+    fields = crud.WEATHER_FIELDS
+    changed = []
+    for i in range(0, len(rows), chunk_size):
+        chunk = rows[i:i + chunk_size]
+        location_ids = {r["location_id"] for r in chunk}
+        timestamps = [r["timestamp"] for r in chunk]
+        # (location_id IN ..., timestamp aralığı): unique index üzerinde range, tuple IN listesi yok
+        existing = {
+            (r[0], r[1]): r[2:]
+            for r in db.execute(
+                select(table.c.location_id, table.c.timestamp, *(table.c[f] for f in fields)).where(
+                    table.c.location_id.in_(location_ids),
+                    table.c.timestamp.between(min(timestamps), max(timestamps)),
+                )
+            ).all()
+        }
+        for row in chunk:
+            current = existing.get((row["location_id"], row["timestamp"]))
+            if current is not None:
+                masked = {f: v if row[f] is not None else None for f, v in zip(fields, current)}
+                if content_hash(masked) == content_hash(row):
+                    continue
+            changed.append(row)
+    return changed
+
+
+# --------------------------
+# Pipeline: çek → parse → fark → tek transaction'da gözlem + tahmin yazma
+# --------------------------
+def ingest_payloads(db, payloads, commit=True):
+    """payloads: [(location_id, One Call JSON)]. Dönüş: gözlem ve tahmin satır sayıları + adım süreleri (saniye)."""
+    started = time.monotonic()
+    rows, forecasts = [], []
+    for location_id, payload in payloads:
+        observed, forecast = parse_onecall(payload, location_id)
+        rows.extend(observed)
+        forecasts.extend(forecast)
+    parsed = time.monotonic()
+    changed = drop_unchanged(db, rows)
+    changed_forecasts = drop_unchanged(db, forecasts, models.WeatherForecasts)
+    compared = time.monotonic()
+    try:
+        result = crud.bulk_upsert_weather(db, changed, commit=False) if changed else {"inserted": 0, "updated": 0}
+        forecast_result = (
+            crud.bulk_upsert_forecasts(db, changed_forecasts, commit=False) if changed_forecasts else {"inserted": 0, "updated": 0}
+        )
+        # Saati geçmiş tahminler: yerlerini gözlem aldı
+        forecast_result["deleted"] = crud.delete_past_forecasts(
+            db, [location_id for location_id, _ in payloads],
+            datetime.utcnow().replace(minute=0, second=0, microsecond=0), commit=False,
+        ) if payloads else 0
+        if commit:
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    written = time.monotonic()
+    return {
+        "locations": len(payloads),
+        "rows_parsed": len(rows),
+        "rows_unchanged": len(rows) - len(changed),
+        **result,
+        "forecasts": {
+            "rows_parsed": len(forecasts),
+            "rows_unchanged": len(forecasts) - len(changed_forecasts),
+            **forecast_result,
+        },
+        "timings": {
+            "parse_s": round(parsed - started, 4),
+            "diff_s": round(compared - parsed, 4),
+            "write_s": round(written - compared, 4),
+        },
+    }
+
+
+def ingest_onecall(db, locations, commit=True):
+    """
+    locations: [(location_id, lat, lon)]. Her lokasyon için tek One Call çağrısı (yanıt önbelleği ve
+    limiter üzerinden) ile anlık gözlem (weatherdata) + 48 saatlik tahmin (weather_forecasts) yazılır.
+    Başarısız lokasyonlar "failed" listesinde.
+    """
+    started = time.monotonic()
+    responses = run_sync(
+        openweather_service.fetch_onecall_batch([(lat, lon) for _, lat, lon in locations]),
+        openweather_service.client,
+    )
+    fetched = time.monotonic()
+    payloads, failed = [], []
+    for (location_id, _, _), response in zip(locations, responses):
+        if isinstance(response, Exception):
+            failed.append({"location_id": location_id, "error": str(response)})
+        else:
+            payloads.append((location_id, response))
+    result = ingest_payloads(db, payloads, commit=commit)
+    result["failed"] = failed
+    result["timings"]["fetch_s"] = round(fetched - started, 4)
+    print(f"✅ One Call: {len(payloads)} lokasyon, {result['rows_parsed']} gözlem ({result['rows_unchanged']} değişmemiş), "
+          f"{result['forecasts']['rows_parsed']} tahmin ({result['forecasts']['rows_unchanged']} değişmemiş), "
+          f"{len(failed)} hata, timings={result['timings']}")
+    return result